@@ -0,0 +1,127 @@
+"""
+Decode synthetic ``topology list`` rows, per-field lookups vs records.
+
+Run with ``python benchmarks/bench_decode.py --rows 100000``.
+"""
+
+import argparse
+import gc
+import time
+
+from stub_api import synthetic_topologies
+
+from lab1918_shell.records import decode_topologies
+from lab1918_shell.topology import (
+    TopologyRow,
+    WorkflowRow,
+    topology_row,
+    workflow_rows,
+)
+
+
+# topology list before records.py, nested .get() chains on every row
+
+
+def legacy_row(each):
+    if not each.get("workflow"):
+        workflow_status = None
+    elif each.get("workflow", {}).get("M", {}).get("finished", {}).get("BOOL") is True:
+        workflow_status = "finished"
+    else:
+        workflow_status = "running"
+    return TopologyRow(
+        name=each["topology_name"]["S"],
+        owner=each["owner"]["S"],
+        topology_id=each["topology_id"]["S"],
+        workflow=each.get("workflow", {})
+        .get("M", {})
+        .get("workflow_name", {})
+        .get("S", "None")
+        + f"({workflow_status})",
+        reservation=bool(each.get("reservation")),
+        deployed=each.get("deployed", {}).get("BOOL", False),
+        version=each["version"]["N"],
+    )
+
+
+def legacy_workflow_rows(topology):
+    topology_id = topology["topology_id"]["S"]
+    workflows = list(topology.get("workflows", {}).get("L", []))
+    workflow = topology.get("workflow", {})
+    if workflow is not None:
+        workflows.append(workflow)
+    return [
+        WorkflowRow(
+            topology_id=topology_id,
+            workflow_name=each["M"]["workflow_name"]["S"],
+            workflow_id=each["M"]["workflow_id"]["S"],
+            started_at=each["M"]["started_at"]["S"][:19],
+            finished=each["M"]["finished"]["BOOL"],
+        )
+        for each in workflows
+    ]
+
+
+def legacy_running(each):
+    workflow = each.get("workflow", {}).get("M", {})
+    if workflow.get("finished", {}).get("BOOL") is True:
+        return None
+    return (
+        each["topology_id"]["S"],
+        each.get("version", {}).get("N"),
+        workflow.get("workflow_name", {}).get("S"),
+    )
+
+
+def records_running(topology):
+    workflow = topology.workflow
+    if workflow is None or workflow.finished:
+        return None
+    return topology.topology_id, topology.version, workflow.workflow_name
+
+
+SCENARIOS = {
+    "table": (
+        lambda items: [legacy_row(each) for each in items],
+        lambda items: [topology_row(each) for each in decode_topologies(items)],
+    ),
+    "workflow": (
+        lambda items: [row for each in items for row in legacy_workflow_rows(each)],
+        lambda items: [row for each in items for row in workflow_rows(each)],
+    ),
+    "running": (
+        lambda items: [legacy_running(each) for each in items],
+        lambda items: [records_running(each) for each in decode_topologies(items)],
+    ),
+}
+
+
+def best_of(repeat, func, items):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(items)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    items = synthetic_topologies(args.rows)
+    gc.disable()
+    print(f"{args.rows} rows, best of {args.repeat}")
+    print(f"{'view':10} {'per-field .get':>16} {'records':>12}")
+    for name, (legacy, records) in SCENARIOS.items():
+        before = best_of(args.repeat, legacy, items)
+        after = best_of(args.repeat, records, items)
+        print(
+            f"{name:10} {before * 1000:13.1f} ms {after * 1000:9.1f} ms"
+            f"  {before / after:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
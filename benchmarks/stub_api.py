@@ -0,0 +1,235 @@
+"""
+In-process stub of the lab1918 API serving a synthetic fleet.
+
+The stub listens on a local port. ``StubApi.session()`` returns a client
+session whose requests to https://api.lab1918.com are sent there, so the
+real transport, decoding and rendering code paths are exercised.
+"""
+
+import gzip
+import json
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+from lab1918_shell.client import new_session
+
+API_URL = "https://api.lab1918.com"
+
+
+def synthetic_workflow(i, finished=True):
+    return {
+        "M": {
+            "workflow_name": {"S": "deploy"},
+            "workflow_id": {"S": f"w{i}"},
+            "started_at": {
+                "S": f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}.000000"
+            },
+            "finished": {"BOOL": finished},
+        }
+    }
+
+
+def synthetic_topology(i, nodes=20, workflows=5):
+    config = json.dumps(
+        {"nodes": [{"hostname": f"r{n}", "vendor": "arista"} for n in range(nodes)]}
+    )
+    return {
+        "topology_id": {"S": f"t{i:08d}"},
+        "topology_name": {"S": f"lab-{i}"},
+        "owner": {"S": "igp2bgp"},
+        "version": {"N": str(i % 50)},
+        "deployed": {"BOOL": i % 2 == 0},
+        "topology_config": {"S": config},
+        "topology_status": {"S": config},
+        "workflow": synthetic_workflow(i, finished=i % 4 != 0),
+        "workflows": {"L": [synthetic_workflow(j) for j in range(workflows)]},
+    }
+
+
+def synthetic_topologies(rows, **kwargs):
+    return [synthetic_topology(i, **kwargs) for i in range(rows)]
+
+
+def synthetic_artifact(i):
+    return {
+        "artifact_id": {"S": f"a{i:08d}"},
+        "owner": {"S": "igp2bgp"},
+        "file_name": {"S": f"image-{i}.qcow2"},
+        "artifact_type": {"S": "qcow"},
+        "file_version": {"S": f"4.{i % 40}"},
+        "storage": {"S": "s3"},
+        "vendor": {"S": "arista"},
+        "arch": {"S": "x86_64"},
+    }
+
+
+USER = {
+    "user_id": "u0001",
+    "aws_region": "us-east-1",
+    "aws_ami_id": "ami-0123456789",
+    "aws_instance_size": "c5.xlarge",
+    "aws_reservation_size": "4",
+}
+
+
+class StubApi:
+    def __init__(
+        self,
+        topologies=1000,
+        artifacts=1000,
+        nodes=20,
+        workflows=5,
+        latency=0.0,
+        compress=False,
+        bandwidth=0,
+    ):
+        # items are encoded once, pages are joined from the encoded bytes
+        self.topologies = [
+            json.dumps(each).encode()
+            for each in synthetic_topologies(
+                topologies, nodes=nodes, workflows=workflows
+            )
+        ]
+        self.topology_index = {f"t{i:08d}": i for i in range(len(self.topologies))}
+        self.artifacts = [
+            json.dumps(synthetic_artifact(i)).encode() for i in range(artifacts)
+        ]
+        # seconds added to every response, like a real round trip would
+        self.latency = latency
+        # gzip responses to clients that accept it; bytes per second on the
+        # wire each way, 0 is unlimited, like a lab jump host's uplink
+        self.compress = compress
+        self.bandwidth = bandwidth
+        self.requests = 0
+        self.created = 0
+        self.server = None
+
+    def page(self, items, query):
+        if "limit" not in query:
+            return b"[" + b",".join(items) + b"]"
+        start = int(query.get("next_token", 0))
+        end = start + int(query["limit"])
+        body = b'{"items":[' + b",".join(items[start:end]) + b"]"
+        if end < len(items):
+            body += b',"next_token":"%d"' % end
+        return body + b"}"
+
+    def handle(self, method, path, query, body):
+        if method == "GET" and path == "/topology":
+            return 200, self.page(self.topologies, query)
+        if method == "GET" and path == "/artifact":
+            return 200, self.page(self.artifacts, query)
+        if method == "POST" and path == "/topology":
+            self.created += 1
+            return 200, b'{"topology_id": "n%d"}' % self.created
+        if method == "POST" and re.fullmatch(
+            r"/topology/[^/]+/(deploy|undeploy|reserve)", path
+        ):
+            return 200, b"{}"
+        if method == "GET" and path == "/whoami":
+            return 200, json.dumps(USER).encode()
+        if method == "PATCH" and path.startswith("/user/"):
+            return 200, json.dumps({**USER, **json.loads(body)}).encode()
+        match = re.fullmatch(r"/topology/([^/]+)", path)
+        if match and method == "PATCH" and match.group(1).startswith("n"):
+            return 200, b"{}"
+        if match and match.group(1) in self.topology_index:
+            item = self.topologies[self.topology_index[match.group(1)]]
+            if method == "GET":
+                return 200, b"[" + item + b"]"
+            if method == "PATCH":
+                topology = json.loads(item)
+                config = json.loads(body)["topology_config"]
+                topology["topology_config"] = {"S": json.dumps(config)}
+                return 200, json.dumps(topology).encode()
+        match = re.fullmatch(r"/artifact/a(\d+)", path)
+        if match and method == "GET" and int(match.group(1)) < len(self.artifacts):
+            return 200, b"[" + self.artifacts[int(match.group(1))] + b"]"
+        return 404, b'{"message": "not found"}'
+
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body in one segment, no delayed ack stalls
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def reply(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                api.requests += 1
+                wire = len(body)
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                status, payload = api.handle(
+                    self.command, parts.path, dict(parse_qsl(parts.query)), body
+                )
+                accept = self.headers.get("Accept-Encoding") or ""
+                compress = api.compress and "gzip" in accept
+                if compress:
+                    payload = gzip.compress(payload, compresslevel=6)
+                wire += len(payload)
+                delay = api.latency + (wire / api.bandwidth if api.bandwidth else 0)
+                if delay:
+                    time.sleep(delay)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if compress:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = reply
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def session(self, policy=None):
+        session = new_session(policy)
+        session.mount(API_URL, StubAdapter(self.url, session.get_adapter(API_URL)))
+        return session
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubAdapter(requests.adapters.BaseAdapter):
+    # rewrites api.lab1918.com to the stub and sends through the client's
+    # own adapter, so pool, timeout and retry settings still apply
+    def __init__(self, url, adapter):
+        super().__init__()
+        self.url = url
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        request.url = self.url + request.url[len(API_URL) :]
+        return self.adapter.send(request, **kwargs)
+
+    def close(self):
+        self.adapter.close()
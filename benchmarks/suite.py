@@ -0,0 +1,298 @@
+"""
+End-to-end benchmarks of the lab1918 CLI against a local stub API.
+
+    python benchmarks/suite.py                     # save results/<commit>.json
+    python benchmarks/suite.py --topologies 10000  # bigger fleet
+    python benchmarks/suite.py --compare benchmarks/results/abc1234.json
+
+With --compare, cases slower than --threshold versus the saved run are
+reported and the exit status is 1.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pathlib import Path
+
+from stub_api import StubApi
+
+from lab1918_shell.cli import lab1918
+from lab1918_shell.client import TopologyClient, TransportPolicy, User
+from lab1918_shell.logger import logger
+from lab1918_shell.records import decode_topologies
+from lab1918_shell.render import echo_rows
+from lab1918_shell.topology import TOPOLOGY_WIDTHS, TopologyRow, topology_row
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"best": min(timings), "median": statistics.median(timings)}
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def quiet(func):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+
+    return run
+
+
+def cli(args, session):
+    def run():
+        code = lab1918.main(
+            args, prog_name="lab1918", obj={"session": session}, standalone_mode=False
+        )
+        assert not code, f"lab1918 {' '.join(args)} exited with {code}"
+
+    return quiet(run)
+
+
+def startup():
+    subprocess.run(
+        [sys.executable, "-c", "from lab1918_shell.cli import main; main()", "--help"],
+        capture_output=True,
+        check=True,
+    )
+
+
+def cases(session, workdir, repeat):
+    topologies = TopologyClient(session=session)
+    page = topologies.get_all_topologies(limit=1000).json()["items"]
+    raw = json.dumps(page)
+    rows = [topology_row(each) for each in decode_topologies(page)]
+    config = workdir / "topology.yaml"
+    config.write_text(
+        "nodes:\n"
+        + "".join(f"  - hostname: r{n}\n    vendor: arista\n" for n in range(50))
+    )
+    user = User(session=session)
+    fleet = workdir / "fleet.yaml"
+    fleet.write_text(
+        "defaults:\n  config: topology.yaml\n  deployed: true\ntopologies:\n"
+        + "".join(f"- name: new-{i}\n" for i in range(100))
+    )
+    yield "startup", startup, max(3, repeat // 2), False
+    yield "snapshot.export", cli(["snapshot", "export"], session), 1, False
+    yield "cli.topology_list.offline", cli(
+        ["--offline", "topology", "list", "--format", "tsv"], session
+    ), repeat, True
+    yield "request.whoami", lambda: user.whoami().json(), repeat * 20, False
+    yield "decode.1k_topologies", lambda: [
+        topology_row(each) for each in decode_topologies(json.loads(raw))
+    ], repeat, True
+    yield "render.fancy_grid.500", quiet(
+        lambda: echo_rows(rows[:500], TopologyRow._fields, "table")
+    ), repeat, True
+    yield "render.fixed.1k", quiet(
+        lambda: echo_rows(rows, TopologyRow._fields, "fixed", TOPOLOGY_WIDTHS)
+    ), repeat, True
+    yield "render.tsv.1k", quiet(
+        lambda: echo_rows(rows, TopologyRow._fields, "tsv")
+    ), repeat, True
+    yield "cli.topology_list", cli(["topology", "list"], session), repeat, True
+    yield "cli.topology_list.json", cli(
+        ["topology", "list", "--format", "json"], session
+    ), repeat, True
+    yield "cli.topology_list.json.compact", cli(
+        ["--compact", "topology", "list", "--format", "json"], session
+    ), repeat, True
+    yield "cli.topology_list.fields", cli(
+        [
+            "topology",
+            "list",
+            "--fields",
+            "topology_id,owner,deployed",
+            "--filter",
+            "deployed=true",
+            "--format",
+            "tsv",
+        ],
+        session,
+    ), repeat, True
+    yield "cli.topology_list.config_path", cli(
+        ["topology", "list", "--config", "--path", "nodes.*.hostname"], session
+    ), repeat, True
+    yield "cli.topology_list.workflow", cli(
+        ["topology", "list", "--workflow", "--format", "tsv"], session
+    ), repeat, True
+    yield "cli.topology_history.failed", cli(
+        ["topology", "history", "--state", "failed", "--since", "24h"], session
+    ), repeat, True
+    yield "cli.topology_history.slowest", cli(
+        ["topology", "history", "--name", "bootstrap", "--slowest"], session
+    ), repeat, True
+    yield "cli.artifact_list", cli(["artifact", "list"], session), repeat, True
+    yield "cli.topology_update", cli(
+        [
+            "topology",
+            "update",
+            "-t",
+            "t00000000",
+            "--topology-yaml",
+            str(config),
+        ],
+        session,
+    ), repeat, True
+    yield "cli.topology_apply.100", cli(
+        ["topology", "apply", "-f", str(fleet)], session
+    ), repeat, True
+
+
+def run(args):
+    workdir = Path(tempfile.mkdtemp(prefix="lab1918-bench-"))
+    os.environ["HOME"] = str(workdir)
+    (workdir / ".lab1918").mkdir()
+    (workdir / ".lab1918" / "shell.ini").write_text(
+        "[default]\napi_server = api.lab1918.com\napi_key = bench-key\n"
+    )
+    logger.setLevel("WARNING")
+    results = {}
+    with StubApi(
+        args.topologies,
+        args.artifacts,
+        args.nodes,
+        latency=args.latency / 1000,
+        compress=args.gzip,
+        bandwidth=args.bandwidth * 1024,
+    ) as api:
+        policy = TransportPolicy(
+            pool_size=32, compress_min_bytes=1024 if args.gzip else 0
+        )
+        session = api.session(policy)
+        for name, func, repeat, memory in cases(session, workdir, args.repeat):
+            if args.only and not name.startswith(tuple(args.only)):
+                continue
+            func()  # warm up connections and imports
+            result = timed(func, repeat)
+            if memory:
+                result["peak_bytes"] = peak_memory(func)
+            results[name] = result
+            print(format_result(name, result), flush=True)
+        session.close()
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "fleet": {
+            "topologies": args.topologies,
+            "artifacts": args.artifacts,
+            "nodes": args.nodes,
+            "latency": args.latency,
+            "gzip": args.gzip,
+            "bandwidth": args.bandwidth,
+        },
+        "results": results,
+    }
+
+
+def format_result(name, result):
+    line = f"{name:28} best {result['best'] * 1000:10.2f} ms"
+    line += f"  median {result['median'] * 1000:10.2f} ms"
+    if "peak_bytes" in result:
+        line += f"  peak {result['peak_bytes'] / 2**20:8.1f} MiB"
+    return line
+
+
+def compare(current, baseline, threshold):
+    if current["fleet"] != baseline["fleet"]:
+        print(f"fleet differs from baseline {baseline['fleet']}, ratios are rough")
+    print(f"\n{'case':28} {baseline['commit']:>12} {current['commit']:>12}")
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        ratio = result["best"] / before["best"]
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:28} {before['best'] * 1000:9.2f} ms {result['best'] * 1000:9.2f} ms"
+            f"  {ratio:5.2f}x{mark}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--topologies", type=int, default=2000)
+    parser.add_argument("--artifacts", type=int, default=2000)
+    parser.add_argument("--nodes", type=int, default=20, help="nodes per topology")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--latency", type=float, default=0, help="ms the stub adds per response"
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="gzip responses, and request bodies of 1 KiB or more",
+    )
+    parser.add_argument(
+        "--bandwidth", type=int, default=0, help="KiB/s on the wire, 0 unlimited"
+    )
+    parser.add_argument("--only", nargs="*", help="case name prefixes to run")
+    parser.add_argument("--output", type=Path, help="default results/<commit>.json")
+    parser.add_argument("--compare", type=Path, help="results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    current = run(args)
+    output = args.output or RESULTS_DIR / f"{current['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(current, indent=4) + "\n")
+    print(f"saved {output}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if compare(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import asyncio
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+from requests import Session
+from typing import Any, Awaitable, Callable, Iterable, List
+
+from lab1918_shell.client import (
+    ArtifactClient,
+    Client,
+    TopologyClient,
+    TransportPolicy,
+    User,
+    get_config,
+    new_session,
+)
+
+DEFAULT_CONCURRENCY = 32
+
+
+async def gather_bounded(
+    aws: Iterable[Awaitable], limit: int, return_exceptions: bool = False
+) -> List:
+    # run awaitables with at most `limit` in flight, results keep input order
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(
+        *[bounded(aw) for aw in aws], return_exceptions=return_exceptions
+    )
+
+
+class AsyncEngine:
+    # one connection pool and one worker pool shared by every async client,
+    # the blocking requests calls run on the workers
+    def __init__(
+        self, concurrency: int = DEFAULT_CONCURRENCY, session: Session = None
+    ) -> None:
+        self.concurrency = concurrency
+        # a borrowed session, e.g. the shell's, stays open for its owner
+        self.owns_session = session is None
+        if session is None:
+            policy = TransportPolicy.from_config(get_config())
+            policy.pool_size = max(policy.pool_size, concurrency)
+            session = new_session(policy)
+        self.session = session
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="lab1918"
+        )
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def gather(
+        self, aws: Iterable[Awaitable], limit: int = None, return_exceptions=False
+    ) -> List:
+        return await gather_bounded(
+            aws, limit or self.concurrency, return_exceptions=return_exceptions
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        if self.owns_session:
+            self.session.close()
+
+    async def __aenter__(self) -> "AsyncEngine":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+
+def run_with_engine(
+    concurrency: int, client: Client, main: Callable[["AsyncEngine"], Awaitable]
+) -> Any:
+    # runs main(engine) to completion from synchronous code; the engine
+    # borrows the client's session, its profile and pool
+    async def run():
+        session = client.session if client else None
+        async with AsyncEngine(concurrency, session=session) as engine:
+            return await main(engine)
+
+    return asyncio.run(run())
+
+
+class AsyncClient:
+    client_class = None
+
+    def __init__(self, engine: AsyncEngine, client: Client = None) -> None:
+        # a given client keeps its own profile and session
+        self.engine = engine
+        self.client = client or self.client_class(session=engine.session)
+
+
+class AsyncTopologyClient(AsyncClient):
+    client_class = TopologyClient
+
+    async def get_topology(self, topology_id, fresh: bool = False):
+        return await self.engine.run(self.client.get_topology, topology_id, fresh)
+
+    async def get_all_topologies(
+        self, limit: int = None, next_token: str = None, **query
+    ):
+        # query: fields and filter, see query.query_params
+        return await self.engine.run(
+            self.client.get_all_topologies,
+            limit=limit,
+            next_token=next_token,
+            **query,
+        )
+
+    async def create_topology(self, topology_name):
+        return await self.engine.run(self.client.create_topology, topology_name)
+
+    async def delete_topology(self, topology_id):
+        return await self.engine.run(self.client.delete_topology, topology_id)
+
+    async def update_topology(self, topology_id, topology_config):
+        return await self.engine.run(
+            self.client.update_topology, topology_id, topology_config
+        )
+
+    async def deploy(self, topology_id, dry_run):
+        return await self.engine.run(self.client.deploy, topology_id, dry_run)
+
+    async def undeploy(self, topology_id, dry_run):
+        return await self.engine.run(self.client.undeploy, topology_id, dry_run)
+
+    async def reserve(self, topology_id, json):
+        return await self.engine.run(self.client.reserve, topology_id, json)
+
+    async def release(
+        self, topology_id: str, reservation_id: str, account_id: str, force: bool
+    ):
+        return await self.engine.run(
+            self.client.release, topology_id, reservation_id, account_id, force
+        )
+
+    async def ping(self, topology_id, **kwargs):
+        return await self.engine.run(self.client.ping, topology_id, **kwargs)
+
+    async def bootstrap(self, topology_id, params):
+        return await self.engine.run(self.client.bootstrap, topology_id, params)
+
+
+class AsyncArtifactClient(AsyncClient):
+    client_class = ArtifactClient
+
+    async def get_artifact(self, artifact_id):
+        return await self.engine.run(self.client.get_artifact, artifact_id)
+
+    async def get_all_artifacts(self, **query):
+        return await self.engine.run(self.client.get_all_artifacts, **query)
+
+    async def delete_artifact(self, artifact_id):
+        return await self.engine.run(self.client.delete_artifact, artifact_id)
+
+    async def create_artifact(
+        self,
+        file_name,
+        file_version,
+        vendor,
+        artifact_type,
+        storage,
+        arch,
+        digest=None,
+        alias_of=None,
+    ):
+        return await self.engine.run(
+            self.client.create_artifact,
+            file_name,
+            file_version,
+            vendor,
+            artifact_type,
+            storage,
+            arch,
+            digest,
+            alias_of,
+        )
+
+    async def start_upload(self, artifact_id, file_size, part_size):
+        return await self.engine.run(
+            self.client.start_upload, artifact_id, file_size, part_size
+        )
+
+    async def sign_upload_parts(self, artifact_id, upload_id, part_numbers):
+        return await self.engine.run(
+            self.client.sign_upload_parts, artifact_id, upload_id, part_numbers
+        )
+
+    async def complete_upload(self, artifact_id, upload_id, parts):
+        return await self.engine.run(
+            self.client.complete_upload, artifact_id, upload_id, parts
+        )
+
+
+class AsyncUser(AsyncClient):
+    client_class = User
+
+    async def whoami(self):
+        return await self.engine.run(self.client.whoami)
+
+    async def update(self, json):
+        return await self.engine.run(self.client.update, json)
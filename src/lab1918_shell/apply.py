@@ -0,0 +1,190 @@
+import time
+
+from collections import namedtuple
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from lab1918_shell.aclient import AsyncEngine, AsyncTopologyClient, run_with_engine
+from lab1918_shell.client import TopologyClient
+from lab1918_shell.codec import json_body
+from lab1918_shell.records import Topology
+from lab1918_shell.topology_config import diff, load_config, validate
+from lab1918_shell.wait import current_workflow, follow_workflow
+
+# order of steps within one topology, each step needs the previous ones
+ACTIONS = ("create", "undeploy", "update", "reserve", "deploy")
+# steps that start a workflow the next step has to wait for
+WORKFLOW_ACTIONS = ("undeploy", "reserve")
+
+Desired = namedtuple("Desired", ["name", "config", "reserve", "deployed"])
+Plan = namedtuple("Plan", ["desired", "topology_id", "actions"])
+StepResult = namedtuple("StepResult", ["name", "action", "seconds", "error"])
+SummaryRow = namedtuple(
+    "SummaryRow", ["action", "ok", "failed", "total_seconds", "max_seconds"]
+)
+
+
+def load_manifest(path: Path) -> Tuple[List[Desired], List[str]]:
+    # topologies: [{name, config: file or mapping, reserve: {..}, deployed}]
+    # with `defaults` merged into every entry, config paths relative to the
+    # manifest; a config file shared by many topologies is parsed once
+    path = Path(path)
+    manifest = load_config(path)
+    if not isinstance(manifest, dict) or not isinstance(
+        manifest.get("topologies"), list
+    ):
+        return [], [f"{path}: a topologies list is required"]
+    defaults = manifest.get("defaults") or {}
+    configs = {}
+    desired, errors, names = [], [], set()
+    for i, entry in enumerate(manifest["topologies"]):
+        entry = {**defaults, **entry} if isinstance(entry, dict) else {}
+        name = entry.get("name")
+        if not name:
+            errors.append(f"topologies[{i}].name: required")
+            continue
+        if name in names:
+            errors.append(f"topologies[{i}].name: duplicate {name!r}")
+        names.add(name)
+        config = entry.get("config")
+        if isinstance(config, str):
+            config_path = path.parent / config
+            if config_path not in configs:
+                try:
+                    kind = "json" if config_path.suffix == ".json" else "yaml"
+                    configs[config_path] = load_config(config_path, kind)
+                except (OSError, ValueError) as e:
+                    errors.append(f"{name}: {e}")
+                    continue
+            config = configs[config_path]
+        errors.extend(f"{name}: {error}" for error in validate(config))
+        reserve = entry.get("reserve")
+        if reserve is not None and not isinstance(reserve, dict):
+            errors.append(f"{name}: reserve must be a mapping")
+        desired.append(
+            Desired(name, config, reserve, bool(entry.get("deployed", False)))
+        )
+    return desired, errors
+
+
+def plan(desired: Iterable[Desired], current: Dict[str, Topology]) -> List[Plan]:
+    plans = []
+    for each in desired:
+        topology = current.get(each.name)
+        actions = []
+        if topology is None:
+            actions = ["create", "update"]
+        else:
+            if topology.deployed and not each.deployed:
+                actions.append("undeploy")
+            if diff(topology.config, each.config):
+                actions.append("update")
+        if each.reserve is not None and not (topology and topology.reserved):
+            actions.append("reserve")
+        if each.deployed and not (topology and topology.deployed):
+            actions.append("deploy")
+        plans.append(Plan(each, topology and topology.topology_id, actions))
+    return plans
+
+
+def created_id(body) -> str:
+    if isinstance(body, list):
+        body = body[0]
+    topology_id = body["topology_id"]
+    return topology_id["S"] if isinstance(topology_id, dict) else topology_id
+
+
+async def run_plans(
+    plans: List[Plan],
+    engine: AsyncEngine,
+    on_result: Callable[[StepResult], None],
+    topology_client: TopologyClient = None,
+    timeout: float = 0,
+) -> List[StepResult]:
+    client = AsyncTopologyClient(engine, topology_client)
+
+    async def step(desired: Desired, topology_id: Optional[str], action: str):
+        if action == "create":
+            return await client.create_topology(desired.name)
+        if action == "update":
+            return await client.update_topology(topology_id, desired.config)
+        if action == "reserve":
+            return await client.reserve(topology_id, desired.reserve)
+        if action == "deploy":
+            return await client.deploy(topology_id, False)
+        return await client.undeploy(topology_id, False)
+
+    async def pipeline(each: Plan) -> List[StepResult]:
+        topology_id = each.topology_id
+        results = []
+        for i, action in enumerate(each.actions):
+            started = time.monotonic()
+            error = None
+            follow = action in WORKFLOW_ACTIONS and i + 1 < len(each.actions)
+            try:
+                if follow:
+                    # the workflow the step starts is the first one after this
+                    previous = await current_workflow(client, topology_id)
+                res = await step(each.desired, topology_id, action)
+                res.raise_for_status()
+                if action == "create":
+                    topology_id = created_id(json_body(res))
+                if follow:
+                    deadline = time.monotonic() + timeout if timeout else None
+                    state, _ = await follow_workflow(
+                        client,
+                        topology_id,
+                        previous.workflow_id if previous else None,
+                        deadline,
+                    )
+                    if state != "finished":
+                        error = f"{action} workflow {state}"
+            except Exception as e:
+                error = str(e)
+            result = StepResult(
+                each.desired.name, action, time.monotonic() - started, error
+            )
+            on_result(result)
+            results.append(result)
+            if error:
+                # later steps of this topology depend on the failed one
+                break
+        return results
+
+    # one pipeline per topology, at most engine.concurrency of them at once
+    done = await engine.gather([pipeline(each) for each in plans if each.actions])
+    return [result for results in done for result in results]
+
+
+def apply(
+    plans: List[Plan],
+    concurrency: int,
+    on_result: Callable[[StepResult], None],
+    client: TopologyClient = None,
+    timeout: float = 0,
+) -> List[StepResult]:
+    return run_with_engine(
+        concurrency,
+        client,
+        lambda engine: run_plans(plans, engine, on_result, client, timeout),
+    )
+
+
+def summarize(results: List[StepResult]) -> List[SummaryRow]:
+    rows = []
+    for action in ACTIONS:
+        steps = [each for each in results if each.action == action]
+        if not steps:
+            continue
+        seconds = [each.seconds for each in steps]
+        failed = sum(1 for each in steps if each.error)
+        rows.append(
+            SummaryRow(
+                action,
+                len(steps) - failed,
+                failed,
+                round(sum(seconds), 2),
+                round(max(seconds), 2),
+            )
+        )
+    return rows
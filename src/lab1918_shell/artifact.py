@@ -1,65 +1,149 @@
 import click
-import json
+import sys
+import time
 
-from lab1918_shell.config import Config
-from lab1918_shell.client import ArtifactClient
+from lab1918_shell.cli import ApiGroup
+from lab1918_shell.codec import json_body
 from lab1918_shell.logger import logger
+from lab1918_shell.query import (
+    field_row,
+    fields_option,
+    filter_option,
+    parse_fields,
+    parse_filters,
+    query_params,
+    select,
+)
+from lab1918_shell.records import Artifact, decode_artifacts
+from lab1918_shell.render import (
+    ROW_FORMATS,
+    echo_error,
+    echo_items,
+    echo_rows,
+    format_option,
+)
 
 from collections import namedtuple
-from tabulate import tabulate
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    from lab1918_shell.client import ArtifactClient
+
+ArtifactRow = namedtuple(
+    "ArtifactRow",
+    [
+        "owner",
+        "file_name",
+        "artifact_type",
+        "version",
+        "storage",
+        "vendor",
+        "arch",
+    ],
+)
 
 
 @click.group(
-    context_settings={"show_default": True, "help_option_names": ["-h", "--help"]}
+    cls=ApiGroup,
+    context_settings={"show_default": True, "help_option_names": ["-h", "--help"]},
 )
+@click.option("--no-cache", is_flag=True, help="bypass the local response cache")
 @click.pass_context
-def artifact(ctx):
-    ctx.obj["client"] = ArtifactClient()
+def artifact(ctx, no_cache):
+    from lab1918_shell.client import ArtifactClient
+    from lab1918_shell.profiles import context_client
+
+    ctx.obj["client"] = context_client(ctx, ArtifactClient, no_cache)
 
 
 @artifact.command()
 @click.pass_context
 @click.option("--artifact-id", help="artifact id")
-@click.option("--format", type=click.Choice(["json", "table"]), default="table")
-def list(ctx, artifact_id, format):
+@format_option
+@fields_option
+@filter_option
+def list(ctx, artifact_id, format, fields, filters):
     client: ArtifactClient = ctx.obj["client"]
     logger.info("list artifacs ...")
+    fields = parse_fields(fields)
+    filters = parse_filters(filters)
+    if ctx.obj.get("all_profiles"):
+        if artifact_id:
+            raise click.UsageError("--artifact-id and --all-profiles are exclusive")
+        list_all_profiles(ctx, format, fields, filters)
+        return
     try:
         if artifact_id:
             res = client.get_artifact(artifact_id)
         else:
-            res = client.get_all_artifacts()
+            res = client.get_all_artifacts(**query_params(fields, filters))
         res.raise_for_status()
-        if format == "json":
-            click.echo(json.dumps(res.json(), indent=4))
+        items = json_body(res)
+        if fields or filters:
+            items = select(items, fields, filters)
+        if format not in ROW_FORMATS:
+            echo_items(items, format)
             return
-        headers = [
-            "owner",
-            "file_name",
-            "artifact_type",
-            "version",
-            "storage",
-            "vendor",
-            "arch",
-        ]
-        Row = namedtuple("Row", headers)
-        tbl = []
-        for each in res.json():
-            row = Row(
-                owner=each["owner"]["S"],
-                file_name=each["file_name"]["S"],
-                artifact_type=each["artifact_type"]["S"],
-                version=each["file_version"]["S"],
-                storage=each["storage"]["S"],
-                vendor=each["vendor"]["S"],
-                arch=each.get("arch", {}).get("S", "x86"),
-            )
-            tbl.append(row)
-        hdrs = [each.replace("_", "-") for each in headers]
-        click.echo(tabulate(tbl, hdrs, tablefmt="fancy_grid"))
+        if fields:
+            echo_rows((field_row(each, fields) for each in items), fields, format)
+            return
+        rows = map(artifact_row, decode_artifacts(items))
+        echo_rows(rows, ArtifactRow._fields, format)
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
+
+
+def artifact_row(artifact: Artifact) -> ArtifactRow:
+    return ArtifactRow._make(
+        (
+            artifact.owner,
+            artifact.file_name,
+            artifact.artifact_type,
+            artifact.file_version,
+            artifact.storage,
+            artifact.vendor,
+            artifact.arch,
+        )
+    )
+
+
+def list_all_profiles(
+    ctx, format: str, fields: List[str], filters: Dict[str, str]
+) -> None:
+    from lab1918_shell.client import ArtifactClient
+    from lab1918_shell.profiles import fan_out
+
+    def fetch(client: ArtifactClient) -> List[Dict]:
+        res = client.get_all_artifacts(**query_params(fields, filters))
+        res.raise_for_status()
+        return [*select(json_body(res), fields, filters)]
+
+    failed = []
+    results = fan_out(ctx, ArtifactClient, fetch, failed)
+    if format not in ROW_FORMATS:
+        items = (
+            {"profile": {"S": profile}, **each}
+            for profile, items in results
+            for each in items
+        )
+        echo_items(items, format)
+    elif fields:
+        rows = (
+            (profile, *field_row(each, fields))
+            for profile, items in results
+            for each in items
+        )
+        echo_rows(rows, ("profile", *fields), format)
+    else:
+        rows = (
+            (profile, *artifact_row(each))
+            for profile, items in results
+            for each in decode_artifacts(items)
+        )
+        echo_rows(rows, ("profile", *ArtifactRow._fields), format)
+    if failed:
+        ctx.exit(1)
 
 
 @artifact.command()
@@ -76,18 +160,145 @@ def list(ctx, artifact_id, format):
 )
 @click.option("--storage", type=click.Choice(["s3", "docker"]), default="s3")
 @click.option("--arch", type=click.Choice(["x86", "x86_64" "arm"]), default="x86")
-def create(ctx, file_name, file_version, vendor, artifact_type, storage, arch):
+@click.option(
+    "--upload",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="image to upload, an interrupted upload resumes on rerun",
+)
+@click.option(
+    "--parallel", type=click.IntRange(min=1), default=4, help="parts in flight"
+)
+@click.option(
+    "--part-size", type=click.IntRange(min=5), default=64, help="MiB per part"
+)
+@click.option(
+    "--no-dedup",
+    is_flag=True,
+    help="upload even if an artifact with the same content exists",
+)
+def create(
+    ctx,
+    file_name,
+    file_version,
+    vendor,
+    artifact_type,
+    storage,
+    arch,
+    upload,
+    parallel,
+    part_size,
+    no_dedup,
+):
+    if upload and not upload.stat().st_size:
+        raise click.BadParameter(f"{upload} is empty", param_hint="--upload")
+    import requests
+
     client: ArtifactClient = ctx.obj["client"]
     logger.info("create artifact ...")
     try:
+        if upload:
+            upload_artifact(
+                client,
+                upload,
+                parallel,
+                part_size,
+                not no_dedup,
+                file_name or upload.name,
+                file_version,
+                vendor,
+                artifact_type,
+                storage,
+                arch,
+            )
+            return
         res = client.create_artifact(
             file_name, file_version, vendor, artifact_type, storage, arch
         )
         res.raise_for_status()
         click.echo(f"created artifact {file_name}")
-    except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+    except requests.RequestException as e:
+        echo_error(e)
+    except (OSError, ValueError) as e:
+        # reading or hashing the image, mmap raises ValueError
+        click.echo(f"{upload}: {e}", err=True)
+    except KeyError as e:
+        click.echo(f"unexpected api response, no {e}", err=True)
+
+
+def upload_artifact(
+    client, source, parallel, part_size, dedup, file_name, file_version, *metadata
+):
+    from lab1918_shell.dedup import ArtifactIndex
+    from lab1918_shell.upload import MIB, MultipartUpload, UploadManifest, part_size_for
+
+    manifest = UploadManifest.for_file(source)
+    upload = MultipartUpload(client, manifest, workers=parallel)
+    index = ArtifactIndex.from_config()
+    if manifest.started:
+        done = len(manifest.state["parts"])
+        click.echo(
+            f"resuming upload of {file_name}, {done}/{manifest.total_parts} parts done"
+        )
+    else:
+        # a hash pass instead of a transfer when the bytes are already stored
+        digest = index.digest(source)
+        existing = None
+        if dedup:
+            res = client.get_all_artifacts()
+            res.raise_for_status()
+            existing = index.lookup(digest, decode_artifacts(json_body(res)))
+        if existing and (existing.file_name, existing.file_version) == (
+            file_name,
+            file_version,
+        ):
+            click.echo(
+                f"artifact {existing.artifact_id} has the same content, upload skipped"
+            )
+            return
+        res = client.create_artifact(
+            file_name,
+            file_version,
+            *metadata,
+            digest=digest,
+            alias_of=existing.artifact_id if existing else None,
+        )
+        res.raise_for_status()
+        if existing:
+            click.echo(
+                f"created artifact {file_name} as alias of {existing.artifact_id}, "
+                "upload skipped"
+            )
+            return
+        artifact_id = json_body(res)["artifact_id"]
+        if isinstance(artifact_id, dict):
+            artifact_id = artifact_id["S"]
+        manifest.state["digest"] = digest
+        upload.begin(
+            artifact_id, part_size_for(manifest.state["size"], part_size * MIB)
+        )
+    remaining = sum(
+        end - start for start, end in map(manifest.part_range, manifest.pending())
+    )
+    started = time.monotonic()
+    sent = 0
+    with click.progressbar(
+        length=remaining,
+        label=f"upload {file_name}",
+        item_show_func=lambda rate: rate,
+        file=sys.stderr,
+    ) as bar:
+
+        def progress(size):
+            nonlocal sent
+            sent += size
+            rate = sent / MIB / max(time.monotonic() - started, 1e-6)
+            bar.update(size, f"{rate:.1f} MiB/s")
+
+        upload.send_parts(progress)
+    upload.complete()
+    if manifest.state.get("digest"):
+        index.remember(manifest.state["digest"], manifest.state["artifact_id"])
+    click.echo(f"created artifact {file_name}")
 
 
 @artifact.command()
@@ -101,17 +312,11 @@ def delete(ctx, artifact_id):
         res.raise_for_status()
         click.echo(f"deleted artifact {artifact_id}")
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
 
 
 def main():
-    config = Config()
-    default = config.get_config(profile="default")
-    if default["api_key"] == "<replace with api key>":
-        logger.error("config proper api key at ~/.lab1918/shell.ini!")
-    else:
-        artifact(obj={})
+    artifact(obj={})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import requests
+import tempfile
+import time
+
+from pathlib import Path
+from requests.hooks import dispatch_hook
+from typing import Dict, Optional
+
+from lab1918_shell.config import Config
+from lab1918_shell.logger import logger
+
+DEFAULT_TTL = 0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+CACHE_HEADER = "x-lab1918-cache"
+
+
+class ResponseCache:
+    # one file per GET url: a json metadata line followed by the raw body.
+    # file mtime is the last use, eviction drops the least recently used.
+    def __init__(
+        self,
+        cache_dir: Path,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_config(
+        cls, profile: str = "default", config: Config = None
+    ) -> "ResponseCache":
+        config = config or Config()
+        settings = config.get_config(profile=profile)
+        return cls(
+            config.config_dir / "cache",
+            ttl=float(settings.get("cache_ttl", DEFAULT_TTL)),
+            max_bytes=int(settings.get("cache_max_bytes", DEFAULT_MAX_BYTES)),
+        )
+
+    def key(self, session: requests.Session, url: str, params: Dict = None) -> str:
+        prepared = requests.Request("GET", url, params=params).prepare()
+        # responses differ per account, never share entries across api keys
+        identity = f"{session.headers.get('x-api-key', '')}\n{prepared.url}"
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.entry"
+
+    def load(self, key: str) -> Optional[requests.Response]:
+        try:
+            with self.path(key).open("rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        response = requests.Response()
+        response.status_code = meta["status"]
+        response.url = meta["url"]
+        # response hooks, the shell's id index say, see it as the GET it was
+        response.request = requests.Request("GET", meta["url"]).prepare()
+        response.headers.update(meta["headers"])
+        response._content = body
+        response.stored_at = meta["stored_at"]
+        return response
+
+    def store(self, key: str, response: requests.Response) -> None:
+        meta = {
+            "url": response.url,
+            "status": response.status_code,
+            "headers": {
+                k: v for k, v in response.headers.items() if k.lower() != CACHE_HEADER
+            },
+            "stored_at": time.time(),
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(meta).encode() + b"\n")
+            f.write(response.content)
+        os.replace(tmp, self.path(key))
+        self.evict()
+
+    def touch(self, key: str) -> None:
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+
+    def refresh(
+        self, key: str, cached: requests.Response, response: requests.Response
+    ) -> None:
+        # a 304 restarts the ttl and may carry new validators
+        for header in ("ETag", "Last-Modified"):
+            if header in response.headers:
+                cached.headers[header] = response.headers[header]
+        self.store(key, cached)
+        cached.headers[CACHE_HEADER] = "revalidated"
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        for entry in self.cache_dir.glob("*.entry"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total += stat.st_size
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        for entry in self.cache_dir.glob("*.entry"):
+            entry.unlink(missing_ok=True)
+
+    def get(
+        self,
+        session: requests.Session,
+        url: str,
+        params: Dict = None,
+        fresh: bool = False,
+    ) -> requests.Response:
+        # fresh revalidates even within the ttl, a 304 is still cheap
+        key = self.key(session, url, params)
+        cached = self.load(key)
+        if (
+            cached is not None
+            and not fresh
+            and time.time() - cached.stored_at < self.ttl
+        ):
+            logger.debug(f"cache hit {cached.url}")
+            cached.headers[CACHE_HEADER] = "hit"
+            self.touch(key)
+            return dispatch_hook("response", session.hooks, cached)
+        headers = {}
+        if cached is not None:
+            if "ETag" in cached.headers:
+                headers["If-None-Match"] = cached.headers["ETag"]
+            if "Last-Modified" in cached.headers:
+                headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+        response = session.get(url=url, params=params, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            logger.debug(f"cache revalidated {cached.url}")
+            self.refresh(key, cached, response)
+            return dispatch_hook("response", session.hooks, cached)
+        if response.status_code == 200 and (
+            self.ttl > 0
+            or "ETag" in response.headers
+            or "Last-Modified" in response.headers
+        ):
+            self.store(key, response)
+        return response
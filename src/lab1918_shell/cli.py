@@ -0,0 +1,108 @@
+import click
+import importlib
+
+# name -> (module, attribute, short help); modules are imported on first use
+SUBCOMMANDS = {
+    "topology": ("lab1918_shell.topology", "topology", "manage topologies"),
+    "artifact": ("lab1918_shell.artifact", "artifact", "manage artifacts"),
+    "user": ("lab1918_shell.user", "user", "show and change user settings"),
+    "snapshot": ("lab1918_shell.snapshot", "snapshot", "export and import snapshots"),
+    "shell": ("lab1918_shell.shell", "shell", "interactive shell"),
+}
+ALIASES = {
+    "topo": "topology",
+    "art": "artifact",
+}
+
+
+class ApiGroup(click.Group):
+    # the group callback builds an api client from shell.ini, let
+    # `<group> <command> --help` print its help before that happens
+    def resolve_command(self, ctx, args):
+        cmd_name, cmd, args = super().resolve_command(ctx, args)
+        if cmd is not None and any(arg in ctx.help_option_names for arg in args):
+            cmd.make_context(cmd_name, [*args], parent=ctx)
+        return cmd_name, cmd, args
+
+
+class LazyGroup(click.Group):
+    def list_commands(self, ctx):
+        return sorted(SUBCOMMANDS)
+
+    def get_command(self, ctx, cmd_name):
+        cmd_name = ALIASES.get(cmd_name, cmd_name)
+        if cmd_name not in SUBCOMMANDS:
+            return None
+        module, attr, _ = SUBCOMMANDS[cmd_name]
+        return getattr(importlib.import_module(module), attr)
+
+    def format_commands(self, ctx, formatter):
+        # static help text, listing commands must not import them
+        rows = [(name, SUBCOMMANDS[name][2]) for name in self.list_commands(ctx)]
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+
+
+@click.group(
+    cls=LazyGroup,
+    context_settings={"show_default": True, "help_option_names": ["-h", "--help"]},
+)
+@click.option(
+    "--trace",
+    "trace_file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="write a json span per api call to this file and print latency "
+    "percentiles per endpoint to stderr at exit",
+)
+@click.option(
+    "--profile",
+    "-p",
+    envvar="LAB1918_PROFILE",
+    default="default",
+    help="shell.ini profile to use",
+)
+@click.option(
+    "--all-profiles",
+    is_flag=True,
+    help="run list commands against every profile with an api key, merged",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    help="run list commands against the profile's snapshot, see snapshot export",
+)
+@click.option(
+    "--compact",
+    is_flag=True,
+    help="print json on one line without indentation, for scripts",
+)
+@click.pass_context
+def lab1918(ctx, trace_file, profile, all_profiles, offline, compact):
+    ctx.ensure_object(dict)
+    ctx.obj["profile"] = profile
+    ctx.obj["all_profiles"] = all_profiles
+    ctx.obj["offline"] = offline
+    ctx.obj["compact"] = compact
+    if trace_file:
+        from lab1918_shell import trace
+
+        tracer = trace.start(trace_file)
+        ctx.call_on_close(lambda: echo_trace_summary(tracer))
+
+
+def echo_trace_summary(tracer) -> None:
+    from lab1918_shell import trace
+    from tabulate import tabulate
+
+    trace.stop()
+    rows = tracer.summary()
+    if rows:
+        click.echo(tabulate(rows, headers=trace.EndpointRow._fields), err=True)
+
+
+def main():
+    lab1918(obj={})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,283 @@
+import random
 import requests
-import json
+import time
 
-from lab1918_shell.config import Config
+from lab1918_shell import trace
+from lab1918_shell.cache import ResponseCache
+from lab1918_shell.codec import json_body, loads, request_body
+from lab1918_shell.compression import ACCEPT, compress_request, log_response
+from lab1918_shell.config import API_KEY_PLACEHOLDER, DEFAULT_PAGE_SIZE, Config
+from lab1918_shell.ratelimit import THROTTLED_STATUSES, RateLimiter
+from functools import partial
+from typing import Callable, Dict, Iterator, List
+from urllib3.util.retry import Retry
 
+RETRY_STATUSES = (429, 500, 502, 503, 504)
 
-def get_config():
-    config = Config().get_config(profile="default")
-    assert config.get("api_server") == "api.lab1918.com"
-    assert config.get("api_key") != "<replace with api key>"
-    return config["api_server"], config["api_key"]
+
+def get_config(profile: str = "default", config: Config = None) -> Dict:
+    settings = (config or Config()).get_config(profile=profile)
+    assert settings.get("api_server"), f"profile {profile} has no api_server"
+    assert settings.get("api_key") != API_KEY_PLACEHOLDER
+    return settings
+
+
+class JitterRetry(Retry):
+    # full jitter on top of urllib3's exponential backoff, capped per policy;
+    # a Retry-After header still takes precedence over the backoff
+    backoff_cap = 30.0
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.backoff_cap = self.backoff_cap
+        return retry
+
+    def get_backoff_time(self):
+        backoff = min(super().get_backoff_time(), self.backoff_cap)
+        return random.uniform(0, backoff)
+
+
+class TimeoutHTTPAdapter(requests.adapters.HTTPAdapter):
+    # set by Client when the profile has a rate_limit
+    limiter: RateLimiter = None
+    # the retry policy for throttled responses while a limiter is set
+    throttle_retry: Retry = None
+    # json bodies of this many bytes or more are sent gzipped, 0 never
+    compress_min_bytes = 0
+
+    def __init__(self, timeout, *args, **kwargs) -> None:
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # connections time their dns, connect and tls phases while a trace
+        # runs, even when it started after this adapter, and do nothing else
+        self.poolmanager.pool_classes_by_scheme = trace.POOL_CLASSES
+
+    def use_limiter(self, limiter: RateLimiter) -> None:
+        # throttled responses go back to the limiter, which holds off every
+        # process sharing its bucket; urllib3 retrying them would hide them
+        self.limiter = limiter
+        self.throttle_retry = self.max_retries
+        self.max_retries = self.max_retries.new(
+            status_forcelist=[
+                status
+                for status in self.max_retries.status_forcelist or ()
+                if status not in THROTTLED_STATUSES
+            ],
+            respect_retry_after_header=False,
+        )
+
+    def send(self, request, timeout=None, stream=False, **kwargs):
+        compress_request(request, self.compress_min_bytes)
+        limiter = self.limiter
+        if limiter is not None and not limiter.covers(request.url):
+            limiter = None
+        retries = (self.throttle_retry.total or 0) if limiter is not None else 0
+        while True:
+            response = self.attempt(
+                request, limiter, timeout or self.timeout, stream, **kwargs
+            )
+            status = response.status_code
+            if not retries or status not in THROTTLED_STATUSES:
+                break
+            if not self.throttle_retry.is_retry(request.method, status, True):
+                break
+            # the next acquire() waits out the retry-after observe() recorded
+            retries -= 1
+            response.close()
+        if not stream:
+            log_response(response)
+        return response
+
+    def attempt(self, request, limiter, timeout, stream, **kwargs):
+        tracer = trace.tracer
+        span = tracer.begin(request) if tracer else None
+        if limiter is not None:
+            waited = limiter.acquire()
+            if span and waited:
+                span.add("rate_limit", waited)
+        sent = time.perf_counter()
+        try:
+            response = super().send(request, timeout=timeout, stream=stream, **kwargs)
+        except Exception as e:
+            if span:
+                tracer.end(span, sent, error=e)
+            raise
+        if span:
+            tracer.end(span, sent, response, stream=stream)
+        if limiter is not None:
+            limiter.observe(response)
+        return response
+
+
+class TransportPolicy:
+    def __init__(
+        self,
+        pool_size: int = requests.adapters.DEFAULT_POOLSIZE,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 30.0,
+        compress_min_bytes: int = 0,
+    ) -> None:
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.compress_min_bytes = compress_min_bytes
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "TransportPolicy":
+        policy = cls()
+        for key, cast in (
+            ("pool_size", int),
+            ("connect_timeout", float),
+            ("read_timeout", float),
+            ("retries", int),
+            ("backoff_factor", float),
+            ("backoff_max", float),
+            ("compress_min_bytes", int),
+        ):
+            if key in config:
+                setattr(policy, key, cast(config[key]))
+        return policy
+
+    def retry(self) -> Retry:
+        # only idempotent methods are retried, POST/PATCH fail on first error
+        retry = JitterRetry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        retry.backoff_cap = self.backoff_max
+        return retry
+
+    def adapter(self) -> requests.adapters.HTTPAdapter:
+        adapter = TimeoutHTTPAdapter(
+            (self.connect_timeout, self.read_timeout),
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=self.retry(),
+        )
+        adapter.compress_min_bytes = self.compress_min_bytes
+        return adapter
+
+
+def new_session(policy: TransportPolicy = None) -> requests.Session:
+    if policy is None:
+        policy = TransportPolicy.from_config(get_config())
+    session = requests.Session()
+    # every response encoding this install can decode, br if available
+    session.headers["Accept-Encoding"] = ACCEPT
+    adapter = policy.adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def paginate(fetch: Callable, page_size: int) -> Iterator[List[Dict]]:
+    # servers without paging answer with a plain list, which is the only page
+    next_token = None
+    while True:
+        res = fetch(limit=page_size, next_token=next_token)
+        res.raise_for_status()
+        body = json_body(res)
+        if isinstance(body, list):
+            yield body
+            return
+        yield body.get("items", [])
+        next_token = body.get("next_token")
+        if not next_token:
+            return
 
 
 class Client:
-    def __init__(self) -> None:
-        api_server, api_key = get_config()
-        self.url = f"https://{api_server}"
-        self.session = requests.Session()
-        self.session.headers.update({"x-api-key": api_key})
+    def __init__(
+        self,
+        session: requests.Session = None,
+        cache: ResponseCache = None,
+        profile: str = "default",
+        config: Config = None,
+    ) -> None:
+        self.profile = profile
+        self.config = config or Config()
+        settings = get_config(profile, self.config)
+        self.url = f"https://{settings['api_server']}"
+        self.session = session or new_session(TransportPolicy.from_config(settings))
+        self.session.headers.update({"x-api-key": settings["api_key"]})
+        self.cache = cache
+        adapter = self.session.get_adapter(self.url)
+        if isinstance(adapter, TimeoutHTTPAdapter) and adapter.limiter is None:
+            limiter = RateLimiter.from_config(profile, self.config)
+            if limiter is not None:
+                adapter.use_limiter(limiter)
+
+    def get(
+        self, url: str, params: Dict = None, fresh: bool = False
+    ) -> requests.Response:
+        if self.cache is None:
+            return self.session.get(url=url, params=params)
+        return self.cache.get(self.session, url, params, fresh)
+
+    def post(self, url: str, body: Dict = None) -> requests.Response:
+        return self.session.post(url=url, **request_body(body))
+
+    def patch(self, url: str, body: Dict = None) -> requests.Response:
+        return self.session.patch(url=url, **request_body(body))
 
 
 class TopologyClient(Client):
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(
+        self,
+        session: requests.Session = None,
+        cache: ResponseCache = None,
+        profile: str = "default",
+        config: Config = None,
+    ) -> None:
+        super().__init__(session, cache, profile, config)
         self.path = "topology"
 
-    def get_topology(self, topology_id):
-        response = self.session.get(url=f"{self.url}/{self.path}/{topology_id}")
+    def get_topology(self, topology_id, fresh: bool = False):
+        # fresh: never answered from the cache without asking the server
+        response = self.get(url=f"{self.url}/{self.path}/{topology_id}", fresh=fresh)
         return response
 
-    def get_all_topologies(self):
-        response = self.session.get(url=f"{self.url}/{self.path}")
+    def get_all_topologies(
+        self,
+        limit: int = None,
+        next_token: str = None,
+        fresh: bool = False,
+        **query,
+    ):
+        # query: fields and filter, see query.query_params
+        params = {"limit": limit, "next_token": next_token, **query}
+        response = self.get(url=f"{self.url}/{self.path}", params=params, fresh=fresh)
         return response
 
+    def iter_topology_pages(
+        self, page_size: int = DEFAULT_PAGE_SIZE, **query
+    ) -> Iterator[List[Dict]]:
+        return paginate(partial(self.get_all_topologies, **query), page_size)
+
+    def iter_topologies(self, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict]:
+        for page in self.iter_topology_pages(page_size):
+            yield from page
+
     def create_topology(self, topology_name):
         body = {
             "topology_name": topology_name,
         }
-        response = self.session.post(
+        response = self.post(
             url=f"{self.url}/{self.path}",
-            json=body,
+            body=body,
         )
         return response
 
@@ -50,17 +289,15 @@ class TopologyClient(Client):
         body = {
             "topology_config": topology_config,
         }
-        response = self.session.patch(
-            url=f"{self.url}/{self.path}/{topology_id}", json=body
-        )
+        response = self.patch(url=f"{self.url}/{self.path}/{topology_id}", body=body)
         return response
 
     def deploy(self, topology_id, dry_run):
         body = {
             "dry_run": dry_run,
         }
-        response = self.session.post(
-            url=f"{self.url}/{self.path}/{topology_id}/deploy", json=body
+        response = self.post(
+            url=f"{self.url}/{self.path}/{topology_id}/deploy", body=body
         )
         return response
 
@@ -68,14 +305,14 @@ class TopologyClient(Client):
         body = {
             "dry_run": dry_run,
         }
-        response = self.session.post(
-            url=f"{self.url}/{self.path}/{topology_id}/undeploy", json=body
+        response = self.post(
+            url=f"{self.url}/{self.path}/{topology_id}/undeploy", body=body
         )
         return response
 
     def reserve(self, topology_id, json):
-        response = self.session.post(
-            url=f"{self.url}/{self.path}/{topology_id}/reserve", json=json
+        response = self.post(
+            url=f"{self.url}/{self.path}/{topology_id}/reserve", body=json
         )
         return response
 
@@ -87,37 +324,43 @@ class TopologyClient(Client):
             "force": force,
             "account_id": account_id,
         }
-        response = self.session.post(
-            url=f"{self.url}/{self.path}/{topology_id}/release", json=body
+        response = self.post(
+            url=f"{self.url}/{self.path}/{topology_id}/release", body=body
         )
         return response
 
     def ping(self, topology_id, **kwargs):
         body = kwargs
-        response = self.session.post(
-            url=f"{self.url}/{self.path}/{topology_id}/ping", json=body
+        response = self.post(
+            url=f"{self.url}/{self.path}/{topology_id}/ping", body=body
         )
         return response
 
     def bootstrap(self, topology_id, params):
-        body = json.loads(params)
-        response = self.session.post(
-            url=f"{self.url}/{self.path}/{topology_id}/bootstrap", json=body
+        body = loads(params)
+        response = self.post(
+            url=f"{self.url}/{self.path}/{topology_id}/bootstrap", body=body
         )
         return response
 
 
 class ArtifactClient(Client):
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(
+        self,
+        session: requests.Session = None,
+        cache: ResponseCache = None,
+        profile: str = "default",
+        config: Config = None,
+    ) -> None:
+        super().__init__(session, cache, profile, config)
         self.path = "artifact"
 
     def get_artifact(self, artifact_id):
-        response = self.session.get(url=f"{self.url}/{self.path}/{artifact_id}")
+        response = self.get(url=f"{self.url}/{self.path}/{artifact_id}")
         return response
 
-    def get_all_artifacts(self):
-        response = self.session.get(url=f"{self.url}/{self.path}")
+    def get_all_artifacts(self, **query):
+        response = self.get(url=f"{self.url}/{self.path}", params=query or None)
         return response
 
     def delete_artifact(self, artifact_id):
@@ -125,7 +368,15 @@ class ArtifactClient(Client):
         return response
 
     def create_artifact(
-        self, file_name, file_version, vendor, artifact_type, storage, arch
+        self,
+        file_name,
+        file_version,
+        vendor,
+        artifact_type,
+        storage,
+        arch,
+        digest=None,
+        alias_of=None,
     ):
         body = {
             "file_name": file_name,
@@ -135,25 +386,64 @@ class ArtifactClient(Client):
             "storage": storage,
             "arch": arch,
         }
-        response = self.session.post(
+        # content digest, and the artifact whose stored bytes an alias reuses
+        if digest:
+            body["digest"] = digest
+        if alias_of:
+            body["alias_of"] = alias_of
+        response = self.post(
             url=f"{self.url}/{self.path}",
-            json=body,
+            body=body,
+        )
+        return response
+
+    def start_upload(self, artifact_id, file_size, part_size):
+        body = {
+            "file_size": file_size,
+            "part_size": part_size,
+        }
+        response = self.post(
+            url=f"{self.url}/{self.path}/{artifact_id}/upload", body=body
+        )
+        return response
+
+    def sign_upload_parts(self, artifact_id, upload_id, part_numbers):
+        body = {
+            "part_numbers": part_numbers,
+        }
+        response = self.post(
+            url=f"{self.url}/{self.path}/{artifact_id}/upload/{upload_id}/parts",
+            body=body,
+        )
+        return response
+
+    def complete_upload(self, artifact_id, upload_id, parts):
+        body = {
+            "parts": parts,
+        }
+        response = self.post(
+            url=f"{self.url}/{self.path}/{artifact_id}/upload/{upload_id}/complete",
+            body=body,
         )
         return response
 
 
 class User(Client):
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(
+        self,
+        session: requests.Session = None,
+        cache: ResponseCache = None,
+        profile: str = "default",
+        config: Config = None,
+    ) -> None:
+        super().__init__(session, cache, profile, config)
         self.path = "user"
 
     def whoami(self):
-        response = self.session.get(url=f"{self.url}/whoami")
+        response = self.get(url=f"{self.url}/whoami")
         return response
 
     def update(self, json):
         user_id = json.pop("user_id")
-        response = self.session.patch(
-            url=f"{self.url}/{self.path}/{user_id}", json=json
-        )
+        response = self.patch(url=f"{self.url}/{self.path}/{user_id}", body=json)
         return response
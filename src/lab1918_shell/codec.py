@@ -0,0 +1,78 @@
+import json
+
+from typing import Any, Dict, Union
+
+# the fastest json library installed wins, the stdlib is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+ujson = None
+if orjson is None:
+    try:
+        import ujson
+    except ImportError:
+        pass
+
+BACKEND = "orjson" if orjson else "ujson" if ujson else "json"
+# int keys from yaml, vlans: {10: users} say, become strings like json does
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def four_space(text: str) -> str:
+    # orjson only indents by two; json strings hold no raw newline, so
+    # doubling the leading spaces of every line gives the usual four
+    lines = []
+    for line in text.split("\n"):
+        depth = len(line) - len(line.lstrip(" "))
+        lines.append(line[:depth] + line if depth else line)
+    return "\n".join(lines)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson:
+        return orjson.loads(data)
+    if ujson:
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+def encode(value: Any) -> bytes:
+    # compact utf-8, for request bodies and machine readable output
+    if orjson:
+        return orjson.dumps(value, option=ORJSON_OPTIONS)
+    if ujson:
+        return ujson.dumps(
+            value, ensure_ascii=False, escape_forward_slashes=False
+        ).encode()
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps(value: Any, indent: bool = True) -> str:
+    if not indent:
+        return encode(value).decode()
+    if orjson:
+        return four_space(
+            orjson.dumps(value, option=ORJSON_OPTIONS | orjson.OPT_INDENT_2).decode()
+        )
+    if ujson:
+        return ujson.dumps(
+            value, indent=4, ensure_ascii=False, escape_forward_slashes=False
+        )
+    return json.dumps(value, indent=4, ensure_ascii=False)
+
+
+def json_body(response) -> Any:
+    # the parsed json body of a response, parsed on first use only; the
+    # shell's id index, the command and its error path share the result
+    try:
+        return response._json_body
+    except AttributeError:
+        response._json_body = loads(response.content)
+        return response._json_body
+
+
+def request_body(value: Any) -> Dict:
+    # keyword arguments that send value as a json request body
+    return {"data": encode(value), "headers": JSON_HEADERS}
@@ -0,0 +1,51 @@
+import gzip
+import logging
+
+from requests import PreparedRequest, Response
+from urllib3.util.request import ACCEPT_ENCODING
+
+from lab1918_shell.logger import logger
+
+# response encodings urllib3 decodes here: gzip and deflate, plus br when
+# brotli is installed
+ACCEPT = ACCEPT_ENCODING
+# fast enough to pay off on a slow uplink, close to level 9 on json
+GZIP_LEVEL = 6
+
+
+def compress_request(request: PreparedRequest, min_bytes: int) -> None:
+    # gzip a json request body of min_bytes or more in place; the api has to
+    # accept Content-Encoding: gzip, so this is off unless configured
+    body = request.body
+    if not min_bytes or not isinstance(body, bytes) or len(body) < min_bytes:
+        return
+    if request.headers.get("Content-Type") != "application/json":
+        return
+    if "Content-Encoding" in request.headers:
+        return
+    compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    request.body = compressed
+    request.headers["Content-Encoding"] = "gzip"
+    request.headers["Content-Length"] = str(len(compressed))
+    log_ratio(request.method, request.url, "sent", len(body), len(compressed), "gzip")
+
+
+def log_response(response: Response) -> None:
+    # reads the body first, tell() is then the size on the wire
+    encoding = response.headers.get("Content-Encoding")
+    if not encoding or not logger.isEnabledFor(logging.DEBUG):
+        return
+    size = len(response.content)
+    wire = response.raw.tell() if response.raw is not None else 0
+    request = response.request
+    log_ratio(request.method, request.url, "received", size, wire, encoding)
+
+
+def log_ratio(
+    method: str, url: str, direction: str, size: int, wire: int, encoding: str
+) -> None:
+    ratio = size / wire if wire else 0.0
+    logger.debug(
+        f"{method} {url} {direction} {size} bytes as {wire} {encoding}, "
+        f"ratio {ratio:.1f}"
+    )
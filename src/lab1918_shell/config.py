@@ -1,19 +1,27 @@
 import configparser
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
+
+API_KEY_PLACEHOLDER = "<replace with api key>"
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_APPLY_CONCURRENCY = 16
+DEFAULT_PING_CONCURRENCY = 16
 
 
 class Config:
+    # shell.ini is parsed on first use and kept, pass one Config around
+    # rather than re-reading the file for every profile lookup
     def __init__(self) -> None:
         self.config_dir = Path.home() / ".lab1918"
         self.config_file = self.config_dir / "shell.ini"
+        self._parser = None
 
     @property
     def default_config(self) -> Dict:
         config = configparser.ConfigParser()
         config["default"] = {
             "api_server": "api.lab1918.com",
-            "api_key": "<replace with api key>",
+            "api_key": API_KEY_PLACEHOLDER,
         }
         return config
 
@@ -28,10 +36,22 @@ class Config:
         with self.config_file.open(mode="w") as f:
             self.default_config.write(f)
 
+    @property
+    def parser(self) -> configparser.ConfigParser:
+        if self._parser is None:
+            self.ensure_default_config()
+            self._parser = configparser.ConfigParser()
+            self._parser.read(self.config_file)
+        return self._parser
+
+    def profiles(self) -> List[str]:
+        return self.parser.sections()
+
     def get_config(self, profile: str) -> Dict:
-        self.ensure_default_config()
-        config = configparser.ConfigParser()
-        config.read(self.config_file)
-        if profile not in config:
+        if profile not in self.parser:
             return {}
-        return dict(config[profile])
+        return dict(self.parser[profile])
+
+    def api_key_configured(self, profile: str = "default") -> bool:
+        api_key = self.get_config(profile=profile).get("api_key")
+        return api_key not in (None, "", API_KEY_PLACEHOLDER)
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from lab1918_shell.config import Config
+from lab1918_shell.records import Artifact
+
+MIB = 1024 * 1024
+DIGEST_CHUNK = 8 * MIB
+
+
+def content_digest(source: Path, chunk_size: int = DIGEST_CHUNK, workers=None) -> str:
+    # sha256 over the sha256 of every chunk. chunks are hashed concurrently,
+    # hashlib releases the GIL while hashing large buffers.
+    size = os.path.getsize(source)
+    prefix = f"sha256-tree-{chunk_size}"
+    if not size:
+        return f"{prefix}:{hashlib.sha256().hexdigest()}"
+    with open(source, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped, ThreadPoolExecutor(workers) as pool:
+
+        def chunk_digest(start):
+            with memoryview(mapped) as view, view[start : start + chunk_size] as chunk:
+                return hashlib.sha256(chunk).digest()
+
+        tree = hashlib.sha256(
+            b"".join(pool.map(chunk_digest, range(0, size, chunk_size)))
+        )
+    return f"{prefix}:{tree.hexdigest()}"
+
+
+class ArtifactIndex:
+    # ~/.lab1918/artifact_index.json: digest -> artifact id of uploads made
+    # here, plus digests of local files keyed by path, size and mtime so an
+    # unchanged image is not hashed twice
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        try:
+            self.state = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.state = {"digests": {}, "files": {}}
+
+    @classmethod
+    def from_config(cls) -> "ArtifactIndex":
+        return cls(Config().config_dir / "artifact_index.json")
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def digest(self, source: Path) -> str:
+        source = Path(source).resolve()
+        stat = source.stat()
+        key = f"{source}\n{stat.st_size}\n{stat.st_mtime_ns}"
+        files: Dict = self.state["files"]
+        if key not in files:
+            files[key] = content_digest(source)
+            self.save()
+        return files[key]
+
+    def lookup(self, digest: str, artifacts: Iterable[Artifact]) -> Optional[Artifact]:
+        known = {}
+        for each in artifacts:
+            # digests the api returns are shared by everyone, check them first
+            if each.digest == digest:
+                return each
+            known[each.artifact_id] = each
+        artifact_id = self.state["digests"].get(digest)
+        if artifact_id is None:
+            return None
+        if artifact_id not in known:
+            # deleted since it was uploaded from here
+            del self.state["digests"][digest]
+            self.save()
+            return None
+        return known[artifact_id]
+
+    def remember(self, digest: str, artifact_id: str) -> None:
+        self.state["digests"][digest] = artifact_id
+        self.save()
@@ -0,0 +1,182 @@
+import sqlite3
+import time
+
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from lab1918_shell.config import Config
+from lab1918_shell.records import Topology, decode_topologies
+
+HistoryRow = namedtuple(
+    "HistoryRow",
+    [
+        "topology_id",
+        "workflow_name",
+        "workflow_id",
+        "started_at",
+        "finished",
+        "state",
+        "seconds",
+    ],
+)
+SyncStats = namedtuple("SyncStats", ["topologies", "synced", "removed"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topologies (
+    topology_id TEXT PRIMARY KEY,
+    topology_name TEXT,
+    version INTEGER,
+    running INTEGER
+);
+CREATE TABLE IF NOT EXISTS workflows (
+    topology_id TEXT,
+    workflow_id TEXT,
+    workflow_name TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    finished INTEGER,
+    state TEXT,
+    PRIMARY KEY (topology_id, workflow_id)
+);
+CREATE INDEX IF NOT EXISTS workflows_started ON workflows (started_at);
+CREATE INDEX IF NOT EXISTS workflows_name ON workflows (workflow_name, started_at);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+# julianday() understands the iso timestamps the api returns
+SECONDS = "(julianday(finished_at) - julianday(started_at)) * 86400"
+
+
+def since_timestamp(seconds: float) -> str:
+    # same layout as the api's started_at, compared as text
+    since = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+    return since.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class WorkflowIndex:
+    # ~/.lab1918/workflows.sqlite: workflow history of every topology, synced
+    # from topology listings. a topology is only rewritten when its version
+    # moved or it had a workflow running at the last sync.
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        # readers in other processes are not blocked while one syncs
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls) -> "WorkflowIndex":
+        return cls(Config().config_dir / "workflows.sqlite")
+
+    def close(self) -> None:
+        self.db.close()
+
+    @property
+    def synced_at(self) -> float:
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'synced_at'")
+        row = row.fetchone()
+        return row[0] if row else 0.0
+
+    def sync(self, pages: Iterable[List[Dict]]) -> SyncStats:
+        known = {
+            topology_id: (version, running)
+            for topology_id, version, running in self.db.execute(
+                "SELECT topology_id, version, running FROM topologies"
+            )
+        }
+        seen, synced = set(), 0
+        with self.db:
+            for page in pages:
+                changed = []
+                for topology in decode_topologies(page):
+                    seen.add(topology.topology_id)
+                    version, running = known.get(topology.topology_id, (None, 1))
+                    if version != topology.version or running:
+                        changed.append(topology)
+                if changed:
+                    self.replace(changed)
+                    synced += len(changed)
+            removed = [(each,) for each in known if each not in seen]
+            self.db.executemany("DELETE FROM topologies WHERE topology_id = ?", removed)
+            self.db.executemany("DELETE FROM workflows WHERE topology_id = ?", removed)
+            self.db.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('synced_at', ?)", (time.time(),)
+            )
+        return SyncStats(len(seen), synced, len(removed))
+
+    def replace(self, topologies: List[Topology]) -> None:
+        ids = [(each.topology_id,) for each in topologies]
+        self.db.executemany("DELETE FROM workflows WHERE topology_id = ?", ids)
+        self.db.executemany(
+            "INSERT OR REPLACE INTO topologies VALUES (?, ?, ?, ?)",
+            (
+                (
+                    each.topology_id,
+                    each.topology_name,
+                    each.version,
+                    each.workflow is not None and each.workflow.state == "running",
+                )
+                for each in topologies
+            ),
+        )
+        self.db.executemany(
+            "INSERT OR REPLACE INTO workflows VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    each.topology_id,
+                    workflow.workflow_id,
+                    workflow.workflow_name,
+                    workflow.started_at,
+                    workflow.finished_at,
+                    workflow.finished,
+                    workflow.state,
+                )
+                for each in topologies
+                for workflow in [
+                    *each.workflows,
+                    *([each.workflow] if each.workflow else []),
+                ]
+            ),
+        )
+
+    def query(
+        self,
+        workflow_name: str = None,
+        state: str = None,
+        since: float = None,
+        topology_id: str = None,
+        slowest: bool = False,
+        limit: int = None,
+    ) -> List[HistoryRow]:
+        where, params = [], []
+        for column, value in (
+            ("workflow_name", workflow_name),
+            ("state", state),
+            ("topology_id", topology_id),
+        ):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("started_at >= ?")
+            params.append(since_timestamp(since))
+        if slowest:
+            where.append("finished_at IS NOT NULL")
+        sql = (
+            "SELECT topology_id, workflow_name, workflow_id,"
+            f" substr(started_at, 1, 19), finished, state, round({SECONDS}, 1)"
+            " FROM workflows"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {SECONDS} DESC" if slowest else " ORDER BY started_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [
+            HistoryRow._make((*row[:4], bool(row[4]), *row[5:]))
+            for row in self.db.execute(sql, params)
+        ]
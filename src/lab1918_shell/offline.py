@@ -0,0 +1,225 @@
+import os
+import requests
+import shutil
+import sqlite3
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from lab1918_shell.client import ArtifactClient, TopologyClient, User
+from lab1918_shell.codec import encode, json_body, loads
+from lab1918_shell.config import DEFAULT_PAGE_SIZE, Config
+from lab1918_shell.records import string
+
+SnapshotInfo = namedtuple(
+    "SnapshotInfo", ["profile", "exported_at", "topologies", "artifacts"]
+)
+
+SCHEMA = """
+CREATE TABLE topologies (topology_id TEXT PRIMARY KEY, item BLOB);
+CREATE TABLE artifacts (artifact_id TEXT, item BLOB);
+CREATE TABLE user (item BLOB);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+"""
+
+
+def snapshot_path(profile: str = "default", config: Config = None) -> Path:
+    return (config or Config()).config_dir / "snapshots" / f"{profile}.sqlite"
+
+
+def export_snapshot(
+    path: Path,
+    topologies: TopologyClient,
+    artifacts: ArtifactClient,
+    user: User,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> SnapshotInfo:
+    # items are stored as the api returns them, configs and workflow history
+    # included, so offline commands render exactly what online ones would.
+    # written next to path and renamed, a failed export keeps the old one
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    partial.unlink(missing_ok=True)
+    db = sqlite3.connect(partial)
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            # artifacts and the user are fetched while topologies page in
+            artifacts_res = pool.submit(artifacts.get_all_artifacts)
+            user_res = pool.submit(user.whoami)
+            with db:
+                db.executescript(SCHEMA)
+                count = 0
+                for page in topologies.iter_topology_pages(page_size):
+                    db.executemany(
+                        "INSERT OR REPLACE INTO topologies VALUES (?, ?)",
+                        (
+                            (string(each.get("topology_id")), encode(each))
+                            for each in page
+                        ),
+                    )
+                    count += len(page)
+                res = artifacts_res.result()
+                res.raise_for_status()
+                items = json_body(res)
+                db.executemany(
+                    "INSERT INTO artifacts VALUES (?, ?)",
+                    ((string(each.get("artifact_id")), encode(each)) for each in items),
+                )
+                res = user_res.result()
+                res.raise_for_status()
+                db.execute("INSERT INTO user VALUES (?)", (res.content,))
+                db.executemany(
+                    "INSERT INTO meta VALUES (?, ?)",
+                    (
+                        ("profile", topologies.profile),
+                        ("exported_at", time.time()),
+                        ("topologies", count),
+                        ("artifacts", len(items)),
+                    ),
+                )
+    except BaseException:
+        db.close()
+        partial.unlink()
+        raise
+    db.close()
+    os.replace(partial, path)
+    return read_info(path)
+
+
+def import_snapshot(source: Path, path: Path) -> SnapshotInfo:
+    # a snapshot exported elsewhere, checked before it replaces the current
+    info = read_info(source)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    shutil.copyfile(source, partial)
+    os.replace(partial, path)
+    return info
+
+
+def read_info(path: Path) -> SnapshotInfo:
+    snapshot = Snapshot(path)
+    try:
+        return snapshot.info()
+    finally:
+        snapshot.close()
+
+
+class Snapshot:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        if not self.path.is_file():
+            raise FileNotFoundError(f"no snapshot at {self.path}")
+        # read only, offline commands never change a snapshot
+        self.db = sqlite3.connect(f"{self.path.as_uri()}?mode=ro", uri=True)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def info(self) -> SnapshotInfo:
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        return SnapshotInfo._make(meta.get(field) for field in SnapshotInfo._fields)
+
+    def topology_pages(self, page_size: int) -> Iterator[List[Dict]]:
+        cursor = self.db.execute("SELECT item FROM topologies ORDER BY rowid")
+        while True:
+            rows = cursor.fetchmany(page_size)
+            if not rows:
+                return
+            yield [loads(item) for item, in rows]
+
+    def topology(self, topology_id: str) -> Optional[bytes]:
+        row = self.db.execute(
+            "SELECT item FROM topologies WHERE topology_id = ?", (topology_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def artifacts(self, artifact_id: str = None) -> List[bytes]:
+        if artifact_id is None:
+            rows = self.db.execute("SELECT item FROM artifacts ORDER BY rowid")
+        else:
+            rows = self.db.execute(
+                "SELECT item FROM artifacts WHERE artifact_id = ?", (artifact_id,)
+            )
+        return [item for item, in rows]
+
+    def user(self) -> Optional[bytes]:
+        row = self.db.execute("SELECT item FROM user").fetchone()
+        return row[0] if row else None
+
+
+def snapshot_response(url: str, content: Optional[bytes]) -> requests.Response:
+    # a response as the api would send it, a 404 when content is None
+    response = requests.Response()
+    response.url = url
+    response.headers["Content-Type"] = "application/json"
+    if content is None:
+        response.status_code = 404
+        response.reason = "Not In Snapshot"
+        response._content = b'{"message": "not in snapshot"}'
+    else:
+        response.status_code = 200
+        response._content = content
+    return response
+
+
+def json_array(items: List[bytes]) -> bytes:
+    return b"[" + b",".join(items) + b"]"
+
+
+class OfflineClient:
+    # the read methods of the api clients, answered from a snapshot
+    cache = None
+
+    def __init__(self, snapshot: Snapshot, profile: str = "default") -> None:
+        self.snapshot = snapshot
+        self.profile = profile
+        self.url = f"snapshot:{snapshot.path}"
+
+
+class OfflineTopologyClient(OfflineClient):
+    def get_topology(self, topology_id):
+        item = self.snapshot.topology(topology_id)
+        url = f"{self.url}/topology/{topology_id}"
+        return snapshot_response(url, json_array([item]) if item else None)
+
+    def iter_topology_pages(
+        self, page_size: int = DEFAULT_PAGE_SIZE, **query
+    ) -> Iterator[List[Dict]]:
+        # fields and filter are applied by the caller, as for an api
+        # without support for them
+        return self.snapshot.topology_pages(page_size)
+
+
+class OfflineArtifactClient(OfflineClient):
+    def get_artifact(self, artifact_id):
+        items = self.snapshot.artifacts(artifact_id)
+        url = f"{self.url}/artifact/{artifact_id}"
+        return snapshot_response(url, json_array(items) if items else None)
+
+    def get_all_artifacts(self, **query):
+        items = self.snapshot.artifacts()
+        return snapshot_response(f"{self.url}/artifact", json_array(items))
+
+
+class OfflineUser(OfflineClient):
+    def whoami(self):
+        return snapshot_response(f"{self.url}/whoami", self.snapshot.user())
+
+
+OFFLINE_CLIENTS = {
+    TopologyClient: OfflineTopologyClient,
+    ArtifactClient: OfflineArtifactClient,
+    User: OfflineUser,
+}
+
+
+def offline_client(
+    client_class: type, profile: str = "default", config: Config = None
+) -> OfflineClient:
+    snapshot = Snapshot(snapshot_path(profile, config))
+    return OFFLINE_CLIENTS[client_class](snapshot, profile)
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from collections import namedtuple
+from typing import Callable, List
+
+from lab1918_shell.aclient import AsyncEngine, AsyncTopologyClient, run_with_engine
+from lab1918_shell.client import TopologyClient
+from lab1918_shell.trace import percentile
+
+PingResult = namedtuple("PingResult", ["topology_id", "seq", "seconds", "error"])
+PingStats = namedtuple(
+    "PingStats",
+    ["topology_id", "sent", "failed", "min_ms", "avg_ms", "p95_ms", "max_ms"],
+)
+
+
+async def run_pings(
+    topology_ids: List[str],
+    count: int,
+    interval: float,
+    engine: AsyncEngine,
+    on_result: Callable[[PingResult], None],
+    topology_client: TopologyClient = None,
+) -> List[PingResult]:
+    client = AsyncTopologyClient(engine, topology_client)
+
+    async def pings(topology_id: str) -> List[PingResult]:
+        results = []
+        for seq in range(1, count + 1):
+            started = time.monotonic()
+            error = None
+            try:
+                res = await client.ping(topology_id)
+                res.raise_for_status()
+            except Exception as e:
+                error = str(e)
+            seconds = time.monotonic() - started
+            result = PingResult(topology_id, seq, seconds, error)
+            on_result(result)
+            results.append(result)
+            if seq < count:
+                # interval is from start to start, like ping(8)
+                await asyncio.sleep(max(0.0, interval - seconds))
+        return results
+
+    # every topology pings in sequence, at most engine.concurrency at once
+    done = await engine.gather([pings(each) for each in topology_ids])
+    return [result for results in done for result in results]
+
+
+def ping(
+    topology_ids: List[str],
+    count: int,
+    interval: float,
+    concurrency: int,
+    on_result: Callable[[PingResult], None],
+    client: TopologyClient = None,
+) -> List[PingResult]:
+    return run_with_engine(
+        concurrency,
+        client,
+        lambda engine: run_pings(
+            topology_ids, count, interval, engine, on_result, client
+        ),
+    )
+
+
+def summarize(results: List[PingResult]) -> List[PingStats]:
+    by_topology = {}
+    for result in results:
+        by_topology.setdefault(result.topology_id, []).append(result)
+    rows = []
+    for topology_id, each in by_topology.items():
+        ms = sorted(result.seconds * 1000 for result in each if not result.error)
+        failed = sum(1 for result in each if result.error)
+        if not ms:
+            rows.append(PingStats(topology_id, len(each), failed, *[None] * 4))
+            continue
+        rows.append(
+            PingStats(
+                topology_id,
+                len(each),
+                failed,
+                round(ms[0], 1),
+                round(sum(ms) / len(ms), 1),
+                round(percentile(ms, 95), 1),
+                round(ms[-1], 1),
+            )
+        )
+    return rows
@@ -0,0 +1,155 @@
+import click
+import requests
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Tuple, Type
+
+from lab1918_shell.cache import ResponseCache
+from lab1918_shell.client import Client, TransportPolicy, get_config, new_session
+from lab1918_shell.config import (
+    DEFAULT_APPLY_CONCURRENCY,
+    DEFAULT_PING_CONCURRENCY,
+    Config,
+)
+from lab1918_shell.logger import logger
+
+if TYPE_CHECKING:
+    from lab1918_shell.offline import OfflineClient
+
+
+class ClientRegistry:
+    # one session, so one connection pool, per profile; sessions, caches and
+    # clients are built on first use and shared by every command run with it
+    def __init__(self, config: Config = None, response_hooks: List = ()) -> None:
+        self.config = config or Config()
+        self.response_hooks = [*response_hooks]
+        self.sessions: Dict[str, requests.Session] = {}
+        self.caches: Dict[str, ResponseCache] = {}
+        self.clients: Dict[Tuple, Client] = {}
+
+    def profiles(self) -> List[str]:
+        # profiles with an api key, the ones --all-profiles queries
+        return [
+            each
+            for each in self.config.profiles()
+            if self.config.api_key_configured(each)
+        ]
+
+    def session(self, profile: str) -> requests.Session:
+        if profile not in self.sessions:
+            policy = TransportPolicy.from_config(get_config(profile, self.config))
+            # wide enough for `topology apply` and `ping` at default concurrency
+            policy.pool_size = max(
+                policy.pool_size, DEFAULT_APPLY_CONCURRENCY, DEFAULT_PING_CONCURRENCY
+            )
+            session = new_session(policy)
+            session.hooks["response"].extend(self.response_hooks)
+            self.sessions[profile] = session
+        return self.sessions[profile]
+
+    def cache(self, profile: str) -> ResponseCache:
+        if profile not in self.caches:
+            self.caches[profile] = ResponseCache.from_config(profile, self.config)
+        return self.caches[profile]
+
+    def client(
+        self, client_class: Type[Client], profile: str, no_cache: bool = False
+    ) -> Client:
+        key = (client_class, profile, no_cache)
+        if key not in self.clients:
+            self.clients[key] = client_class(
+                session=self.session(profile),
+                cache=None if no_cache else self.cache(profile),
+                profile=profile,
+                config=self.config,
+            )
+        return self.clients[key]
+
+    def close(self) -> None:
+        for session in self.sessions.values():
+            session.close()
+
+
+def context_registry(ctx: click.Context) -> ClientRegistry:
+    obj = ctx.obj
+    if "registry" not in obj:
+        registry = ClientRegistry(obj.get("config"))
+        # a session or cache handed in, by benchmarks say, is the default's
+        if obj.get("session") is not None:
+            registry.sessions["default"] = obj["session"]
+        if obj.get("cache") is not None:
+            registry.caches["default"] = obj["cache"]
+        obj["registry"] = registry
+    return obj["registry"]
+
+
+def context_client(
+    ctx: click.Context, client_class: Type[Client], no_cache: bool
+) -> Client:
+    # the client of the profile selected with --profile, for group callbacks
+    obj = ctx.obj
+    registry = context_registry(ctx)
+    profile = obj.get("profile", "default")
+    if obj.get("offline"):
+        return offline_context_client(ctx, client_class, profile)
+    if obj.get("all_profiles"):
+        if ctx.invoked_subcommand != "list":
+            raise click.UsageError("--all-profiles only applies to list commands")
+        if not registry.profiles():
+            logger.error("config proper api key at ~/.lab1918/shell.ini!")
+            ctx.exit(1)
+        profile = registry.profiles()[0]
+    elif not registry.config.api_key_configured(profile):
+        logger.error(
+            f"config proper api key for profile {profile} at ~/.lab1918/shell.ini!"
+        )
+        ctx.exit(1)
+    return registry.client(client_class, profile, no_cache)
+
+
+def offline_context_client(
+    ctx: click.Context, client_class: Type[Client], profile: str
+) -> "OfflineClient":
+    from lab1918_shell.offline import offline_client
+
+    if ctx.invoked_subcommand != "list":
+        raise click.UsageError("--offline only applies to list commands")
+    if ctx.obj.get("all_profiles"):
+        raise click.UsageError("--offline and --all-profiles are exclusive")
+    try:
+        client = offline_client(client_class, profile, context_registry(ctx).config)
+    except FileNotFoundError as e:
+        logger.error(f"{e}, run `lab1918 snapshot export` while online")
+        ctx.exit(1)
+    info = client.snapshot.info()
+    exported_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(info.exported_at))
+    logger.info(f"offline, snapshot of profile {profile} from {exported_at}")
+    return client
+
+
+def fan_out(
+    ctx: click.Context,
+    client_class: Type[Client],
+    fetch: Callable[[Client], object],
+    failed: List[str],
+) -> Iterator[Tuple[str, object]]:
+    # fetch from every profile at once, (profile, result) as each finishes;
+    # a failing profile is reported, added to failed and skipped
+    registry = context_registry(ctx)
+    no_cache = ctx.obj["client"].cache is None
+    profiles = registry.profiles()
+    with ThreadPoolExecutor(max_workers=len(profiles)) as pool:
+        futures = {
+            pool.submit(fetch, registry.client(client_class, each, no_cache)): each
+            for each in profiles
+        }
+        for future in as_completed(futures):
+            profile = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed.append(profile)
+                click.echo(f"profile {profile}: {e}", err=True)
+                continue
+            yield profile, result
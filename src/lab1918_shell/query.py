@@ -0,0 +1,99 @@
+import click
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from lab1918_shell.records import decode
+
+fields_option = click.option(
+    "--fields",
+    help="comma separated attributes to show, e.g. topology_id,owner,deployed",
+)
+filter_option = click.option(
+    "--filter",
+    "filters",
+    multiple=True,
+    help="only items whose attribute equals value, key=value, repeatable",
+)
+
+
+def parse_fields(value: Optional[str]) -> List[str]:
+    return [each.strip() for each in (value or "").split(",") if each.strip()]
+
+
+def parse_filters(values: Sequence[str]) -> Dict[str, str]:
+    filters = {}
+    for value in values:
+        key, sep, expected = value.partition("=")
+        if not sep or not key:
+            raise click.BadParameter(
+                f"{value!r}, expected key=value", param_hint="--filter"
+            )
+        filters[key] = expected
+    return filters
+
+
+def query_params(fields: Sequence[str], filters: Dict[str, str]) -> Dict:
+    # asks the api to project and filter; an api that ignores the parameters
+    # returns everything and select() does the same work client side
+    params = {}
+    if fields:
+        # the server must keep filtered attributes for select() to see them
+        params["fields"] = ",".join(dict.fromkeys([*fields, *filters]))
+    if filters:
+        params["filter"] = [f"{key}={value}" for key, value in filters.items()]
+    return params
+
+
+def text(value: Any) -> str:
+    # a decoded attribute as --filter compares it
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "" if value is None else str(value)
+
+
+def matches(item: Dict, filters: Dict[str, str]) -> bool:
+    for key, expected in filters.items():
+        value = item.get(key)
+        if text(decode(value) if value else None) != expected:
+            return False
+    return True
+
+
+def select(
+    items: Iterable[Dict], fields: Sequence[str], filters: Dict[str, str]
+) -> Iterator[Dict]:
+    # streaming --filter and --fields, one item at a time
+    for item in items:
+        if filters and not matches(item, filters):
+            continue
+        if fields:
+            item = {key: item[key] for key in fields if key in item}
+        yield item
+
+
+def field_row(item: Dict, fields: Sequence[str]) -> Tuple:
+    return tuple(decode(item[key]) if key in item else None for key in fields)
+
+
+def extract(
+    value: Any, path: Sequence[str], prefix: Tuple[str, ...] = ()
+) -> Iterator[Tuple[str, Any]]:
+    # (dotted path, value) at a path such as nodes.*.image; "*" matches every
+    # list item or mapping value, a number indexes a list
+    if not path:
+        yield ".".join(prefix), value
+        return
+    key, rest = path[0], path[1:]
+    if isinstance(value, list):
+        if key == "*":
+            keys = range(len(value))
+        elif key.isdigit() and int(key) < len(value):
+            keys = [int(key)]
+        else:
+            return
+        for index in keys:
+            yield from extract(value[index], rest, (*prefix, str(index)))
+    elif isinstance(value, dict):
+        keys = value.keys() if key == "*" else [key] if key in value else []
+        for each in keys:
+            yield from extract(value[each], rest, (*prefix, each))
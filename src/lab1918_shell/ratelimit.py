@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from lab1918_shell.config import Config
+from lab1918_shell.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # windows, processes are not coordinated there
+    fcntl = None
+
+# share of the rate the server announces that is actually used
+HEADROOM = 0.9
+# additive increase per unthrottled response, as a share of the configured rate
+RECOVERY = 0.05
+MIN_RATE = 0.1
+THROTTLED_STATUSES = (429, 503)
+
+
+def header(response, name: str) -> Optional[float]:
+    # draft ietf RateLimit-* headers and the older X-RateLimit-* ones
+    for key in (f"ratelimit-{name}", f"x-ratelimit-{name}"):
+        value = response.headers.get(key)
+        if value is None:
+            continue
+        try:
+            return float(value.split(",")[0].split(";")[0])
+        except ValueError:
+            return None
+    return None
+
+
+class RateLimiter:
+    # token bucket in ~/.lab1918/ratelimit/<profile>.json, read and written
+    # under an flock so every lab1918 process on the host draws from it
+    def __init__(
+        self,
+        path: Path,
+        url: str,
+        rate: float,
+        burst: int = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.path = Path(path)
+        self.url = url
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls, profile: str = "default", config: Config = None
+    ) -> Optional["RateLimiter"]:
+        config = config or Config()
+        settings = config.get_config(profile=profile)
+        rate = float(settings.get("rate_limit", 0))
+        if rate <= 0:
+            return None
+        return cls(
+            config.config_dir / "ratelimit" / f"{profile}.json",
+            f"https://{settings['api_server']}/",
+            rate,
+            int(settings.get("rate_burst", 0)),
+        )
+
+    def covers(self, url: str) -> bool:
+        # presigned s3 urls and the like do not count against the api
+        return url.startswith(self.url)
+
+    @contextmanager
+    def state(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock, open(self.path.with_suffix(".lock"), "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                state = {}
+            now = self.clock()
+            rate = min(state.get("rate", self.rate), self.rate)
+            elapsed = max(0.0, now - state.get("updated", now))
+            state.update(
+                rate=rate,
+                tokens=min(
+                    self.burst, state.get("tokens", self.burst) + elapsed * rate
+                ),
+                updated=now,
+            )
+            yield state
+            self.path.write_text(json.dumps(state))
+
+    def acquire(self) -> float:
+        # blocks until a token is free, returns the seconds waited
+        waited = 0.0
+        while True:
+            with self.state() as state:
+                wait = state.get("blocked_until", 0) - state["updated"]
+                if wait <= 0:
+                    if state["tokens"] >= 1:
+                        state["tokens"] -= 1
+                        return waited
+                    wait = (1 - state["tokens"]) / state["rate"]
+            self.sleep(wait)
+            waited += wait
+
+    def observe(self, response) -> None:
+        remaining, reset = header(response, "remaining"), header(response, "reset")
+        retry_after = response.headers.get("retry-after")
+        with self.state() as state:
+            now = state["updated"]
+            if reset is not None and reset > 1e9:
+                # epoch seconds rather than seconds left in the window
+                reset -= now
+            if response.status_code in THROTTLED_STATUSES:
+                # multiplicative decrease, everyone holds off until retry-after
+                state["rate"] = max(MIN_RATE, state["rate"] / 2)
+                state["tokens"] = 0
+                try:
+                    pause = float(retry_after)
+                except (TypeError, ValueError):
+                    pause = reset if reset is not None else 1 / state["rate"]
+                state["blocked_until"] = now + pause
+                logger.debug(f"throttled, rate now {state['rate']:.2f}/s")
+            elif remaining is not None and reset is not None and reset > 0:
+                # spread what is left of the server's window evenly over it
+                rate = HEADROOM * remaining / reset
+                state["rate"] = min(self.rate, max(MIN_RATE, rate))
+                state["tokens"] = min(state["tokens"], remaining)
+                if remaining < 1:
+                    state["blocked_until"] = now + reset
+            else:
+                state["rate"] = min(self.rate, state["rate"] + self.rate * RECOVERY)
+
+    def snapshot(self) -> Dict:
+        with self.state() as state:
+            return dict(state)
@@ -0,0 +1,194 @@
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from lab1918_shell.codec import loads
+
+FAILED_STATUSES = ("failed", "error", "aborted", "timed_out")
+REQUIRED_TOPOLOGY = itemgetter("topology_id", "topology_name", "owner", "version")
+
+
+def decode_number(raw: str):
+    try:
+        return int(raw)
+    except ValueError:
+        return float(raw)
+
+
+def decode(value: Dict) -> Any:
+    # one DynamoDB attribute value, e.g. {"M": {"a": {"S": "x"}}} -> {"a": "x"}
+    for kind, raw in value.items():
+        return DECODERS[kind](raw)
+    return None
+
+
+DECODERS = {
+    "S": lambda raw: raw,
+    "N": decode_number,
+    "BOOL": lambda raw: raw,
+    "NULL": lambda raw: None,
+    "B": lambda raw: raw,
+    "M": lambda raw: {key: decode(value) for key, value in raw.items()},
+    "L": lambda raw: [decode(value) for value in raw],
+    "SS": lambda raw: list(raw),
+    "NS": lambda raw: [decode_number(each) for each in raw],
+    "BS": lambda raw: list(raw),
+}
+
+
+def string(value: Optional[Dict], default: str = None) -> Optional[str]:
+    return value["S"] if value and "S" in value else default
+
+
+class Workflow:
+    # name, id, start and finished are what every view shows; the outcome,
+    # finished_at, status and state, is decoded only on access
+    __slots__ = ("workflow_name", "workflow_id", "started_at", "finished", "_attrs")
+
+    def __init__(self, attrs: Dict) -> None:
+        # attrs is the "M" map of a workflow attribute
+        try:
+            self.workflow_name = attrs["workflow_name"]["S"]
+            self.workflow_id = attrs["workflow_id"]["S"]
+            self.started_at = attrs["started_at"]["S"]
+            self.finished = attrs["finished"]["BOOL"] is True
+        except KeyError:
+            self.workflow_name = string(attrs.get("workflow_name"))
+            self.workflow_id = string(attrs.get("workflow_id"))
+            self.started_at = string(attrs.get("started_at"))
+            finished = attrs.get("finished")
+            self.finished = finished.get("BOOL") is True if finished else False
+        self._attrs = attrs
+
+    @property
+    def finished_at(self) -> Optional[str]:
+        return string(self._attrs.get("finished_at"))
+
+    @property
+    def status(self) -> Optional[str]:
+        status = self._attrs.get("status")
+        return status.get("S") if status else None
+
+    @property
+    def state(self) -> str:
+        get = self._attrs.get
+        failed, status = get("failed"), get("status")
+        if (failed and failed.get("BOOL") is True) or (
+            status and status.get("S", "").lower() in FAILED_STATUSES
+        ):
+            return "failed"
+        return "finished" if self.finished else "running"
+
+    @classmethod
+    def from_item(cls, value: Optional[Dict]) -> Optional["Workflow"]:
+        attrs = value.get("M") if value else None
+        return cls(attrs) if attrs else None
+
+
+class Topology:
+    # the fields every listing shows are decoded in one pass, the nested json
+    # strings, reservation and workflow history only on first access
+    __slots__ = (
+        "topology_id",
+        "topology_name",
+        "owner",
+        "version",
+        "deployed",
+        "reserved",
+        "workflow",
+        "_item",
+        "_config",
+        "_status",
+        "_workflows",
+    )
+
+    def __init__(self, item: Dict) -> None:
+        get = item.get
+        try:
+            topology_id, topology_name, owner, version = REQUIRED_TOPOLOGY(item)
+            self.topology_id = topology_id["S"]
+            self.topology_name = topology_name["S"]
+            self.owner = owner["S"]
+            self.version = int(version["N"])
+        except (KeyError, ValueError):
+            self.topology_id = string(get("topology_id"))
+            self.topology_name = string(get("topology_name"))
+            self.owner = string(get("owner"))
+            version = get("version")
+            self.version = decode_number(version["N"]) if version else None
+        deployed = get("deployed")
+        self.deployed = deployed.get("BOOL", False) if deployed else False
+        self.reserved = bool(get("reservation"))
+        workflow = get("workflow")
+        attrs = workflow.get("M") if workflow else None
+        self.workflow = Workflow(attrs) if attrs else None
+        self._item = item
+
+    @property
+    def config(self) -> Dict:
+        try:
+            return self._config
+        except AttributeError:
+            raw = string(self._item.get("topology_config"), "{}")
+            self._config = loads(raw)
+            return self._config
+
+    @property
+    def status(self) -> Dict:
+        try:
+            return self._status
+        except AttributeError:
+            raw = string(self._item.get("topology_status"), "{}")
+            self._status = loads(raw)
+            return self._status
+
+    @property
+    def reservation(self) -> Dict:
+        # raw attribute, as the api returns it
+        return self._item.get("reservation") or {}
+
+    @property
+    def workflows(self) -> List[Workflow]:
+        try:
+            return self._workflows
+        except AttributeError:
+            workflows = self._item.get("workflows") or {}
+            self._workflows = [
+                workflow
+                for workflow in map(Workflow.from_item, workflows.get("L", []))
+                if workflow is not None
+            ]
+            return self._workflows
+
+
+class Artifact:
+    __slots__ = (
+        "artifact_id",
+        "owner",
+        "file_name",
+        "artifact_type",
+        "file_version",
+        "storage",
+        "vendor",
+        "arch",
+        "digest",
+    )
+
+    def __init__(self, item: Dict) -> None:
+        get = item.get
+        self.artifact_id = string(get("artifact_id"))
+        self.owner = string(get("owner"))
+        self.file_name = string(get("file_name"))
+        self.artifact_type = string(get("artifact_type"))
+        self.file_version = string(get("file_version"))
+        self.storage = string(get("storage"))
+        self.vendor = string(get("vendor"))
+        self.arch = string(get("arch"), "x86")
+        self.digest = string(get("digest"))
+
+
+def decode_topologies(items: Iterable[Dict]) -> Iterator[Topology]:
+    return map(Topology, items)
+
+
+def decode_artifacts(items: Iterable[Dict]) -> Iterator[Artifact]:
+    return map(Artifact, items)
@@ -0,0 +1,142 @@
+import click
+
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from lab1918_shell.codec import dumps, json_body
+
+FORMATS = ["table", "json", "ndjson", "tsv", "fixed"]
+ROW_FORMATS = ("table", "tsv", "fixed")
+
+# fancy_grid needs every row before printing, past this many rows table
+# output switches to fixed width columns sized from the rows seen so far
+TABLE_MAX_ROWS = 500
+SAMPLE_ROWS = 100
+MAX_WIDTH = 48
+CHUNK_ROWS = 256
+
+format_option = click.option(
+    "--format",
+    type=click.Choice(FORMATS),
+    default="table",
+    help=f"table becomes fixed width past {TABLE_MAX_ROWS} rows, "
+    "ndjson/tsv/fixed print rows as they arrive",
+)
+
+
+def echo_lines(lines: Iterable[str]) -> None:
+    # one write per chunk rather than per row
+    lines = iter(lines)
+    while True:
+        chunk = [*islice(lines, CHUNK_ROWS)]
+        if not chunk:
+            return
+        click.echo("\n".join(chunk))
+
+
+def echo_error(e: Exception) -> None:
+    # the error, then the api's answer when there was one; connection
+    # errors, sqlite and file errors come without
+    click.echo(e, err=True)
+    response = getattr(e, "response", None)
+    if response is None:
+        return
+    try:
+        click.echo(f"{json_body(response)}", err=True)
+    except ValueError:
+        click.echo(response.text, err=True)
+
+
+def compact_output() -> bool:
+    # set by `lab1918 --compact`
+    ctx = click.get_current_context(silent=True)
+    return bool(ctx and ctx.obj and ctx.obj.get("compact"))
+
+
+def echo_json(value: Any) -> None:
+    click.echo(dumps(value, indent=not compact_output()))
+
+
+def echo_json_array(items: Iterable) -> None:
+    # same layout as json.dumps(list(items), indent=4), or on one line with
+    # --compact, a chunk of items at a time: each chunk is dumped as a list
+    # and written without its brackets
+    items = iter(items)
+    indent = not compact_output()
+    newline = "\n" if indent else ""
+    opening = "[" + newline
+    while True:
+        chunk = [*islice(items, CHUNK_ROWS)]
+        if not chunk:
+            break
+        text = dumps(chunk, indent=indent)[len(newline) + 1 : -len(newline) - 1]
+        click.echo(opening + text, nl=False)
+        opening = "," + newline
+    click.echo("[]" if opening.startswith("[") else newline + "]")
+
+
+def echo_items(items: Iterable, format: str) -> None:
+    if format == "ndjson":
+        echo_lines(dumps(each, indent=False) for each in items)
+    else:
+        echo_json_array(items)
+
+
+def cell(value) -> str:
+    return "" if value is None else str(value)
+
+
+def tsv_line(row: Sequence) -> str:
+    return "\t".join(cell(value).replace("\t", " ").replace("\n", " ") for value in row)
+
+
+def column_widths(
+    fields: Sequence[str], sample: List[Sequence], widths: Optional[Dict] = None
+) -> List[int]:
+    # declared widths win, other columns fit the sample and the header
+    widths = widths or {}
+    sizes = []
+    for i, field in enumerate(fields):
+        if field in widths:
+            sizes.append(max(widths[field], len(field)))
+            continue
+        longest = max([len(field)] + [len(cell(row[i])) for row in sample])
+        sizes.append(min(longest, MAX_WIDTH))
+    return sizes
+
+
+def fixed_line(row: Sequence, sizes: List[int]) -> str:
+    cells = []
+    for value, size in zip(row, sizes):
+        text = cell(value)
+        if len(text) > size:
+            text = text[: size - 1] + "…"
+        cells.append(text.ljust(size))
+    # last column is neither padded nor cut
+    cells[-1] = cell(row[-1])
+    return "  ".join(cells)
+
+
+def echo_rows(
+    rows: Iterable[Sequence],
+    fields: Sequence[str],
+    format: str = "table",
+    widths: Optional[Dict] = None,
+) -> None:
+    headers = [each.replace("_", "-") for each in fields]
+    rows = iter(rows)
+    if format == "tsv":
+        echo_lines(chain(["\t".join(headers)], map(tsv_line, rows)))
+        return
+    if format == "table":
+        sample = [*islice(rows, TABLE_MAX_ROWS + 1)]
+        if len(sample) <= TABLE_MAX_ROWS:
+            from tabulate import tabulate
+
+            click.echo(tabulate(sample, headers, tablefmt="fancy_grid"))
+            return
+    else:
+        sample = [*islice(rows, SAMPLE_ROWS)]
+    sizes = column_widths(fields, sample, widths)
+    lines = (fixed_line(row, sizes) for row in chain(sample, rows))
+    echo_lines(chain([fixed_line(headers, sizes)], lines))
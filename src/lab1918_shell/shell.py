@@ -0,0 +1,145 @@
+import click
+import shlex
+
+from prompt_toolkit import PromptSession
+from prompt_toolkit.completion import Completer, Completion
+from prompt_toolkit.history import FileHistory
+from requests import Response
+from typing import Dict, List, Set
+
+from lab1918_shell.cli import ALIASES, lab1918
+from lab1918_shell.codec import json_body
+from lab1918_shell.config import Config
+from lab1918_shell.logger import logger
+from lab1918_shell.profiles import ClientRegistry
+from lab1918_shell.render import echo_error
+
+EXIT_COMMANDS = ["exit", "quit"]
+
+# option -> resource whose ids complete its value
+ID_OPTIONS = {
+    "--topology-id": "topology",
+    "-t": "topology",
+    "--artifact-id": "artifact",
+}
+
+
+class IdIndex:
+    # remembers ids from every api response seen by the shell session
+    def __init__(self) -> None:
+        self.ids: Dict[str, Set[str]] = {"topology": set(), "artifact": set()}
+
+    def collect(self, response: Response, *args, **kwargs) -> Response:
+        if response.status_code != 200 or response.request is None:
+            return response
+        if response.request.method != "GET":
+            return response
+        try:
+            body = json_body(response)
+        except ValueError:
+            return response
+        for item in body if isinstance(body, list) else body.get("items", [body]):
+            if not isinstance(item, dict):
+                continue
+            for resource, ids in self.ids.items():
+                value = item.get(f"{resource}_id")
+                if isinstance(value, dict) and "S" in value:
+                    ids.add(value["S"])
+        return response
+
+
+class ShellCompleter(Completer):
+    def __init__(self, index: IdIndex) -> None:
+        self.index = index
+
+    def command(self, words: List[str]) -> click.Command:
+        ctx = click.Context(lab1918)
+        cmd = lab1918
+        for word in words:
+            if not isinstance(cmd, click.Group):
+                break
+            sub = cmd.get_command(ctx, word)
+            if sub is None:
+                break
+            cmd = sub
+        return cmd
+
+    def candidates(self, words: List[str]) -> List[str]:
+        if words and words[-1] in ID_OPTIONS:
+            return sorted(self.index.ids[ID_OPTIONS[words[-1]]])
+        cmd = self.command(words)
+        if isinstance(cmd, click.Group):
+            names = cmd.list_commands(click.Context(cmd))
+            if cmd is lab1918:
+                names = names + sorted(ALIASES) + EXIT_COMMANDS
+            return names
+        return [opt for param in cmd.params for opt in param.opts]
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+        words = text.split()
+        prefix = "" if not words or text[-1].isspace() else words.pop()
+        for candidate in self.candidates(words):
+            if candidate.startswith(prefix):
+                yield Completion(candidate, start_position=-len(prefix))
+
+
+class Shell:
+    def __init__(self) -> None:
+        self.index = IdIndex()
+        # sessions and caches of every profile used live as long as the shell
+        self.registry = ClientRegistry(response_hooks=[self.index.collect])
+        self.obj = {"registry": self.registry, "config": self.registry.config}
+
+    def run_line(self, line: str) -> int:
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            click.echo(e, err=True)
+            return 2
+        if not args:
+            return 0
+        if args[0] == "shell":
+            click.echo("already in lab1918 shell", err=True)
+            return 2
+        try:
+            code = lab1918.main(
+                args, prog_name="lab1918", obj=self.obj, standalone_mode=False
+            )
+        except click.ClickException as e:
+            e.show()
+            return e.exit_code
+        except click.Abort:
+            return 1
+        except Exception as e:
+            # a failing command must not end the session
+            echo_error(e)
+            return 1
+        return code or 0
+
+    def loop(self) -> None:
+        config = Config()
+        prompt = PromptSession(
+            history=FileHistory(str(config.config_dir / "history")),
+            completer=ShellCompleter(self.index),
+        )
+        while True:
+            try:
+                line = prompt.prompt("lab1918> ")
+            except KeyboardInterrupt:
+                continue
+            except EOFError:
+                break
+            if line.strip() in EXIT_COMMANDS:
+                break
+            self.run_line(line)
+        self.registry.close()
+
+
+@click.command()
+@click.pass_context
+def shell(ctx):
+    if not Config().api_key_configured():
+        logger.error("config proper api key at ~/.lab1918/shell.ini!")
+        ctx.exit(1)
+    Shell().loop()
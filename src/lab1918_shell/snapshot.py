@@ -0,0 +1,84 @@
+import click
+import time
+
+from lab1918_shell.config import DEFAULT_PAGE_SIZE
+from lab1918_shell.logger import logger
+from lab1918_shell.render import echo_error, echo_rows
+
+
+@click.group(
+    context_settings={"show_default": True, "help_option_names": ["-h", "--help"]},
+)
+@click.pass_context
+def snapshot(ctx):
+    ctx.ensure_object(dict)
+    if ctx.obj.get("offline") or ctx.obj.get("all_profiles"):
+        raise click.UsageError("snapshot works on one profile, online")
+
+
+def echo_info(info) -> None:
+    from lab1918_shell.offline import SnapshotInfo
+
+    exported_at = time.strftime("%Y-%m-%d %H:%M", time.localtime(info.exported_at))
+    echo_rows([info._replace(exported_at=exported_at)], SnapshotInfo._fields)
+
+
+@snapshot.command()
+@click.pass_context
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False),
+    help="file to write, default ~/.lab1918/snapshots/<profile>.sqlite",
+)
+@click.option(
+    "--page-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_PAGE_SIZE,
+    help="topologies fetched per request",
+)
+def export(ctx, output, page_size):
+    from lab1918_shell.client import ArtifactClient, TopologyClient, User
+    from lab1918_shell.offline import export_snapshot, snapshot_path
+    from lab1918_shell.profiles import context_registry
+
+    registry = context_registry(ctx)
+    profile = ctx.obj.get("profile", "default")
+    if not registry.config.api_key_configured(profile):
+        logger.error(
+            f"config proper api key for profile {profile} at ~/.lab1918/shell.ini!"
+        )
+        ctx.exit(1)
+    logger.info(f"export snapshot of profile {profile} ...")
+    started = time.monotonic()
+    try:
+        info = export_snapshot(
+            output or snapshot_path(profile, registry.config),
+            # a snapshot is of the api, never of the local response cache
+            registry.client(TopologyClient, profile, no_cache=True),
+            registry.client(ArtifactClient, profile, no_cache=True),
+            registry.client(User, profile, no_cache=True),
+            page_size,
+        )
+    except Exception as e:
+        echo_error(e)
+        ctx.exit(1)
+    logger.info(f"exported in {time.monotonic() - started:.1f}s")
+    echo_info(info)
+
+
+@snapshot.command(name="import")
+@click.pass_context
+@click.argument("source", type=click.Path(exists=True, dir_okay=False))
+def import_(ctx, source):
+    from lab1918_shell.offline import import_snapshot, snapshot_path
+
+    profile = ctx.obj.get("profile", "default")
+    try:
+        info = import_snapshot(source, snapshot_path(profile))
+    except Exception as e:
+        click.echo(f"{source} is not a snapshot: {e}", err=True)
+        ctx.exit(1)
+    if info.profile != profile:
+        logger.warning(f"snapshot of profile {info.profile} imported as {profile}")
+    echo_info(info)
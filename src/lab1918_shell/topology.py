@@ -1,22 +1,54 @@
 import click
-import json
-import yaml
+import time
 
-from lab1918_shell.config import Config
-from lab1918_shell.client import TopologyClient
+from lab1918_shell.cli import ApiGroup
+from lab1918_shell.codec import dumps, json_body, loads
+from lab1918_shell.config import (
+    DEFAULT_APPLY_CONCURRENCY,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_PING_CONCURRENCY,
+)
 from lab1918_shell.logger import logger
+from lab1918_shell.query import (
+    extract,
+    field_row,
+    fields_option,
+    filter_option,
+    parse_fields,
+    parse_filters,
+    query_params,
+    select,
+)
+from lab1918_shell.records import Topology, Workflow, decode_topologies, string
+from lab1918_shell.render import (
+    ROW_FORMATS,
+    echo_error,
+    echo_items,
+    echo_json,
+    echo_rows,
+    format_option,
+)
 
 from collections import namedtuple
-from tabulate import tabulate
 from operator import attrgetter
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from lab1918_shell.client import TopologyClient
 
 
 @click.group(
-    context_settings={"show_default": True, "help_option_names": ["-h", "--help"]}
+    cls=ApiGroup,
+    context_settings={"show_default": True, "help_option_names": ["-h", "--help"]},
 )
+@click.option("--no-cache", is_flag=True, help="bypass the local response cache")
 @click.pass_context
-def topology(ctx):
-    ctx.obj["client"] = TopologyClient()
+def topology(ctx, no_cache):
+    # deferred so --help and shell completion skip importing requests
+    from lab1918_shell.client import TopologyClient
+    from lab1918_shell.profiles import context_client
+
+    ctx.obj["client"] = context_client(ctx, TopologyClient, no_cache)
 
 
 @topology.command()
@@ -28,120 +60,415 @@ def create(ctx, topology_name):
     try:
         res = client.create_topology(topology_name)
         res.raise_for_status()
-        click.echo(json.dumps(res.json(), indent=4))
+        echo_json(json_body(res))
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
+
+
+WorkflowRow = namedtuple(
+    "WorkflowRow",
+    ["topology_id", "workflow_name", "workflow_id", "started_at", "finished"],
+)
+TopologyRow = namedtuple(
+    "TopologyRow",
+    ["name", "owner", "topology_id", "workflow", "reservation", "deployed", "version"],
+)
+PathRow = namedtuple("PathRow", ["topology_id", "path", "value"])
+WatchState = namedtuple(
+    "WatchState", ["version", "workflow_name", "workflow_id", "state"]
+)
+
+# fixed width columns whose size is known up front
+TOPOLOGY_WIDTHS = {"reservation": 5, "deployed": 5}
+WORKFLOW_WIDTHS = {"started_at": 19, "finished": 5}
+
+# attributes each view of topology list needs, the api may leave out the rest
+VIEW_FIELDS = {
+    "config": ["topology_id", "topology_config"],
+    "status": ["topology_id", "topology_status"],
+    "reservation": ["topology_id", "reservation"],
+    "workflow": ["topology_id", "workflow", "workflows"],
+}
+# what the history index keeps, configs are the bulk of a listing
+HISTORY_FIELDS = ["topology_id", "topology_name", "version", "workflow", "workflows"]
+
+EXIT_FAILED = 1
+EXIT_TIMEOUT = 124
+
+
+def workflow_rows(item: Dict) -> List[WorkflowRow]:
+    # histories are long, rows are built straight from the attributes of the
+    # history and the current workflow; a Workflow is decoded only for an
+    # entry that misses one of them
+    get = item.get
+    topology_id = string(get("topology_id"))
+    workflows = get("workflows")
+    values = (
+        [*workflows.get("L", ()), get("workflow")] if workflows else [get("workflow")]
+    )
+    rows = []
+    for value in values:
+        attrs = value.get("M") if value else None
+        if not attrs:
+            continue
+        try:
+            row = (
+                topology_id,
+                attrs["workflow_name"]["S"],
+                attrs["workflow_id"]["S"],
+                attrs["started_at"]["S"][:19],
+                attrs["finished"]["BOOL"] is True,
+            )
+        except KeyError:
+            each = Workflow(attrs)
+            row = (
+                topology_id,
+                each.workflow_name,
+                each.workflow_id,
+                (each.started_at or "")[:19],
+                each.finished,
+            )
+        rows.append(WorkflowRow._make(row))
+    return rows
+
+
+def parse_duration(value: str) -> float:
+    # 90s, 30m, 24h, 7d; a bare number is seconds
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    try:
+        if value[-1:] in units:
+            return float(value[:-1]) * units[value[-1]]
+        return float(value)
+    except ValueError:
+        raise click.BadParameter(f"{value!r}, expected e.g. 30m, 24h or 7d")
+
+
+def topology_row(topology: Topology) -> TopologyRow:
+    # _make skips the keyword handling of the namedtuple constructor
+    workflow = topology.workflow
+    if workflow is None:
+        workflow_summary = "None(None)"
+    else:
+        workflow_summary = f"{workflow.workflow_name}({workflow.state})"
+    return TopologyRow._make(
+        (
+            topology.topology_name,
+            topology.owner,
+            topology.topology_id,
+            workflow_summary,
+            topology.reserved,
+            topology.deployed,
+            topology.version,
+        )
+    )
 
 
 @topology.command()
 @click.pass_context
 @click.option("--topology-id", "-t", help="topology id")
-@click.option("--format", type=click.Choice(["json", "table"]), default="table")
+@format_option
 @click.option("--config", is_flag=True, help="only display topology config")
 @click.option("--status", is_flag=True, help="only display topology status")
 @click.option("--reservation", is_flag=True, help="only display reservation")
-@click.option("--workflow", is_flag=True, help="only display workflow")
-def list(ctx, topology_id, format, config, status, reservation, workflow):
+@click.option("--workflow", is_flag=True, help="only display workflows, newest first")
+@click.option(
+    "--page-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_PAGE_SIZE,
+    help="topologies fetched per request, rows print as each page arrives "
+    "except with --workflow",
+)
+@fields_option
+@filter_option
+@click.option(
+    "--path",
+    help="with --config or --status, only the values at a dotted path, "
+    "e.g. nodes.*.image",
+)
+def list(
+    ctx,
+    topology_id,
+    format,
+    config,
+    status,
+    reservation,
+    workflow,
+    page_size,
+    fields,
+    filters,
+    path,
+):
     client: TopologyClient = ctx.obj["client"]
     logger.info("list topologies ...")
+    fields = parse_fields(fields)
+    filters = parse_filters(filters)
+    if fields and (config or status or reservation or workflow):
+        raise click.UsageError("--fields only applies to the topology listing")
+    if path and not (config or status):
+        raise click.UsageError("--path needs --config or --status")
+    if ctx.obj.get("all_profiles"):
+        if topology_id or config or status or reservation or workflow:
+            raise click.UsageError("--all-profiles lists topologies only")
+        list_all_profiles(ctx, format, page_size, fields, filters)
+        return
+    views = dict(
+        config=config, status=status, reservation=reservation, workflow=workflow
+    )
+    view = next((name for name, flag in views.items() if flag), None)
     try:
         if topology_id:
             res = client.get_topology(topology_id)
+            res.raise_for_status()
+            pages = [json_body(res)]
         else:
-            res = client.get_all_topologies()
-        res.raise_for_status()
-        if format == "json" or config or status or reservation:
+            params = query_params(fields or VIEW_FIELDS.get(view), filters)
+            pages = client.iter_topology_pages(page_size, **params)
+        if fields or filters:
+            pages = (select(page, fields, filters) for page in pages)
+        if path:
+            attribute = "topology_config" if config else "topology_status"
+            flat = format in ROW_FORMATS
+            rows = (
+                row
+                for page in pages
+                for each in page
+                for row in path_rows(each, attribute, path.split("."), flat)
+            )
+            if flat:
+                echo_rows(rows, PathRow._fields, format)
+            else:
+                echo_items((row._asdict() for row in rows), format)
+            return
+        if format not in ROW_FORMATS or config or status or reservation:
             if config:
-                result = [
-                    json.loads(each.get("topology_config", {}).get("S", "{}"))
-                    for each in res.json()
-                ]
+                items = (
+                    each.config for page in pages for each in decode_topologies(page)
+                )
             elif status:
-                result = [
-                    json.loads(each.get("topology_status", {}).get("S", "{}"))
-                    for each in res.json()
-                ]
+                items = (
+                    each.status for page in pages for each in decode_topologies(page)
+                )
             elif reservation:
-                result = [each.get("reservation", {}) for each in res.json()]
+                items = (
+                    each.reservation
+                    for page in pages
+                    for each in decode_topologies(page)
+                )
             else:
-                result = res.json()
-            click.echo(json.dumps(result, indent=4))
+                items = (each for page in pages for each in page)
+            echo_items(items, format)
+            return
+        if fields:
+            rows = (field_row(each, fields) for page in pages for each in page)
+            echo_rows(rows, fields, format)
             return
         if workflow:
-            headers = [
-                "topology_id",
-                "workflow_name",
-                "workflow_id",
-                "started_at",
-                "finished",
-            ]
-            Row = namedtuple("Row", headers)
-            tbl = []
-            for topology in res.json():
-                topology_id = topology["topology_id"]["S"]
-                workflows = topology.get("workflows", {}).get("L", [])
-                workflow = topology.get("workflow", {})
-                if workflow is not None:
-                    workflows.append(workflow)
-                for each in workflows:
-                    row = Row(
-                        topology_id=topology_id,
-                        workflow_name=each["M"]["workflow_name"]["S"],
-                        workflow_id=each["M"]["workflow_id"]["S"],
-                        started_at=each["M"]["started_at"]["S"][:19],
-                        finished=each["M"]["finished"]["BOOL"],
-                    )
-                    tbl.append(row)
-            hdrs = [each.replace("_", "-") for each in headers]
-            click.echo(
-                tabulate(
-                    sorted(tbl, key=attrgetter("started_at"), reverse=True),
-                    hdrs,
-                    tablefmt="fancy_grid",
-                )
+            # newest first across every page, so this view prints once all
+            # pages are in; only workflow attributes are fetched for it
+            rows = sorted(
+                (row for page in pages for each in page for row in workflow_rows(each)),
+                key=attrgetter("started_at"),
+                reverse=True,
             )
+            echo_rows(rows, WorkflowRow._fields, format, WORKFLOW_WIDTHS)
             return
-        headers = [
-            "name",
-            "owner",
-            "topology_id",
-            "workflow",
-            "reservation",
-            "deployed",
-            "version",
-        ]
-        Row = namedtuple("Row", headers)
-        tbl = []
-        for each in res.json():
-            if not each.get("workflow"):
-                workflow_status = None
-            elif (
-                each.get("workflow", {}).get("M", {}).get("finished", {}).get("BOOL")
-                is True
-            ):
-                workflow_status = "finished"
-            else:
-                workflow_status = "running"
-            row = Row(
-                name=each["topology_name"]["S"],
-                owner=each["owner"]["S"],
-                topology_id=each["topology_id"]["S"],
-                workflow=each.get("workflow", {})
-                .get("M", {})
-                .get("workflow_name", {})
-                .get("S", "None")
-                + f"({workflow_status})",
-                reservation=bool(each.get("reservation")),
-                deployed=each.get("deployed", {}).get("BOOL", False),
-                version=each["version"]["N"],
+        rows = (
+            topology_row(each) for page in pages for each in decode_topologies(page)
+        )
+        echo_rows(rows, TopologyRow._fields, format, TOPOLOGY_WIDTHS)
+    except Exception as e:
+        echo_error(e)
+
+
+def path_rows(
+    item: Dict, attribute: str, path: List[str], flat: bool
+) -> Iterator[PathRow]:
+    # the nested json string is parsed, searched and dropped per topology,
+    # Topology.config would keep every config of the page alive
+    topology_id = string(item.get("topology_id"))
+    document = loads(string(item.get(attribute), "{}"))
+    for where, value in extract(document, path):
+        if flat and not isinstance(value, (str, int, float, type(None))):
+            value = dumps(value, indent=False)
+        yield PathRow._make((topology_id, where, value))
+
+
+def list_all_profiles(
+    ctx, format: str, page_size: int, fields: List[str], filters: Dict[str, str]
+) -> None:
+    from lab1918_shell.client import TopologyClient
+    from lab1918_shell.profiles import fan_out
+
+    params = query_params(fields, filters)
+
+    def fetch(client: TopologyClient) -> List[Dict]:
+        pages = client.iter_topology_pages(page_size, **params)
+        return [*select((each for page in pages for each in page), fields, filters)]
+
+    failed = []
+    results = fan_out(ctx, TopologyClient, fetch, failed)
+    if format not in ROW_FORMATS:
+        items = (
+            {"profile": {"S": profile}, **each}
+            for profile, items in results
+            for each in items
+        )
+        echo_items(items, format)
+    elif fields:
+        rows = (
+            (profile, *field_row(each, fields))
+            for profile, items in results
+            for each in items
+        )
+        echo_rows(rows, ("profile", *fields), format)
+    else:
+        rows = (
+            (profile, *topology_row(each))
+            for profile, items in results
+            for each in decode_topologies(items)
+        )
+        echo_rows(rows, ("profile", *TopologyRow._fields), format, TOPOLOGY_WIDTHS)
+    if failed:
+        ctx.exit(EXIT_FAILED)
+
+
+@topology.command()
+@click.pass_context
+@click.option("--topology-id", "-t", help="topology id")
+@click.option("--name", "workflow_name", help="workflow name, e.g. deploy")
+@click.option("--state", type=click.Choice(["running", "finished", "failed"]))
+@click.option("--since", help="started within, e.g. 30m, 24h or 7d")
+@click.option("--slowest", is_flag=True, help="longest runs first")
+@click.option("--limit", type=click.IntRange(min=1), default=50)
+@click.option(
+    "--max-age",
+    type=float,
+    default=60,
+    help="seconds the local index is used without syncing it, 0 always syncs",
+)
+@format_option
+def history(
+    ctx, topology_id, workflow_name, state, since, slowest, limit, max_age, format
+):
+    from lab1918_shell.history import HistoryRow, WorkflowIndex
+
+    client: TopologyClient = ctx.obj["client"]
+    since = parse_duration(since) if since else None
+    index = WorkflowIndex.from_config()
+    try:
+        if time.time() - index.synced_at > max_age:
+            pages = client.iter_topology_pages(**query_params(HISTORY_FIELDS, {}))
+            stats = index.sync(pages)
+            logger.info(
+                f"synced {stats.synced} of {stats.topologies} topologies, "
+                f"removed {stats.removed}"
             )
-            tbl.append(row)
-        hdrs = [each.replace("_", "-") for each in headers]
-        click.echo(tabulate(tbl, hdrs, tablefmt="fancy_grid"))
+        rows = index.query(workflow_name, state, since, topology_id, slowest, limit)
+        if format in ROW_FORMATS:
+            echo_rows(rows, HistoryRow._fields, format, WORKFLOW_WIDTHS)
+        else:
+            echo_items((each._asdict() for each in rows), format)
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
+    finally:
+        index.close()
+
+
+def watch_state(topology: Topology) -> WatchState:
+    workflow = topology.workflow
+    if workflow is None:
+        return WatchState(topology.version, None, None, None)
+    return WatchState(
+        version=topology.version,
+        workflow_name=workflow.workflow_name,
+        workflow_id=workflow.workflow_id,
+        state=workflow.state,
+    )
+
+
+def watch_transitions(
+    topology_id: str, previous: Optional[WatchState], current: WatchState
+) -> List[str]:
+    workflow = f"workflow {current.workflow_name}({current.state})"
+    if previous is None:
+        return [f"{topology_id} version {current.version} {workflow}"]
+    messages = []
+    if current.version != previous.version:
+        messages.append(
+            f"{topology_id} version {previous.version} -> {current.version}"
+        )
+    if (current.workflow_id, current.state) != (
+        previous.workflow_id,
+        previous.state,
+    ):
+        messages.append(f"{topology_id} {workflow}")
+    return messages
+
+
+@topology.command()
+@click.pass_context
+@click.option(
+    "--topology-id",
+    "-t",
+    multiple=True,
+    required=True,
+    help="topology id, repeat to watch several",
+)
+@click.option(
+    "--min-interval",
+    type=click.FloatRange(min=0.1),
+    default=2.0,
+    help="seconds between polls while a workflow is running",
+)
+@click.option(
+    "--max-interval",
+    type=click.FloatRange(min=0.1),
+    default=30.0,
+    help="longest seconds between polls when idle",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0),
+    default=0,
+    help="give up after this many seconds, 0 waits forever",
+)
+@click.option("--follow", is_flag=True, help="keep watching after workflows settle")
+def watch(ctx, topology_id, min_interval, max_interval, timeout, follow):
+    client: TopologyClient = ctx.obj["client"]
+    logger.info("watch topologies ...")
+    states = {}
+    interval = min_interval
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        changed = False
+        for each_id in topology_id:
+            try:
+                # every poll has to reach the server, a 304 is still cheap
+                res = client.get_topology(each_id, fresh=True)
+                res.raise_for_status()
+            except Exception as e:
+                logger.warning(f"poll topology {each_id} failed: {e}")
+                continue
+            for each in decode_topologies(json_body(res)):
+                current = watch_state(each)
+                for message in watch_transitions(each_id, states.get(each_id), current):
+                    click.echo(f"{time.strftime('%H:%M:%S')} {message}")
+                    changed = True
+                states[each_id] = current
+        running = any(state.state == "running" for state in states.values())
+        if not follow and len(states) == len(topology_id) and not running:
+            failed = any(state.state == "failed" for state in states.values())
+            ctx.exit(EXIT_FAILED if failed else 0)
+        if deadline is not None and time.monotonic() >= deadline:
+            click.echo("timed out waiting for workflows", err=True)
+            ctx.exit(EXIT_TIMEOUT)
+        if running or changed:
+            interval = min_interval
+        else:
+            interval = min(interval * 2, max_interval)
+        if deadline is not None:
+            interval = min(interval, max(deadline - time.monotonic(), 0))
+        time.sleep(interval)
 
 
 @topology.command()
@@ -155,8 +482,7 @@ def delete(ctx, topology_id):
         res.raise_for_status()
         click.echo(f"deleted topology {topology_id}")
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
 
 
 @topology.command()
@@ -164,27 +490,131 @@ def delete(ctx, topology_id):
 @click.option("--topology-id", "-t", help="topology id")
 @click.option("--topology-json", help="topology config json file name")
 @click.option("--topology-yaml", help="topology config yaml file name")
-def update(ctx, topology_id, topology_json, topology_yaml):
+@click.option("--dry-run", is_flag=True, help="print the changes, do not update")
+def update(ctx, topology_id, topology_json, topology_yaml, dry_run):
+    import yaml
+
+    from lab1918_shell.topology_config import (
+        Change,
+        as_sent,
+        diff,
+        format_change,
+        load_config,
+        validate,
+    )
+
     client: TopologyClient = ctx.obj["client"]
     logger.info("update topology ...")
+    if not topology_json and not topology_yaml:
+        click.echo("please specify either topology-json or topology-yaml")
+        return
     try:
         if topology_json:
-            with open(topology_json) as f:
-                config = json.loads(f.read())
-        elif topology_yaml:
-            with open(topology_yaml) as stream:
-                config = yaml.safe_load(stream)
+            config = load_config(topology_json, "json")
         else:
-            click.echo("please specify either topology-json or topology-yaml")
+            config = load_config(topology_yaml)
+        config = as_sent(config)
+    except (OSError, ValueError, TypeError, yaml.YAMLError) as e:
+        click.echo(e, err=True)
+        ctx.exit(1)
+    errors = validate(config)
+    if errors:
+        for error in errors:
+            click.echo(error, err=True)
+        ctx.exit(1)
+    try:
+        # the diff must be against what the server has now
+        res = client.get_topology(topology_id, fresh=True)
+        res.raise_for_status()
+        current = [each.config for each in decode_topologies(json_body(res))]
+        if current:
+            changes = diff(current[0], config)
+        else:
+            changes = [Change("+", "topology_config", None, config)]
+        if not changes:
+            # an unchanged PATCH still bumps version and may trigger a redeploy
+            click.echo(f"topology {topology_id} is up to date")
+            return
+        if dry_run:
+            for change in changes:
+                click.echo(format_change(change))
             return
         res = client.update_topology(topology_id, config)
         res.raise_for_status()
-        click.echo(json.dumps(res.json(), indent=4))
-    except yaml.YAMLError as e:
-        click.echo(e, err=True)
+        echo_json(json_body(res))
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
+
+
+@topology.command()
+@click.pass_context
+@click.option(
+    "--file",
+    "-f",
+    "manifest",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="fleet manifest yaml",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_APPLY_CONCURRENCY,
+    help="topologies worked on at once",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0),
+    default=0,
+    help="seconds to wait for each undeploy or reserve workflow, 0 waits forever",
+)
+@click.option("--dry-run", is_flag=True, help="print the planned steps only")
+def apply(ctx, manifest, concurrency, timeout, dry_run):
+    import yaml
+
+    from lab1918_shell.apply import SummaryRow, load_manifest, plan, summarize
+    from lab1918_shell.apply import apply as apply_plans
+
+    client: TopologyClient = ctx.obj["client"]
+    logger.info("apply topologies ...")
+    try:
+        desired, errors = load_manifest(manifest)
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        errors = [str(e)]
+    if errors:
+        for error in errors:
+            click.echo(error, err=True)
+        ctx.exit(1)
+    try:
+        current = {
+            each.topology_name: each
+            for page in client.iter_topology_pages(fresh=True)
+            for each in decode_topologies(page)
+        }
+    except Exception as e:
+        echo_error(e)
+        return
+    plans = plan(desired, current)
+    if dry_run:
+        for each in plans:
+            click.echo(f"{each.desired.name}: {' '.join(each.actions) or 'up to date'}")
+        return
+
+    def on_result(result):
+        status = f"failed: {result.error}" if result.error else "ok"
+        click.echo(f"{result.name} {result.action} {status} ({result.seconds:.2f}s)")
+
+    started = time.monotonic()
+    results = apply_plans(plans, concurrency, on_result, client, timeout)
+    echo_rows(summarize(results), SummaryRow._fields)
+    failed = {each.name for each in results if each.error}
+    unchanged = sum(1 for each in plans if not each.actions)
+    click.echo(
+        f"{len(plans)} topologies, {unchanged} up to date, {len(failed)} failed "
+        f"in {time.monotonic() - started:.1f}s"
+    )
+    if failed:
+        ctx.exit(1)
 
 
 @topology.command()
@@ -207,10 +637,9 @@ def reserve(ctx, topology_id, extra_args):
     try:
         res = client.reserve(topology_id, kwargs)
         res.raise_for_status()
-        click.echo(json.dumps(res.json(), indent=4))
+        echo_json(json_body(res))
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
 
 
 @topology.command()
@@ -225,86 +654,176 @@ def release(ctx, topology_id, reservation_id, account_id, force):
     try:
         res = client.release(topology_id, reservation_id, account_id, force)
         res.raise_for_status()
-        click.echo(json.dumps(res.json(), indent=4))
+        echo_json(json_body(res))
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
+
+
+wait_option = click.option(
+    "--wait", is_flag=True, help="follow the started workflows until they settle"
+)
+wait_timeout_option = click.option(
+    "--timeout",
+    type=click.FloatRange(min=0),
+    default=0,
+    help="with --wait, give up after this many seconds, 0 waits forever",
+)
+
+
+def start_workflows(ctx, topology_ids, action, args, wait, timeout) -> None:
+    from lab1918_shell.wait import WaitResult
+    from lab1918_shell.wait import wait as wait_all
+
+    client: TopologyClient = ctx.obj["client"]
+    if not topology_ids:
+        raise click.UsageError("give --topology-id")
+    if not wait:
+        # each answer printed as is, one topology after the other
+        for each_id in topology_ids:
+            try:
+                res = getattr(client, action)(each_id, *args)
+                res.raise_for_status()
+                echo_json(json_body(res))
+            except Exception as e:
+                echo_error(e)
+        return
+
+    def start(aclient, topology_id):
+        return getattr(aclient, action)(topology_id, *args)
+
+    def on_result(result):
+        if result.error:
+            click.echo(f"{result.topology_id} {action} failed: {result.error}")
+        else:
+            click.echo(
+                f"{result.topology_id} {action} {result.state} "
+                f"in {result.seconds:.1f}s"
+            )
+
+    results = wait_all(
+        [*topology_ids],
+        action,
+        start,
+        timeout,
+        DEFAULT_APPLY_CONCURRENCY,
+        on_result,
+        client,
+    )
+    click.echo()
+    echo_rows(
+        [each._replace(seconds=round(each.seconds, 1)) for each in results],
+        WaitResult._fields,
+    )
+    states = {each.state for each in results}
+    if states & {"failed", "error"}:
+        ctx.exit(EXIT_FAILED)
+    if "timeout" in states:
+        ctx.exit(EXIT_TIMEOUT)
 
 
 @topology.command()
 @click.pass_context
-@click.option("--topology-id", "-t", help="topology id")
+@click.option("--topology-id", "-t", multiple=True, help="topology id, repeatable")
 @click.option("--dry-run", is_flag=True, help="dry run deployment")
-def deploy(ctx, topology_id, dry_run):
-    client: TopologyClient = ctx.obj["client"]
+@wait_option
+@wait_timeout_option
+def deploy(ctx, topology_id, dry_run, wait, timeout):
+    if wait and dry_run:
+        raise click.UsageError("--wait has no workflow to follow with --dry-run")
     logger.info("deploy topology ...")
-    try:
-        res = client.deploy(topology_id, dry_run)
-        res.raise_for_status()
-        click.echo(json.dumps(res.json(), indent=4))
-    except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+    start_workflows(ctx, topology_id, "deploy", (dry_run,), wait, timeout)
 
 
 @topology.command()
 @click.pass_context
-@click.option("--topology-id", "-t", help="topology id")
+@click.option("--topology-id", "-t", multiple=True, help="topology id, repeatable")
 @click.option("--dry-run", is_flag=True, help="dry run undeployment")
-def undeploy(ctx, topology_id, dry_run):
-    client: TopologyClient = ctx.obj["client"]
+@wait_option
+@wait_timeout_option
+def undeploy(ctx, topology_id, dry_run, wait, timeout):
+    if wait and dry_run:
+        raise click.UsageError("--wait has no workflow to follow with --dry-run")
     logger.info("undeploy topology ...")
-    try:
-        res = client.undeploy(topology_id, dry_run)
-        res.raise_for_status()
-        click.echo(json.dumps(res.json(), indent=4))
-    except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+    start_workflows(ctx, topology_id, "undeploy", (dry_run,), wait, timeout)
 
 
 @topology.command()
 @click.pass_context
-@click.option("--topology-id", "-t", help="topology id")
-def ping(ctx, topology_id):
+@click.option("--topology-id", "-t", multiple=True, help="topology id, repeatable")
+@click.option("--all-deployed", is_flag=True, help="ping every deployed topology")
+@click.option("--count", "-c", type=click.IntRange(min=1), default=1)
+@click.option(
+    "--interval", "-i", type=click.FloatRange(min=0), default=1.0, help="seconds"
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_PING_CONCURRENCY,
+    help="topologies pinged at once",
+)
+def ping(ctx, topology_id, all_deployed, count, interval, concurrency):
+    from lab1918_shell.ping import PingStats, summarize
+    from lab1918_shell.ping import ping as ping_all
+
     client: TopologyClient = ctx.obj["client"]
     logger.info("ping topology ...")
-    try:
-        res = client.ping(topology_id)
-        res.raise_for_status()
-        click.echo(json.dumps(res.json(), indent=4))
-    except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+    topology_ids = [*topology_id]
+    if len(topology_ids) == 1 and count == 1 and not all_deployed:
+        # one ping of one topology prints its answer as is
+        try:
+            res = client.ping(topology_ids[0])
+            res.raise_for_status()
+            echo_json(json_body(res))
+        except Exception as e:
+            echo_error(e)
+        return
+    if all_deployed:
+        try:
+            topology_ids += [
+                each.topology_id
+                for page in client.iter_topology_pages()
+                for each in decode_topologies(page)
+                if each.deployed and each.topology_id not in topology_ids
+            ]
+        except Exception as e:
+            echo_error(e)
+            return
+    if not topology_ids:
+        raise click.UsageError("give --topology-id or --all-deployed")
+
+    def on_result(result):
+        if result.error:
+            click.echo(f"{result.topology_id} seq={result.seq} failed: {result.error}")
+        else:
+            ms = result.seconds * 1000
+            click.echo(f"{result.topology_id} seq={result.seq} time={ms:.1f} ms")
+
+    results = ping_all(topology_ids, count, interval, concurrency, on_result, client)
+    rows = summarize(results)
+    click.echo()
+    echo_rows(rows, PingStats._fields)
+    if any(row.failed for row in rows):
+        ctx.exit(EXIT_FAILED)
 
 
 @topology.command()
 @click.pass_context
-@click.option("--topology-id", "-t", help="topology id")
+@click.option("--topology-id", "-t", multiple=True, help="topology id, repeatable")
 @click.option(
     "--params", help="json string workflow input", default="{}", show_default=True
 )
-def bootstrap(ctx, topology_id, params):
-    client: TopologyClient = ctx.obj["client"]
+@wait_option
+@wait_timeout_option
+def bootstrap(ctx, topology_id, params, wait, timeout):
     logger.info(
-        f"run bootstrap workflow for topology {topology_id} with extra params {params} ..."
+        f"run bootstrap workflow for topology {', '.join(topology_id)} "
+        f"with extra params {params} ..."
     )
-    try:
-        res = client.bootstrap(topology_id, params)
-        res.raise_for_status()
-        click.echo(json.dumps(res.json(), indent=4))
-    except Exception as e:
-        click.echo(f"{e}", err=True)
-        click.echo(f"{e.response.json()}", err=True)
+    start_workflows(ctx, topology_id, "bootstrap", (params,), wait, timeout)
 
 
 def main():
-    config = Config()
-    default = config.get_config(profile="default")
-    if default["api_key"] == "<replace with api key>":
-        logger.error("config proper api key at ~/.lab1918/shell.ini!")
-    else:
-        topology(obj={})
+    topology(obj={})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import marshal
+import os
+import sys
+import tempfile
+import time
+
+from collections import namedtuple
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from lab1918_shell.codec import encode, loads
+from lab1918_shell.config import Config
+from lab1918_shell.logger import logger
+
+# list items carrying one of these keys are matched by it rather than by index
+IDENTITY_KEYS = ("hostname",)
+NODE_FIELDS = {"hostname": str, "vendor": str, "file": str, "arch": str}
+
+Change = namedtuple("Change", ["op", "path", "old", "new"])
+
+PARSE_CACHE_ENTRIES = 64
+MISSING = object()
+
+
+class ParseCache:
+    # parsed yaml by content hash, marshal loads far faster than yaml parses.
+    # marshal is tied to the python version, which is part of the key.
+    def __init__(self, cache_dir: Path, max_entries: int = PARSE_CACHE_ENTRIES):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+
+    @classmethod
+    def from_config(cls) -> "ParseCache":
+        return cls(Config().config_dir / "cache" / "parsed")
+
+    def key(self, content: bytes) -> str:
+        import yaml
+
+        digest = hashlib.sha256(content)
+        digest.update(f"{sys.version_info[:2]} {yaml.__version__}".encode())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Any:
+        path = self.cache_dir / f"{key}.marshal"
+        try:
+            value = marshal.loads(path.read_bytes())
+            os.utime(path)
+        except (OSError, EOFError, ValueError, TypeError):
+            return MISSING
+        return value
+
+    def store(self, key: str, value: Any) -> None:
+        try:
+            data = marshal.dumps(value)
+        except ValueError:
+            # timestamps and other yaml types marshal cannot hold
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.cache_dir / f"{key}.marshal")
+        entries = sorted(
+            self.cache_dir.glob("*.marshal"), key=lambda p: p.stat().st_mtime
+        )
+        for entry in entries[: -self.max_entries]:
+            entry.unlink(missing_ok=True)
+
+
+def yaml_loader():
+    import yaml
+
+    # libyaml's C parser when PyYAML was built with it, same safe semantics
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_config(path: str, kind: str = "yaml", cache: ParseCache = None) -> Any:
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        content = f.read()
+    if kind == "json":
+        config, source = json.loads(content), "json"
+    else:
+        import yaml
+
+        cache = cache or ParseCache.from_config()
+        key = cache.key(content)
+        config, source = cache.load(key), "parse cache"
+        if config is MISSING:
+            loader = yaml_loader()
+            config, source = yaml.load(content, Loader=loader), loader.__name__
+            cache.store(key, config)
+    elapsed = (time.perf_counter() - started) * 1000
+    logger.debug(f"loaded {path} in {elapsed:.1f} ms from {source}")
+    return config
+
+
+def as_sent(config: Any) -> Any:
+    # the config as the server stores it, through json: yaml int keys such
+    # as vlans: {10: users} become strings and compare equal afterwards
+    return loads(encode(config))
+
+
+def validate(config: Any) -> List[str]:
+    if not isinstance(config, dict):
+        return ["topology config must be a mapping"]
+    errors = []
+    nodes = config.get("nodes")
+    if not isinstance(nodes, list) or not nodes:
+        errors.append("nodes: a non-empty list is required")
+        nodes = []
+    hostnames = set()
+    for i, node in enumerate(nodes):
+        if not isinstance(node, dict):
+            errors.append(f"nodes[{i}]: must be a mapping")
+            continue
+        for field, kind in NODE_FIELDS.items():
+            if field in node and not isinstance(node[field], kind):
+                errors.append(f"nodes[{i}].{field}: must be a {kind.__name__}")
+        hostname = node.get("hostname")
+        if not hostname:
+            errors.append(f"nodes[{i}].hostname: required")
+        elif hostname in hostnames:
+            errors.append(f"nodes[{i}].hostname: duplicate {hostname!r}")
+        hostnames.add(hostname)
+    links = config.get("links", [])
+    if not isinstance(links, list):
+        return errors + ["links: must be a list"]
+    for i, link in enumerate(links):
+        endpoints = link.get("endpoints") if isinstance(link, dict) else None
+        if not isinstance(endpoints, list) or len(endpoints) != 2:
+            errors.append(f"links[{i}].endpoints: two endpoints are required")
+            continue
+        for endpoint in endpoints:
+            hostname = str(endpoint).split(":", 1)[0]
+            if hostname not in hostnames:
+                errors.append(f"links[{i}].endpoints: unknown node {hostname!r}")
+    return errors
+
+
+def identity(items: List) -> Optional[str]:
+    for key in IDENTITY_KEYS:
+        if not items or not all(isinstance(each, dict) for each in items):
+            return None
+        values = [each.get(key) for each in items]
+        if all(isinstance(v, str) for v in values) and len(set(values)) == len(values):
+            return key
+    return None
+
+
+def diff(old: Any, new: Any, path: str = "") -> List[Change]:
+    if isinstance(old, dict) and isinstance(new, dict):
+        return diff_children(
+            old, new, lambda key: f"{path}.{key}" if path else str(key)
+        )
+    if isinstance(old, list) and isinstance(new, list):
+        old_key, new_key = identity(old), identity(new)
+        if old_key and old_key == new_key:
+            old = {each[old_key]: each for each in old}
+            new = {each[new_key]: each for each in new}
+        else:
+            old, new = dict(enumerate(old)), dict(enumerate(new))
+        return diff_children(old, new, lambda index: f"{path}[{index}]")
+    if old == new and type(old) is type(new):
+        return []
+    return [Change("~", path, old, new)]
+
+
+def diff_children(old: Dict, new: Dict, child: Callable) -> List[Change]:
+    changes = []
+    for key in [*old, *(key for key in new if key not in old)]:
+        if key not in new:
+            changes.append(Change("-", child(key), old[key], None))
+        elif key not in old:
+            changes.append(Change("+", child(key), None, new[key]))
+        else:
+            changes.extend(diff(old[key], new[key], child(key)))
+    return changes
+
+
+def format_change(change: Change) -> str:
+    def dump(value):
+        return json.dumps(value, sort_keys=True)
+
+    if change.op == "+":
+        return f"+ {change.path}: {dump(change.new)}"
+    if change.op == "-":
+        return f"- {change.path}: {dump(change.old)}"
+    return f"~ {change.path}: {dump(change.old)} -> {dump(change.new)}"
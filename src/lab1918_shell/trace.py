@@ -0,0 +1,239 @@
+import json
+import math
+import re
+import socket
+import threading
+import time
+
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# order of the phases of one call; connection phases are missing when a
+# pooled connection was reused, rate_limit when no token had to be awaited
+PHASES = ("rate_limit", "dns", "connect", "tls", "wait", "transfer")
+
+EndpointRow = namedtuple(
+    "EndpointRow",
+    ["endpoint", "calls", "errors", "retries", "p50_ms", "p90_ms", "p99_ms", "max_ms"],
+)
+
+# path segments carrying a digit are ids, /topology/t-1a2b/deploy is counted
+# as /topology/{id}/deploy
+ID_SEGMENT = re.compile(r"^[^/]*\d[^/]*$")
+
+tracer: Optional["Tracer"] = None
+local = threading.local()
+
+
+def current_span() -> Optional["Span"]:
+    return getattr(local, "span", None)
+
+
+def endpoint(method: str, url: str) -> str:
+    path = re.sub(r"^\w+://[^/]+", "", url).split("?", 1)[0]
+    segments = ["{id}" if ID_SEGMENT.match(each) else each for each in path.split("/")]
+    return f"{method} {'/'.join(segments)}"
+
+
+class Span:
+    __slots__ = (
+        "method",
+        "url",
+        "endpoint",
+        "start",
+        "phases",
+        "status",
+        "request_bytes",
+        "response_bytes",
+        "retries",
+        "error",
+        "seconds",
+    )
+
+    def __init__(self, request) -> None:
+        self.method = request.method
+        self.url = request.url
+        self.endpoint = endpoint(request.method, request.url)
+        self.start = time.time()
+        self.phases: Dict[str, float] = {}
+        self.status = None
+        self.request_bytes = int(request.headers.get("Content-Length", 0))
+        self.response_bytes = 0
+        self.retries = 0
+        self.error = None
+        self.seconds = 0.0
+
+    def add(self, phase: str, seconds: float) -> None:
+        # retried calls add up the phases of every attempt
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def to_dict(self) -> Dict:
+        return {
+            "start": self.start,
+            "method": self.method,
+            "url": self.url,
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "retries": self.retries,
+            "reused_connection": "connect" not in self.phases,
+            "phases_ms": {
+                phase: round(self.phases[phase] * 1000, 3)
+                for phase in PHASES
+                if phase in self.phases
+            },
+            "total_ms": round(self.seconds * 1000, 3),
+            "error": self.error,
+        }
+
+
+class TracedConnectionMixin:
+    # connect() is dns + tcp connect in _new_conn, then the tls handshake
+    def _new_conn(self):
+        span = current_span()
+        started = time.perf_counter()
+        dns = span.phases.get("dns", 0.0) if span else 0.0
+        try:
+            return super()._new_conn()
+        finally:
+            if span:
+                resolved = span.phases.get("dns", 0.0) - dns
+                span.add("connect", time.perf_counter() - started - resolved)
+
+    def connect(self):
+        span = current_span()
+        if span is None or not isinstance(self, HTTPSConnection):
+            return super().connect()
+        started = time.perf_counter()
+        before = span.phases.get("dns", 0.0) + span.phases.get("connect", 0.0)
+        try:
+            return super().connect()
+        finally:
+            after = span.phases.get("dns", 0.0) + span.phases.get("connect", 0.0)
+            span.add("tls", time.perf_counter() - started - (after - before))
+
+
+class TracedHTTPConnection(TracedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TracedHTTPSConnection(TracedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TracedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TracedHTTPConnection
+
+
+class TracedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TracedHTTPSConnection
+
+
+POOL_CLASSES = {"http": TracedHTTPConnectionPool, "https": TracedHTTPSConnectionPool}
+
+
+def timed_getaddrinfo(getaddrinfo):
+    def wrapper(*args, **kwargs):
+        span = current_span()
+        started = time.perf_counter()
+        try:
+            return getaddrinfo(*args, **kwargs)
+        finally:
+            if span:
+                span.add("dns", time.perf_counter() - started)
+
+    wrapper.__wrapped__ = getaddrinfo
+    return wrapper
+
+
+def percentile(values: List[float], q: float) -> float:
+    # nearest rank on sorted values
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+class Tracer:
+    # spans are appended to the trace file as json lines when a call ends
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "w")
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+
+    def begin(self, request) -> Span:
+        span = Span(request)
+        local.span = span
+        return span
+
+    def end(
+        self,
+        span: Span,
+        sent: float,
+        response=None,
+        error: Exception = None,
+        stream: bool = False,
+    ) -> None:
+        # sent is when the adapter took the request, past any rate limit
+        try:
+            connection = sum(span.phases.get(phase, 0.0) for phase in PHASES[1:4])
+            span.add("wait", time.perf_counter() - sent - connection)
+            if response is not None:
+                # headers are in once the adapter returns, the body is read
+                # here rather than by the session so its transfer is timed
+                span.status = response.status_code
+                retries = getattr(response.raw, "retries", None)
+                span.retries = len(retries.history) if retries else 0
+                if not stream:
+                    started = time.perf_counter()
+                    content = response.content
+                    span.add("transfer", time.perf_counter() - started)
+                    span.response_bytes = response.raw.tell() or len(content)
+            if error is not None:
+                span.error = str(error)
+        finally:
+            local.span = None
+            span.seconds = sum(span.phases.values())
+            with self.lock:
+                self.spans.append(span)
+                self.file.write(json.dumps(span.to_dict()) + "\n")
+                self.file.flush()
+
+    def summary(self) -> List[EndpointRow]:
+        by_endpoint: Dict[str, List[Span]] = {}
+        for span in self.spans:
+            by_endpoint.setdefault(span.endpoint, []).append(span)
+        rows = []
+        for name, spans in sorted(by_endpoint.items()):
+            ms = sorted(span.seconds * 1000 for span in spans)
+            rows.append(
+                EndpointRow(
+                    name,
+                    len(spans),
+                    sum(1 for span in spans if span.error or (span.status or 0) >= 400),
+                    sum(span.retries for span in spans),
+                    *(round(percentile(ms, q), 1) for q in (50, 90, 99)),
+                    round(ms[-1], 1),
+                )
+            )
+        return rows
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def start(path: str) -> Tracer:
+    global tracer
+    tracer = Tracer(path)
+    if not hasattr(socket.getaddrinfo, "__wrapped__"):
+        socket.getaddrinfo = timed_getaddrinfo(socket.getaddrinfo)
+    return tracer
+
+
+def stop() -> None:
+    global tracer
+    if tracer is not None:
+        tracer.close()
+    tracer = None
+    socket.getaddrinfo = getattr(socket.getaddrinfo, "__wrapped__", socket.getaddrinfo)
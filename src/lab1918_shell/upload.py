@@ -0,0 +1,179 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+import requests
+import tempfile
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from lab1918_shell.client import (
+    ArtifactClient,
+    TransportPolicy,
+    get_config,
+    new_session,
+)
+from lab1918_shell.codec import json_body
+from lab1918_shell.config import Config
+
+MIB = 1024 * 1024
+DEFAULT_PART_SIZE = 64 * MIB
+MIN_PART_SIZE = 5 * MIB
+MAX_PARTS = 10000
+DEFAULT_UPLOAD_WORKERS = 4
+SIGN_BATCH = 100
+
+
+def part_size_for(file_size: int, part_size: int = DEFAULT_PART_SIZE) -> int:
+    # s3 multipart limits: parts of at least 5 MiB, at most 10000 of them
+    return max(part_size, MIN_PART_SIZE, math.ceil(file_size / MAX_PARTS))
+
+
+class UploadManifest:
+    # progress of one multipart upload, rewritten after every finished part.
+    # keyed by path, size and mtime, a modified file starts a new upload.
+    def __init__(self, path: Path, state: Dict) -> None:
+        self.path = path
+        self.state = state
+        self.lock = threading.Lock()
+
+    @classmethod
+    def for_file(cls, source: Path, uploads_dir: Path = None) -> "UploadManifest":
+        source = Path(source).resolve()
+        stat = source.stat()
+        identity = f"{source}\n{stat.st_size}\n{stat.st_mtime_ns}"
+        key = hashlib.sha256(identity.encode()).hexdigest()
+        uploads_dir = uploads_dir or Config().config_dir / "uploads"
+        path = Path(uploads_dir) / f"{key}.json"
+        try:
+            state = json.loads(path.read_text())
+        except (OSError, ValueError):
+            state = {"source": str(source), "size": stat.st_size, "parts": {}}
+        return cls(path, state)
+
+    @property
+    def started(self) -> bool:
+        return "upload_id" in self.state
+
+    @property
+    def total_parts(self) -> int:
+        return max(1, math.ceil(self.state["size"] / self.state["part_size"]))
+
+    def part_range(self, part_number: int) -> Tuple[int, int]:
+        start = (part_number - 1) * self.state["part_size"]
+        return start, min(start + self.state["part_size"], self.state["size"])
+
+    def pending(self) -> List[int]:
+        done = self.state["parts"]
+        return [n for n in range(1, self.total_parts + 1) if str(n) not in done]
+
+    def part_done(self, part_number: int, etag: str) -> None:
+        with self.lock:
+            self.state["parts"][str(part_number)] = etag
+            self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def remove(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class MultipartUpload:
+    def __init__(
+        self,
+        client: ArtifactClient,
+        manifest: UploadManifest,
+        workers: int = DEFAULT_UPLOAD_WORKERS,
+        session: requests.Session = None,
+    ) -> None:
+        self.client = client
+        self.manifest = manifest
+        self.workers = workers
+        if session is None:
+            # presigned part urls carry their own auth, no api key towards s3
+            settings = get_config(client.profile, client.config)
+            policy = TransportPolicy.from_config(settings)
+            policy.pool_size = max(policy.pool_size, workers)
+            session = new_session(policy)
+        self.session = session
+
+    def begin(self, artifact_id: str, part_size: int) -> None:
+        state = self.manifest.state
+        res = self.client.start_upload(artifact_id, state["size"], part_size)
+        res.raise_for_status()
+        state.update(
+            artifact_id=artifact_id,
+            upload_id=json_body(res)["upload_id"],
+            part_size=part_size,
+        )
+        self.manifest.save()
+
+    def sign(self, part_numbers: List[int]) -> Dict[int, str]:
+        # urls are signed on every run, ones from an earlier run may be expired
+        state = self.manifest.state
+        urls = {}
+        for i in range(0, len(part_numbers), SIGN_BATCH):
+            res = self.client.sign_upload_parts(
+                state["artifact_id"],
+                state["upload_id"],
+                part_numbers[i : i + SIGN_BATCH],
+            )
+            res.raise_for_status()
+            urls.update((int(n), url) for n, url in json_body(res)["urls"].items())
+        return urls
+
+    def put_part(self, mapped: mmap.mmap, part_number: int, url: str) -> int:
+        start, end = self.manifest.part_range(part_number)
+        # zero copy slice of the mapping, released before the mmap closes
+        with memoryview(mapped) as view, view[start:end] as body:
+            res = self.session.put(url, data=body)
+        res.raise_for_status()
+        self.manifest.part_done(part_number, res.headers["ETag"])
+        return end - start
+
+    def send_parts(self, progress: Callable[[int], None] = None) -> None:
+        part_numbers = self.manifest.pending()
+        if not part_numbers:
+            return
+        urls = self.sign(part_numbers)
+        with open(self.manifest.state["source"], "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mapped, ThreadPoolExecutor(self.workers) as pool:
+            futures = [
+                pool.submit(self.put_part, mapped, n, urls[n]) for n in part_numbers
+            ]
+            try:
+                for future in as_completed(futures):
+                    sent = future.result()
+                    if progress:
+                        progress(sent)
+            except BaseException:
+                # finished parts are in the manifest, the rest waits for a rerun
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def complete(self) -> requests.Response:
+        state = self.manifest.state
+        parts = [
+            {"part_number": int(n), "etag": etag}
+            for n, etag in sorted(state["parts"].items(), key=lambda p: int(p[0]))
+        ]
+        res = self.client.complete_upload(
+            state["artifact_id"], state["upload_id"], parts
+        )
+        res.raise_for_status()
+        self.manifest.remove()
+        return res
@@ -1,51 +1,92 @@
 import click
-import json
 
-from lab1918_shell.config import Config
-from lab1918_shell.client import User
+from lab1918_shell.cli import ApiGroup
+from lab1918_shell.codec import json_body
 from lab1918_shell.logger import logger
+from lab1918_shell.render import (
+    echo_error,
+    echo_items,
+    echo_json,
+    echo_rows,
+    format_option,
+)
 
 from collections import namedtuple
-from tabulate import tabulate
-from requests import Response
-from typing import Tuple, List
+from typing import TYPE_CHECKING, Dict, Tuple, List
+
+if TYPE_CHECKING:
+    from lab1918_shell.client import User
+    from requests import Response
 
 
-def get_user_table(response: Response) -> Tuple[List, List]:
+def get_user_table(response: "Response") -> Tuple[List, List]:
     tbl = []
     hdrs = ["setting", "value"]
     Row = namedtuple("Row", hdrs)
-    for key, value in response.json().items():
+    for key, value in json_body(response).items():
         row = Row(setting=key.replace("_", "-"), value=value)
         tbl.append(row)
     return hdrs, tbl
 
 
 @click.group(
-    context_settings={"show_default": True, "help_option_names": ["-h", "--help"]}
+    cls=ApiGroup,
+    context_settings={"show_default": True, "help_option_names": ["-h", "--help"]},
 )
+@click.option("--no-cache", is_flag=True, help="bypass the local response cache")
 @click.pass_context
-def user(ctx):
-    ctx.obj["client"] = User()
+def user(ctx, no_cache):
+    from lab1918_shell.client import User
+    from lab1918_shell.profiles import context_client
+
+    ctx.obj["client"] = context_client(ctx, User, no_cache)
 
 
 @user.command()
 @click.pass_context
-@click.option("--format", type=click.Choice(["json", "table"]), default="table")
+@format_option
 def list(ctx, format):
     client: User = ctx.obj["client"]
     logger.info("whoami ...")
+    if ctx.obj.get("all_profiles"):
+        list_all_profiles(ctx, format)
+        return
     try:
         res = client.whoami()
         res.raise_for_status()
         if format == "json":
-            click.echo(json.dumps(res.json(), indent=4))
+            echo_json(json_body(res))
+        elif format == "ndjson":
+            echo_items([json_body(res)], format)
         else:
             headers, table = get_user_table(res)
-            click.echo(tabulate(table, headers, tablefmt="fancy_grid"))
+            echo_rows(table, headers, format)
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
+
+
+def list_all_profiles(ctx, format: str) -> None:
+    from lab1918_shell.client import User
+    from lab1918_shell.profiles import fan_out
+
+    def fetch(client: User) -> Dict:
+        res = client.whoami()
+        res.raise_for_status()
+        return json_body(res)
+
+    failed = []
+    results = fan_out(ctx, User, fetch, failed)
+    if format in ("json", "ndjson"):
+        echo_items(({"profile": profile, **each} for profile, each in results), format)
+    else:
+        rows = (
+            (profile, key.replace("_", "-"), value)
+            for profile, each in results
+            for key, value in each.items()
+        )
+        echo_rows(rows, ["profile", "setting", "value"], format)
+    if failed:
+        ctx.exit(1)
 
 
 @user.command()
@@ -70,12 +111,14 @@ def update(
     aws_instance_size,
     aws_reservation_size,
 ):
+    from tabulate import tabulate
+
     client: User = ctx.obj["client"]
     logger.info("change user setting ...")
     try:
         res = client.whoami()
         res.raise_for_status()
-        user = res.json()
+        user = json_body(res)
         new_setting = {"user_id": user["user_id"]}
         if aws_region:
             new_setting["aws_region"] = aws_region
@@ -90,17 +133,11 @@ def update(
         headers, table = get_user_table(result)
         click.echo(tabulate(table, headers, tablefmt="fancy_grid"))
     except Exception as e:
-        click.echo(e, err=True)
-        click.echo(f"{e.response.json()}", err=True)
+        echo_error(e)
 
 
 def main():
-    config = Config()
-    default = config.get_config(profile="default")
-    if default["api_key"] == "<replace with api key>":
-        logger.error("config proper api key at ~/.lab1918/shell.ini!")
-    else:
-        user(obj={})
+    user(obj={})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+from collections import namedtuple
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from lab1918_shell.aclient import AsyncEngine, AsyncTopologyClient, run_with_engine
+from lab1918_shell.client import TopologyClient
+from lab1918_shell.codec import json_body
+from lab1918_shell.records import Workflow, decode_topologies
+
+WaitResult = namedtuple(
+    "WaitResult", ["topology_id", "action", "workflow_id", "state", "seconds", "error"]
+)
+
+# seconds between polls of one topology, doubling while its workflow runs
+MIN_POLL_INTERVAL = 2.0
+MAX_POLL_INTERVAL = 30.0
+
+Start = Callable[[AsyncTopologyClient, str], Awaitable]
+
+
+async def current_workflow(
+    client: AsyncTopologyClient, topology_id: str
+) -> Optional[Workflow]:
+    # every poll has to reach the server, a 304 is still cheap
+    res = await client.get_topology(topology_id, fresh=True)
+    res.raise_for_status()
+    for each in decode_topologies(json_body(res)):
+        return each.workflow
+    return None
+
+
+async def follow_workflow(
+    client: AsyncTopologyClient,
+    topology_id: str,
+    previous_id: Optional[str],
+    deadline: Optional[float],
+) -> Tuple[str, Optional[Workflow]]:
+    # polls with backoff until a workflow other than previous_id settles,
+    # (state, workflow); ("timeout", ..) once the monotonic deadline passed
+    interval = MIN_POLL_INTERVAL
+    while True:
+        if deadline is not None:
+            interval = min(interval, max(deadline - time.monotonic(), 0))
+        await asyncio.sleep(interval)
+        try:
+            workflow = await current_workflow(client, topology_id)
+        except Exception:
+            # a failed poll is retried, the workflow keeps running
+            workflow = None
+        started_new = workflow and workflow.workflow_id != previous_id
+        if started_new and workflow.state != "running":
+            return workflow.state, workflow
+        if deadline is not None and time.monotonic() >= deadline:
+            return "timeout", workflow if started_new else None
+        interval = min(interval * 2, MAX_POLL_INTERVAL)
+
+
+async def run_waits(
+    topology_ids: List[str],
+    action: str,
+    start: Start,
+    timeout: float,
+    engine: AsyncEngine,
+    on_result: Callable[[WaitResult], None],
+    topology_client: TopologyClient = None,
+) -> List[WaitResult]:
+    client = AsyncTopologyClient(engine, topology_client)
+    deadline = time.monotonic() + timeout if timeout else None
+
+    async def run(topology_id: str) -> WaitResult:
+        started = time.monotonic()
+
+        def done(state, workflow=None, error=None) -> WaitResult:
+            workflow_id = workflow.workflow_id if workflow else None
+            seconds = time.monotonic() - started
+            result = WaitResult(topology_id, action, workflow_id, state, seconds, error)
+            on_result(result)
+            return result
+
+        try:
+            # the workflow the action starts is the first one after this
+            previous = await current_workflow(client, topology_id)
+            res = await start(client, topology_id)
+            res.raise_for_status()
+        except Exception as e:
+            return done("error", error=str(e))
+        previous_id = previous.workflow_id if previous else None
+        state, workflow = await follow_workflow(
+            client, topology_id, previous_id, deadline
+        )
+        return done(state, workflow)
+
+    # every topology is followed at once, the engine bounds the requests
+    return await engine.gather(
+        [run(each) for each in topology_ids], limit=len(topology_ids)
+    )
+
+
+def wait(
+    topology_ids: List[str],
+    action: str,
+    start: Start,
+    timeout: float,
+    concurrency: int,
+    on_result: Callable[[WaitResult], None],
+    client: TopologyClient = None,
+) -> List[WaitResult]:
+    return run_with_engine(
+        concurrency,
+        client,
+        lambda engine: run_waits(
+            topology_ids, action, start, timeout, engine, on_result, client
+        ),
+    )
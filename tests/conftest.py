@@ -7,4 +7,77 @@
     - https://docs.pytest.org/en/stable/writing_plugins.html
 """
 
-# import pytest
+import json as jsonlib
+import pytest
+import requests
+
+from requests.hooks import dispatch_hook
+from urllib.parse import parse_qsl, urlsplit
+
+
+class FakeApi:
+    """Route ``requests.Session.request`` calls to in-memory handlers
+
+    A handler receives ``(query, body)`` and returns ``(status, payload)``
+    or ``(status, payload, headers)``. ``body`` is the json payload, or the
+    raw bytes for ``data=`` requests.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.calls = []
+
+    def route(self, method, path, handler):
+        self.routes[(method.upper(), path)] = handler
+
+    def request(
+        self, session, method, url, params=None, json=None, data=None, **kwargs
+    ):
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query))
+        query.update({k: v for k, v in (params or {}).items() if v is not None})
+        headers = dict(session.headers)
+        headers.update(kwargs.get("headers") or {})
+        if data is not None and headers.get("Content-Type") == "application/json":
+            json, data = jsonlib.loads(data), None
+        self.calls.append((method.upper(), parts.path, query, json, headers))
+        # a route may name the host, "api.eu.lab1918.com/topology" say
+        handler = self.routes.get(
+            (method.upper(), parts.netloc + parts.path)
+        ) or self.routes.get((method.upper(), parts.path))
+        if handler is None:
+            result = (404, {"message": "not found"})
+        else:
+            result = handler(query, json if data is None else bytes(data))
+        status, payload = result[:2]
+        response = requests.Response()
+        response.status_code = status
+        response.url = url
+        response.request = requests.Request(method, url).prepare()
+        response.headers.update(result[2] if len(result) > 2 else {})
+        response._content = b"" if payload is None else jsonlib.dumps(payload).encode()
+        return dispatch_hook("response", session.hooks, response)
+
+
+@pytest.fixture
+def lab1918_home(tmp_path, monkeypatch):
+    """Point ``~/.lab1918/shell.ini`` at a temporary, configured profile"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    config_dir = tmp_path / ".lab1918"
+    config_dir.mkdir()
+    (config_dir / "shell.ini").write_text(
+        "[default]\napi_server = api.lab1918.com\napi_key = test-key\n"
+    )
+    return config_dir
+
+
+@pytest.fixture
+def fake_api(lab1918_home, monkeypatch):
+    """In-memory lab1918 API behind every ``requests.Session``"""
+    api = FakeApi()
+
+    def request(session, *args, **kwargs):
+        return api.request(session, *args, **kwargs)
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    return api
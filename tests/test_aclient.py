@@ -0,0 +1,109 @@
+import asyncio
+import json as jsonlib
+import threading
+
+from lab1918_shell.aclient import (
+    AsyncArtifactClient,
+    AsyncEngine,
+    AsyncTopologyClient,
+    AsyncUser,
+    gather_bounded,
+    run_with_engine,
+)
+from lab1918_shell.client import TopologyClient
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+class FakeResponse:
+    def __init__(self, method, url, data=None):
+        self.method = method
+        self.url = url
+        self.body = jsonlib.loads(data) if data else None
+
+
+def test_gather_bounded_limit():
+    """At most `limit` awaitables in flight, results in input order"""
+    in_flight = 0
+    peak = 0
+
+    async def work(i):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return i
+
+    results = asyncio.run(gather_bounded((work(i) for i in range(50)), limit=5))
+    assert results == list(range(50))
+    assert peak == 5
+
+
+def test_async_clients_share_session(lab1918_home):
+    """Async clients reuse one session and run calls concurrently"""
+    lock = threading.Lock()
+    calls = []
+    # every deploy waits here until all 20 are in flight at once
+    barrier = threading.Barrier(20, timeout=10)
+
+    def request(method, url, **kwargs):
+        if url.endswith("/deploy"):
+            barrier.wait()
+        with lock:
+            calls.append((method, url))
+        return FakeResponse(method, url, kwargs.get("data"))
+
+    async def run():
+        async with AsyncEngine(concurrency=20) as engine:
+            engine.session.request = request
+            topology = AsyncTopologyClient(engine)
+            user = AsyncUser(engine)
+            assert topology.client.session is user.client.session
+            responses = await engine.gather(
+                [topology.deploy(f"t{i}", dry_run=True) for i in range(20)]
+            )
+            whoami = await user.whoami()
+            return responses, whoami
+
+    responses, whoami = asyncio.run(run())
+    assert [r.url for r in responses] == [
+        f"https://api.lab1918.com/topology/t{i}/deploy" for i in range(20)
+    ]
+    assert all(r.body == {"dry_run": True} for r in responses)
+    assert whoami.url == "https://api.lab1918.com/whoami"
+    assert len(calls) == 21
+
+
+def test_list_query_forwarded(fake_api):
+    fake_api.route("GET", "/topology", lambda query, body: (200, []))
+    fake_api.route("GET", "/artifact", lambda query, body: (200, []))
+
+    async def run():
+        async with AsyncEngine(concurrency=2) as engine:
+            await AsyncTopologyClient(engine).get_all_topologies(
+                limit=5, fields="topology_id", filter=["deployed=true"]
+            )
+            await AsyncArtifactClient(engine).get_all_artifacts(fields="vendor")
+
+    asyncio.run(run())
+    (_, _, topologies, _, _), (_, _, artifacts, _, _) = fake_api.calls
+    assert topologies == {
+        "limit": 5,
+        "fields": "topology_id",
+        "filter": ["deployed=true"],
+    }
+    assert artifacts == {"fields": "vendor"}
+
+
+def test_run_with_engine_borrows_client_session(lab1918_home):
+    client = TopologyClient()
+
+    async def main(engine):
+        return engine.session, engine.concurrency, engine.owns_session
+
+    session, concurrency, owned = run_with_engine(3, client, main)
+    assert session is client.session
+    assert (concurrency, owned) == (3, False)
@@ -0,0 +1,183 @@
+import json
+import requests
+
+from click.testing import CliRunner
+
+from lab1918_shell import wait
+from lab1918_shell.topology import topology
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+CONFIG = {"nodes": [{"hostname": "r1"}, {"hostname": "r2"}]}
+
+
+def existing(i, config, deployed=False):
+    return {
+        "topology_id": {"S": f"t{i}"},
+        "topology_name": {"S": f"lab-{i}"},
+        "owner": {"S": "igp2bgp"},
+        "version": {"N": "1"},
+        "deployed": {"BOOL": deployed},
+        "topology_config": {"S": json.dumps(config)},
+    }
+
+
+def reserved(finished, failed=False):
+    workflow = {
+        "workflow_name": {"S": "reserve"},
+        "workflow_id": {"S": "w1"},
+        "started_at": {"S": "2024-01-01T00:00:00.000000"},
+        "finished": {"BOOL": finished},
+    }
+    if failed:
+        workflow["status"] = {"S": "FAILED"}
+    return {
+        "topology_id": {"S": "t3"},
+        "version": {"N": "2"},
+        "workflow": {"M": workflow},
+    }
+
+
+def fleet(fake_api, tmp_path, fail=None):
+    (tmp_path / "lab.yaml").write_text(json.dumps(CONFIG))
+    manifest = tmp_path / "fleet.yaml"
+    manifest.write_text(
+        "defaults:\n"
+        "  config: lab.yaml\n"
+        "  deployed: true\n"
+        "topologies:\n"
+        "- name: lab-1\n"
+        "- name: lab-2\n"
+        "- name: lab-3\n"
+        "  reserve: {aws_region: us-east-1}\n"
+        "- name: lab-4\n"
+        "  deployed: false\n"
+    )
+    topologies = [
+        existing(1, CONFIG, deployed=True),
+        existing(2, {"nodes": [{"hostname": "r1"}]}),
+        existing(4, CONFIG, deployed=True),
+    ]
+    fake_api.route("GET", "/topology", lambda query, body: (200, topologies))
+    fake_api.route(
+        "POST", "/topology", lambda query, body: (200, {"topology_id": "t3"})
+    )
+    for i in (2, 3):
+        fake_api.route("PATCH", f"/topology/t{i}", lambda query, body: (200, {}))
+        status = 500 if fail == f"t{i}" else 200
+        fake_api.route("POST", f"/topology/t{i}/deploy", lambda q, b, s=status: (s, {}))
+    fake_api.route("POST", "/topology/t3/reserve", lambda query, body: (200, {}))
+    # before the reserve, while its workflow runs, once it settled
+    polls = [
+        {"topology_id": {"S": "t3"}, "version": {"N": "1"}},
+        reserved(finished=False),
+        reserved(finished=True, failed=fail == "reserve"),
+    ]
+    fake_api.route(
+        "GET",
+        "/topology/t3",
+        lambda query, body: (200, [polls.pop(0) if len(polls) > 1 else polls[0]]),
+    )
+    fake_api.route("POST", "/topology/t4/undeploy", lambda query, body: (200, {}))
+    return str(manifest)
+
+
+def steps(fake_api):
+    return [f"{method} {path}" for method, path, *_ in fake_api.calls[1:]]
+
+
+def test_apply_plan(fake_api, tmp_path):
+    manifest = fleet(fake_api, tmp_path)
+    result = CliRunner().invoke(
+        topology, ["apply", "-f", manifest, "--dry-run"], obj={}
+    )
+    assert result.output.splitlines()[-4:] == [
+        "lab-1: up to date",
+        "lab-2: update deploy",
+        "lab-3: create update reserve deploy",
+        "lab-4: undeploy",
+    ]
+    assert steps(fake_api) == []
+
+
+def test_apply_runs_steps_in_order(fake_api, tmp_path, monkeypatch):
+    monkeypatch.setattr(wait, "MIN_POLL_INTERVAL", 0.001)
+    manifest = fleet(fake_api, tmp_path)
+    result = CliRunner().invoke(
+        topology, ["apply", "-f", manifest, "--concurrency", "3"], obj={}
+    )
+    assert result.exit_code == 0
+    calls = steps(fake_api)
+    assert sorted(calls) == sorted(
+        [
+            "PATCH /topology/t2",
+            "POST /topology/t2/deploy",
+            "POST /topology",
+            "PATCH /topology/t3",
+            "GET /topology/t3",
+            "POST /topology/t3/reserve",
+            "GET /topology/t3",
+            "GET /topology/t3",
+            "POST /topology/t3/deploy",
+            # the last step, nothing waits for its workflow
+            "POST /topology/t4/undeploy",
+        ]
+    )
+    lab3 = [call for call in calls if "t3" in call or call == "POST /topology"]
+    # the deploy starts once the reserve workflow finished
+    assert lab3 == [
+        "POST /topology",
+        "PATCH /topology/t3",
+        "GET /topology/t3",
+        "POST /topology/t3/reserve",
+        "GET /topology/t3",
+        "GET /topology/t3",
+        "POST /topology/t3/deploy",
+    ]
+    assert ("POST", "/topology", {}, {"topology_name": "lab-3"}) in [
+        call[:4] for call in fake_api.calls
+    ]
+    assert "4 topologies, 1 up to date, 0 failed" in result.output
+
+
+def test_apply_failure_stops_topology(fake_api, tmp_path, monkeypatch):
+    monkeypatch.setattr(wait, "MIN_POLL_INTERVAL", 0.001)
+    manifest = fleet(fake_api, tmp_path, fail="t3")
+    result = CliRunner().invoke(topology, ["apply", "-f", manifest], obj={})
+    assert result.exit_code == 1
+    assert "lab-3 deploy failed: 500" in result.output
+    assert "4 topologies, 1 up to date, 1 failed" in result.output
+
+
+def test_apply_failed_workflow_stops_topology(fake_api, tmp_path, monkeypatch):
+    monkeypatch.setattr(wait, "MIN_POLL_INTERVAL", 0.001)
+    manifest = fleet(fake_api, tmp_path, fail="reserve")
+    result = CliRunner().invoke(topology, ["apply", "-f", manifest], obj={})
+    assert result.exit_code == 1
+    assert "lab-3 reserve failed: reserve workflow failed" in result.output
+    assert "POST /topology/t3/deploy" not in steps(fake_api)
+    assert "4 topologies, 1 up to date, 1 failed" in result.output
+
+
+def test_apply_invalid_manifest(fake_api, tmp_path):
+    manifest = tmp_path / "fleet.yaml"
+    manifest.write_text("topologies:\n- name: a\n  config: {nodes: []}\n- config: {}\n")
+    result = CliRunner().invoke(topology, ["apply", "-f", str(manifest)], obj={})
+    assert result.exit_code == 1
+    assert "a: nodes: a non-empty list is required" in result.output
+    assert "topologies[1].name: required" in result.output
+    assert fake_api.calls == []
+
+
+def test_apply_listing_unreachable(fake_api, tmp_path):
+    manifest = fleet(fake_api, tmp_path)
+
+    def unreachable(query, body):
+        raise requests.ConnectionError("connection refused")
+
+    fake_api.route("GET", "/topology", unreachable)
+    result = CliRunner().invoke(topology, ["apply", "-f", manifest], obj={})
+    assert result.exception is None
+    assert "connection refused" in result.output
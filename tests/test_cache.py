@@ -0,0 +1,103 @@
+import os
+
+from click.testing import CliRunner
+
+from lab1918_shell.artifact import artifact
+from lab1918_shell.cache import CACHE_HEADER, ResponseCache
+from lab1918_shell.client import ArtifactClient, TopologyClient
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+ARTIFACTS = [
+    {
+        "owner": {"S": "igp2bgp"},
+        "file_name": {"S": "veos.qcow2"},
+        "artifact_type": {"S": "qcow"},
+        "file_version": {"S": "4.30"},
+        "storage": {"S": "s3"},
+        "vendor": {"S": "arista"},
+    }
+]
+
+
+def etag_handler(query, body):
+    return 200, ARTIFACTS, {"ETag": '"v1"'}
+
+
+def conditional(api):
+    def handler(query, body):
+        if api.calls[-1][4].get("If-None-Match") == '"v1"':
+            return 304, None
+        return etag_handler(query, body)
+
+    return handler
+
+
+def test_revalidate_with_etag(fake_api, lab1918_home):
+    fake_api.route("GET", "/artifact", conditional(fake_api))
+    cache = ResponseCache.from_config()
+    first = ArtifactClient(cache=cache).get_all_artifacts()
+    assert first.json() == ARTIFACTS
+    assert CACHE_HEADER not in first.headers
+
+    second = ArtifactClient(cache=cache).get_all_artifacts()
+    assert second.status_code == 200
+    assert second.json() == ARTIFACTS
+    assert second.headers[CACHE_HEADER] == "revalidated"
+    assert fake_api.calls[1][4]["If-None-Match"] == '"v1"'
+    assert list((lab1918_home / "cache").glob("*.entry"))
+
+
+def test_ttl_skips_request(fake_api, tmp_path):
+    fake_api.route("GET", "/artifact", lambda query, body: (200, ARTIFACTS))
+    cache = ResponseCache(tmp_path / "cache", ttl=60)
+    ArtifactClient(cache=cache).get_all_artifacts()
+    res = ArtifactClient(cache=cache).get_all_artifacts()
+    assert res.headers[CACHE_HEADER] == "hit"
+    assert len(fake_api.calls) == 1
+
+
+def test_fresh_revalidates_within_ttl(fake_api, tmp_path):
+    fake_api.route("GET", "/topology/t1", conditional(fake_api))
+    cache = ResponseCache(tmp_path / "cache", ttl=60)
+    client = TopologyClient(cache=cache)
+    client.get_topology("t1")
+    res = client.get_topology("t1", fresh=True)
+    assert res.headers[CACHE_HEADER] == "revalidated"
+    assert fake_api.calls[1][4]["If-None-Match"] == '"v1"'
+    # the shared cache keeps its ttl for every other caller
+    assert cache.ttl == 60
+    assert client.get_topology("t1").headers[CACHE_HEADER] == "hit"
+
+
+def test_lru_eviction(fake_api, tmp_path):
+    fake_api.route("GET", "/artifact/a", lambda query, body: (200, ARTIFACTS))
+    fake_api.route("GET", "/artifact/b", lambda query, body: (200, ARTIFACTS))
+    fake_api.route("GET", "/artifact/c", lambda query, body: (200, ARTIFACTS))
+    cache = ResponseCache(tmp_path / "cache", ttl=60)
+    client = ArtifactClient(cache=cache)
+    client.get_artifact("a")
+    client.get_artifact("b")
+    entry_size = max(p.stat().st_size for p in cache.cache_dir.glob("*.entry"))
+    for entry, age in zip(sorted(cache.cache_dir.glob("*.entry")), (100, 200)):
+        os.utime(entry, (entry.stat().st_atime, entry.stat().st_mtime - age))
+    client.get_artifact("a")  # hit, becomes most recently used
+    cache.max_bytes = entry_size * 2 + 64
+    client.get_artifact("c")
+    assert len(list(cache.cache_dir.glob("*.entry"))) == 2
+    calls = len(fake_api.calls)
+    client.get_artifact("a")
+    assert len(fake_api.calls) == calls
+
+
+def test_no_cache_flag(fake_api, lab1918_home):
+    fake_api.route("GET", "/artifact", etag_handler)
+    runner = CliRunner()
+    result = runner.invoke(artifact, ["--no-cache", "list"], obj={})
+    assert result.exit_code == 0
+    assert "veos.qcow2" in result.output
+    assert not (lab1918_home / "cache").exists()
+    runner.invoke(artifact, ["list"], obj={})
+    assert (lab1918_home / "cache").exists()
@@ -0,0 +1,72 @@
+import subprocess
+import sys
+import time
+
+from click.testing import CliRunner
+
+from lab1918_shell.cli import lab1918
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+# seconds for a cold `lab1918 --help`, interpreter start included
+STARTUP_BUDGET = 1.0
+
+HEAVY_MODULES = ["requests", "yaml", "tabulate", "lab1918_shell.client"]
+
+
+def run_python(code, home):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env={"HOME": str(home), "PATH": ""},
+        check=True,
+    )
+
+
+def test_help_skips_heavy_imports(tmp_path):
+    code = (
+        "import sys\n"
+        "from lab1918_shell.cli import lab1918\n"
+        "for args in (['--help'], ['topology', 'list', '--help']):\n"
+        "    try:\n"
+        "        lab1918.main(args, prog_name='lab1918')\n"
+        "    except SystemExit:\n"
+        "        pass\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    result = run_python(code, tmp_path)
+    assert "manage topologies" in result.stdout
+    assert "--page-size" in result.stdout
+    assert result.stdout.splitlines()[-1] == "[]"
+    assert not (tmp_path / ".lab1918").exists()
+
+
+def test_cold_help_budget(tmp_path):
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        run_python("from lab1918_shell.cli import main; main()", tmp_path)
+        timings.append(time.perf_counter() - start)
+    assert min(timings) < STARTUP_BUDGET
+
+
+def test_aliases_dispatch(fake_api):
+    fake_api.route("GET", "/whoami", lambda query, body: (200, {"user_id": "u1"}))
+    fake_api.route("GET", "/artifact", lambda query, body: (200, []))
+    runner = CliRunner()
+    result = runner.invoke(lab1918, ["user", "list", "--format", "json"])
+    assert result.exit_code == 0
+    assert '"user_id": "u1"' in result.output
+    result = runner.invoke(lab1918, ["art", "list", "--format", "json"])
+    assert result.exit_code == 0
+    assert result.output == "[]\n"
+    assert runner.invoke(lab1918, ["nope"]).exit_code == 2
+
+
+def test_missing_api_key(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    result = CliRunner().invoke(lab1918, ["topo", "list"])
+    assert result.exit_code == 1
@@ -0,0 +1,90 @@
+import pytest
+import requests
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lab1918_shell.client import TopologyClient, TransportPolicy, new_session
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+@pytest.fixture
+def flaky_server():
+    """Answer 503 with Retry-After for the first `failures` requests"""
+    state = {"failures": 2, "hits": 0, "delay": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self):
+            state["hits"] += 1
+            time.sleep(state["delay"])
+            if state["hits"] <= state["failures"]:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        do_GET = do_POST = reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+
+
+def test_retry_idempotent_only(flaky_server):
+    url, state = flaky_server
+    session = new_session(TransportPolicy(retries=3, backoff_factor=0))
+    res = session.get(url)
+    assert res.status_code == 200
+    assert state["hits"] == 3
+
+    state.update(hits=0)
+    res = session.post(url, json={})
+    assert res.status_code == 503
+    assert state["hits"] == 1
+
+
+def test_retries_exhausted_returns_response(flaky_server):
+    url, state = flaky_server
+    state["failures"] = 10
+    session = new_session(TransportPolicy(retries=2, backoff_factor=0))
+    assert session.get(url).status_code == 503
+    assert state["hits"] == 3
+
+
+def test_read_timeout(flaky_server):
+    url, state = flaky_server
+    state.update(failures=0, delay=0.5)
+    session = new_session(TransportPolicy(retries=0, read_timeout=0.1))
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get(url)
+
+
+def test_backoff_jitter_is_capped():
+    retry = TransportPolicy(retries=10, backoff_factor=10, backoff_max=2).retry()
+    for _ in range(5):
+        retry = retry.increment(method="GET", url="/")
+    assert all(0 <= retry.get_backoff_time() <= 2 for _ in range(50))
+
+
+def test_policy_from_profile(lab1918_home):
+    (lab1918_home / "shell.ini").write_text(
+        "[default]\napi_server = api.lab1918.com\napi_key = test-key\n"
+        "pool_size = 64\nread_timeout = 12.5\nretries = 5\n"
+    )
+    adapter = TopologyClient().session.get_adapter("https://api.lab1918.com")
+    assert adapter._pool_maxsize == 64
+    assert adapter.timeout == (5.0, 12.5)
+    assert adapter.max_retries.total == 5
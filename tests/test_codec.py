@@ -0,0 +1,81 @@
+import json
+import pytest
+import requests
+
+from click.testing import CliRunner
+
+from lab1918_shell import codec
+from lab1918_shell.cli import lab1918
+from lab1918_shell.client import TopologyClient
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+VALUE = {
+    "topology_id": {"S": "t1"},
+    "nodes": {"L": [{"M": {"hostname": {"S": "r1"}, "ports": {"L": []}}}]},
+    "empty": {},
+    "url": "https://api.lab1918.com/topology",
+    "version": 3,
+}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(codec, "orjson", None)
+        monkeypatch.setattr(codec, "ujson", None)
+    elif codec.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_layouts_match_stdlib(backend):
+    assert codec.dumps(VALUE) == json.dumps(VALUE, indent=4)
+    assert codec.dumps(VALUE, indent=False) == json.dumps(VALUE, separators=(",", ":"))
+    assert codec.loads(codec.encode(VALUE)) == VALUE
+    assert codec.dumps({"name": "é"}, indent=False) == '{"name":"é"}'
+
+
+def test_non_string_keys(backend):
+    # yaml maps numbers to ints, json turns them into strings
+    value = {"vlans": {10: "users", 20: "voice"}}
+    assert codec.dumps(value) == json.dumps(value, indent=4)
+    assert codec.loads(codec.encode(value)) == {"vlans": {"10": "users", "20": "voice"}}
+
+
+def test_response_parsed_once(monkeypatch):
+    parsed = []
+
+    def loads(data):
+        parsed.append(data)
+        return json.loads(data)
+
+    monkeypatch.setattr(codec, "loads", loads)
+    response = requests.Response()
+    response._content = b'{"topology_id": {"S": "t1"}}'
+    assert codec.json_body(response) is codec.json_body(response)
+    assert len(parsed) == 1
+
+
+def test_request_body_encoded(fake_api):
+    fake_api.route("PATCH", "/topology/t1", lambda query, body: (200, body))
+    res = TopologyClient().update_topology("t1", '{"nodes": []}')
+    assert codec.json_body(res) == {"topology_config": '{"nodes": []}'}
+    headers = fake_api.calls[0][4]
+    assert headers["Content-Type"] == "application/json"
+
+
+def test_compact_output(fake_api):
+    fake_api.route("GET", "/topology", lambda query, body: (200, [VALUE, VALUE]))
+    fake_api.route("POST", "/topology", lambda query, body: (200, VALUE))
+    runner = CliRunner()
+    args = ["--compact", "topology", "list", "--format", "json"]
+    result = runner.invoke(lab1918, args, obj={})
+    assert result.output == json.dumps([VALUE, VALUE], separators=(",", ":")) + "\n"
+
+    result = runner.invoke(lab1918, ["--compact", "topology", "create"], obj={})
+    assert result.output.splitlines()[-1] == codec.dumps(VALUE, indent=False)
+    result = runner.invoke(lab1918, ["topology", "create"], obj={})
+    assert result.output.endswith(json.dumps(VALUE, indent=4) + "\n")
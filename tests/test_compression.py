@@ -0,0 +1,85 @@
+import gzip
+import json
+import logging
+import pytest
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lab1918_shell.client import TransportPolicy, new_session
+from lab1918_shell.codec import request_body
+from lab1918_shell.logger import logger
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+LISTING = [
+    {"topology_id": {"S": f"t{i}"}, "owner": {"S": "igp2bgp"}} for i in range(500)
+]
+
+
+@pytest.fixture
+def gzip_server():
+    """Gzip responses when accepted, inflate gzipped request bodies"""
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            encoding = self.headers.get("Content-Encoding")
+            if encoding == "gzip":
+                body = gzip.decompress(body)
+            seen.append((self.command, encoding, length, body))
+            payload = json.dumps(LISTING).encode()
+            accepted = "gzip" in (self.headers.get("Accept-Encoding") or "")
+            self.send_response(200)
+            if accepted:
+                payload = gzip.compress(payload)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_PATCH = reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", seen
+    server.shutdown()
+
+
+def test_response_encoding(gzip_server, caplog):
+    url, seen = gzip_server
+    session = new_session(TransportPolicy())
+    assert "gzip" in session.headers["Accept-Encoding"]
+    caplog.set_level(logging.DEBUG, logger=logger.name)
+    res = session.get(url)
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert res.json() == LISTING
+    size, wire = len(res.content), res.raw.tell()
+    assert wire < size / 5
+    logged = f"received {size} bytes as {wire} gzip, ratio {size / wire:.1f}"
+    assert logged in caplog.text
+
+
+def test_request_body_above_threshold(gzip_server):
+    url, seen = gzip_server
+    session = new_session(TransportPolicy(compress_min_bytes=1024))
+    config = {"topology_config": json.dumps({"nodes": LISTING})}
+    session.patch(url, **request_body(config))
+    session.patch(url, **request_body({"topology_config": "{}"}))
+    (_, encoding, length, body), (_, small, _, _) = seen
+    assert encoding == "gzip"
+    assert json.loads(body) == config
+    assert length < len(body) / 5
+    assert small is None
+
+    # off by default, the api has to accept compressed bodies
+    session = new_session(TransportPolicy())
+    session.patch(url, **request_body(config))
+    assert seen[-1][1] is None
@@ -0,0 +1,128 @@
+import requests
+
+from click.testing import CliRunner
+from datetime import datetime, timedelta, timezone
+
+from lab1918_shell.history import WorkflowIndex
+from lab1918_shell.topology import topology
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+def ago(hours, minutes=0):
+    when = datetime.now(timezone.utc) - timedelta(hours=hours, minutes=minutes)
+    return when.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def workflow(workflow_id, name, started_at, minutes=None, failed=False):
+    attrs = {
+        "workflow_name": {"S": name},
+        "workflow_id": {"S": workflow_id},
+        "started_at": {"S": started_at},
+        "finished": {"BOOL": minutes is not None},
+        "failed": {"BOOL": failed},
+    }
+    if minutes is not None:
+        started = datetime.strptime(started_at, "%Y-%m-%dT%H:%M:%S.%f")
+        finished_at = started + timedelta(minutes=minutes)
+        attrs["finished_at"] = {"S": finished_at.strftime("%Y-%m-%dT%H:%M:%S.%f")}
+    return {"M": attrs}
+
+
+def make_topology(i, version, history, current=None):
+    item = {
+        "topology_id": {"S": f"t{i}"},
+        "topology_name": {"S": f"lab-{i}"},
+        "owner": {"S": "igp2bgp"},
+        "version": {"N": str(version)},
+        "workflows": {"L": history},
+    }
+    if current:
+        item["workflow"] = current
+    return item
+
+
+def fleet():
+    return [
+        make_topology(
+            1,
+            3,
+            [
+                workflow("w1", "deploy", ago(48), minutes=5, failed=True),
+                workflow("w2", "bootstrap", ago(30), minutes=20),
+            ],
+            workflow("w3", "deploy", ago(2), minutes=4, failed=True),
+        ),
+        make_topology(
+            2,
+            7,
+            [workflow("w4", "bootstrap", ago(5), minutes=45)],
+            workflow("w5", "deploy", ago(0, 10)),
+        ),
+    ]
+
+
+def test_sync_is_incremental(tmp_path):
+    index = WorkflowIndex(tmp_path / "workflows.sqlite")
+    topologies = fleet()
+    assert index.sync([topologies]) == (2, 2, 0)
+    # t2 has a deploy running, it is synced again until that settles
+    assert index.sync([topologies]) == (2, 1, 0)
+
+    topologies[1]["workflow"] = workflow("w5", "deploy", ago(0, 10), minutes=8)
+    assert index.sync([topologies[:1], topologies[1:]]) == (2, 1, 0)
+    assert index.sync([topologies]) == (2, 0, 0)
+    assert index.query(topology_id="t2")[0].state == "finished"
+
+    assert index.sync([topologies[1:]]) == (1, 0, 1)
+    assert {row.topology_id for row in index.query()} == {"t2"}
+
+
+def test_queries(tmp_path):
+    index = WorkflowIndex(tmp_path / "workflows.sqlite")
+    index.sync([fleet()])
+    rows = index.query()
+    assert [row.workflow_id for row in rows] == ["w5", "w3", "w4", "w2", "w1"]
+
+    failed = index.query(workflow_name="deploy", state="failed", since=24 * 3600)
+    assert [row.workflow_id for row in failed] == ["w3"]
+
+    slowest = index.query(workflow_name="bootstrap", slowest=True)
+    assert [(row.workflow_id, row.seconds) for row in slowest] == [
+        ("w4", 2700.0),
+        ("w2", 1200.0),
+    ]
+    assert len(index.query(limit=2)) == 2
+
+
+def test_history_command(fake_api, lab1918_home):
+    topologies = fleet()
+    fake_api.route("GET", "/topology", lambda query, body: (200, topologies))
+    runner = CliRunner()
+    args = ["history", "--state", "failed", "--since", "24h", "--format", "tsv"]
+    result = runner.invoke(topology, args, obj={})
+    assert result.exit_code == 0
+    assert result.output.splitlines()[1].split("\t")[:3] == ["t1", "deploy", "w3"]
+    assert (lab1918_home / "workflows.sqlite").exists()
+    fields = "topology_id,topology_name,version,workflow,workflows"
+    assert fake_api.calls[0][2]["fields"] == fields
+
+    # a fresh index is queried without asking the api
+    fake_api.calls.clear()
+    result = runner.invoke(topology, ["history", "--slowest"], obj={})
+    assert "w4" in result.output
+    assert fake_api.calls == []
+
+    result = runner.invoke(topology, ["history", "--since", "soon"], obj={})
+    assert result.exit_code == 2
+
+    def unreachable(query, body):
+        raise requests.ConnectionError("connection refused")
+
+    # errors without a response are printed, not raised
+    fake_api.route("GET", "/topology", unreachable)
+    result = runner.invoke(topology, ["history", "--max-age", "0"], obj={})
+    assert result.exception is None
+    assert "connection refused" in result.output
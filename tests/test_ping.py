@@ -0,0 +1,69 @@
+import requests
+
+from click.testing import CliRunner
+
+from lab1918_shell.ping import PingResult, summarize
+from lab1918_shell.topology import topology
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+def deployed(i, is_deployed=True):
+    return {
+        "topology_id": {"S": f"t{i}"},
+        "topology_name": {"S": f"lab-{i}"},
+        "owner": {"S": "igp2bgp"},
+        "version": {"N": "1"},
+        "deployed": {"BOOL": is_deployed},
+    }
+
+
+def test_ping_all_deployed(fake_api):
+    fake_api.route(
+        "GET",
+        "/topology",
+        lambda query, body: (200, [deployed(1), deployed(2, False), deployed(3)]),
+    )
+    fake_api.route("POST", "/topology/t1/ping", lambda query, body: (200, {}))
+    fake_api.route("POST", "/topology/t3/ping", lambda query, body: (502, {}))
+    args = ["ping", "--all-deployed", "--count", "3", "--interval", "0"]
+    result = CliRunner().invoke(topology, args, obj={})
+    assert result.exit_code == 1
+    lines = result.output.splitlines()
+    assert sum(1 for line in lines if line.startswith("t1 seq=")) == 3
+    assert "t3 seq=2 failed: 502" in result.output
+    pinged = {path for method, path, *_ in fake_api.calls if method == "POST"}
+    assert pinged == {"/topology/t1/ping", "/topology/t3/ping"}
+    # summary table after the streamed lines
+    assert "p95-ms" in result.output
+
+
+def test_single_ping_prints_response(fake_api):
+    fake_api.route("POST", "/topology/t1/ping", lambda query, body: (200, {"r1": "up"}))
+    result = CliRunner().invoke(topology, ["ping", "-t", "t1"], obj={})
+    assert result.exit_code == 0
+    assert '"r1": "up"' in result.output
+
+    result = CliRunner().invoke(topology, ["ping"], obj={})
+    assert result.exit_code == 2
+
+
+def test_all_deployed_unreachable(fake_api):
+    def unreachable(query, body):
+        raise requests.ConnectionError("connection refused")
+
+    fake_api.route("GET", "/topology", unreachable)
+    result = CliRunner().invoke(topology, ["ping", "--all-deployed"], obj={})
+    assert result.exception is None
+    assert "connection refused" in result.output
+
+
+def test_summarize():
+    results = [PingResult("t1", n, n / 1000, None) for n in range(1, 21)]
+    results.append(PingResult("t1", 21, 1.0, "timed out"))
+    results.append(PingResult("t2", 1, 1.0, "timed out"))
+    t1, t2 = summarize(results)
+    assert t1 == ("t1", 21, 1, 1.0, 10.5, 19.0, 20.0)
+    assert t2 == ("t2", 1, 1, None, None, None, None)
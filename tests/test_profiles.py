@@ -0,0 +1,92 @@
+from click.testing import CliRunner
+
+from lab1918_shell.cli import lab1918
+from lab1918_shell.profiles import ClientRegistry
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+def topologies(*names):
+    return [
+        {
+            "topology_id": {"S": f"t-{name}"},
+            "topology_name": {"S": name},
+            "owner": {"S": "igp2bgp"},
+            "version": {"N": "1"},
+        }
+        for name in names
+    ]
+
+
+def profiles(lab1918_home):
+    (lab1918_home / "shell.ini").write_text(
+        "[default]\napi_server = api.lab1918.com\napi_key = test-key\n"
+        "[eu]\napi_server = api.eu.lab1918.com\napi_key = eu-key\n"
+        "[unused]\napi_server = api.lab1918.com\napi_key = <replace with api key>\n"
+    )
+
+
+def test_profile_option(fake_api, lab1918_home):
+    profiles(lab1918_home)
+    fake_api.route(
+        "GET", "api.eu.lab1918.com/topology", lambda q, b: (200, topologies("eu-1"))
+    )
+    args = ["--profile", "eu", "topology", "list", "--format", "tsv"]
+    result = CliRunner().invoke(lab1918, args)
+    assert result.exit_code == 0
+    assert "eu-1" in result.output
+    assert fake_api.calls[0][4]["x-api-key"] == "eu-key"
+
+    result = CliRunner().invoke(lab1918, ["--profile", "unused", "user", "list"])
+    assert result.exit_code == 1
+
+
+def test_all_profiles_merged(fake_api, lab1918_home):
+    profiles(lab1918_home)
+    fake_api.route("GET", "/topology", lambda q, b: (200, topologies("lab-1", "lab-2")))
+    fake_api.route(
+        "GET", "api.eu.lab1918.com/topology", lambda q, b: (200, topologies("eu-1"))
+    )
+    args = ["--all-profiles", "topology", "list", "--format", "tsv"]
+    result = CliRunner().invoke(lab1918, args)
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0].startswith("profile\tname")
+    assert sorted(line.split("\t")[:2] for line in lines[1:]) == [
+        ["default", "lab-1"],
+        ["default", "lab-2"],
+        ["eu", "eu-1"],
+    ]
+
+    fake_api.route("GET", "api.eu.lab1918.com/topology", lambda q, b: (500, {}))
+    result = CliRunner(mix_stderr=False).invoke(lab1918, args)
+    assert result.exit_code == 1
+    assert "profile eu: 500" in result.stderr
+    assert len(result.stdout.splitlines()) == 3
+
+    result = CliRunner().invoke(lab1918, ["--all-profiles", "topology", "deploy"])
+    assert result.exit_code == 2
+
+
+def test_all_profiles_whoami(fake_api, lab1918_home):
+    profiles(lab1918_home)
+    fake_api.route("GET", "/whoami", lambda q, b: (200, {"user_id": "u-1"}))
+    fake_api.route(
+        "GET", "api.eu.lab1918.com/whoami", lambda q, b: (200, {"user_id": "u-eu"})
+    )
+    args = ["--all-profiles", "user", "list", "--format", "tsv"]
+    result = CliRunner().invoke(lab1918, args)
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0] == "profile\tsetting\tvalue"
+    assert sorted(lines[1:]) == ["default\tuser-id\tu-1", "eu\tuser-id\tu-eu"]
+
+
+def test_registry_session_per_profile(lab1918_home):
+    profiles(lab1918_home)
+    registry = ClientRegistry()
+    assert registry.profiles() == ["default", "eu"]
+    assert registry.session("default") is not registry.session("eu")
+    assert registry.session("eu") is registry.session("eu")
@@ -0,0 +1,138 @@
+import multiprocessing
+import requests
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lab1918_shell.client import TopologyClient, TransportPolicy, new_session
+from lab1918_shell.ratelimit import RECOVERY, RateLimiter
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+URL = "https://api.lab1918.com/"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def limiter(tmp_path, clock, rate=2, burst=2):
+    return RateLimiter(tmp_path / "default.json", URL, rate, burst, clock, clock.sleep)
+
+
+def response(status=200, **headers):
+    res = requests.Response()
+    res.status_code = status
+    res.headers.update(headers)
+    return res
+
+
+def test_bucket_shared_between_limiters(tmp_path):
+    clock = Clock()
+    a, b = limiter(tmp_path, clock), limiter(tmp_path, clock)
+    assert a.acquire() == 0
+    assert b.acquire() == 0
+    # the bucket both drew from is empty, the next token is half a second away
+    assert a.acquire() == 0.5
+    assert clock.slept == [0.5]
+
+
+def test_adapts_to_rate_limit_headers(tmp_path):
+    clock = Clock()
+    each = limiter(tmp_path, clock, rate=100, burst=10)
+    each.observe(response(**{"RateLimit-Remaining": "20", "RateLimit-Reset": "10"}))
+    state = each.snapshot()
+    assert state["rate"] == 0.9 * 20 / 10
+    assert state["tokens"] == 10
+
+    each.observe(response(**{"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "3"}))
+    assert each.acquire() >= 3
+
+
+def test_throttled_response_holds_everyone_off(tmp_path):
+    clock = Clock()
+    a, b = limiter(tmp_path, clock, rate=10), limiter(tmp_path, clock, rate=10)
+    a.observe(response(429, **{"Retry-After": "2"}))
+    assert b.acquire() >= 2
+    assert b.snapshot()["rate"] == 5
+    # recovers additively on responses that were not throttled
+    b.observe(response())
+    assert b.snapshot()["rate"] == 5.5
+
+
+def draw(path, count):
+    each = RateLimiter(path, URL, rate=40, burst=4)
+    for _ in range(count):
+        each.acquire()
+
+
+def test_rate_holds_across_processes(tmp_path):
+    path = tmp_path / "default.json"
+    started = time.monotonic()
+    workers = [multiprocessing.Process(target=draw, args=(path, 8)) for _ in range(4)]
+    for each in workers:
+        each.start()
+    for each in workers:
+        each.join()
+    # 32 tokens at 40/s, the first 4 from the burst
+    assert time.monotonic() - started >= 28 / 40
+
+
+def test_limiter_from_profile(lab1918_home):
+    adapter = TopologyClient().session.get_adapter(URL)
+    assert adapter.limiter is None
+
+    (lab1918_home / "shell.ini").write_text(
+        "[default]\napi_server = api.lab1918.com\napi_key = test-key\n"
+        "rate_limit = 5\n"
+    )
+    adapter = TopologyClient().session.get_adapter(URL)
+    assert adapter.limiter.rate == 5
+    assert adapter.limiter.path == lab1918_home / "ratelimit" / "default.json"
+    assert adapter.limiter.covers(f"{URL}topology")
+    assert not adapter.limiter.covers("https://bucket.s3.amazonaws.com/part")
+
+
+def test_throttled_retries_go_through_limiter(tmp_path):
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            self.send_response(429 if len(hits) == 1 else 200)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    session = new_session(TransportPolicy())
+    adapter = session.get_adapter(url)
+    adapter.use_limiter(RateLimiter(tmp_path / "default.json", url, rate=10))
+    try:
+        res = session.get(url)
+    finally:
+        server.shutdown()
+    assert res.status_code == 200
+    assert len(hits) == 2
+    state = adapter.limiter.snapshot()
+    # halved by the 429, then one additive step for the 200
+    assert state["rate"] == 10 / 2 + 10 * RECOVERY
+    assert "blocked_until" in state
@@ -0,0 +1,68 @@
+import json
+
+from lab1918_shell.records import Artifact, Topology, decode
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+def test_decode_attribute_values():
+    value = {
+        "M": {
+            "name": {"S": "r1"},
+            "cpus": {"N": "2"},
+            "ratio": {"N": "0.5"},
+            "up": {"BOOL": True},
+            "note": {"NULL": True},
+            "tags": {"L": [{"S": "a"}, {"N": "3"}]},
+            "ports": {"NS": ["1", "2"]},
+        }
+    }
+    assert decode(value) == {
+        "name": "r1",
+        "cpus": 2,
+        "ratio": 0.5,
+        "up": True,
+        "note": None,
+        "tags": ["a", 3],
+        "ports": [1, 2],
+    }
+
+
+def test_topology_fields():
+    item = {
+        "topology_id": {"S": "t1"},
+        "topology_name": {"S": "lab"},
+        "owner": {"S": "igp2bgp"},
+        "version": {"N": "3"},
+        "topology_config": {"S": json.dumps({"nodes": []})},
+        "workflow": {
+            "M": {
+                "workflow_name": {"S": "deploy"},
+                "workflow_id": {"S": "w1"},
+                "started_at": {"S": "2024-01-01T00:00:00"},
+                "finished": {"BOOL": False},
+                "status": {"S": "ABORTED"},
+            }
+        },
+        "workflows": {"L": [{"M": {"workflow_name": {"S": "bootstrap"}}}]},
+    }
+    topology = Topology(item)
+    assert (topology.topology_id, topology.version) == ("t1", 3)
+    assert topology.deployed is False and topology.reserved is False
+    assert topology.workflow.state == "failed"
+    assert topology.config == {"nodes": []}
+    assert topology.config is topology.config
+    assert topology.status == {}
+    assert [w.workflow_name for w in topology.workflows] == ["bootstrap"]
+    assert topology.workflows[0].finished is False
+
+
+def test_partial_items():
+    topology = Topology({"topology_id": {"S": "t1"}})
+    assert topology.topology_name is None
+    assert topology.version is None
+    assert topology.workflow is None
+    assert topology.workflows == []
+    assert Artifact({"artifact_id": {"S": "a1"}}).arch == "x86"
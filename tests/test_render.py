@@ -0,0 +1,57 @@
+from click.testing import CliRunner
+from collections import namedtuple
+
+from lab1918_shell import render
+from lab1918_shell.artifact import artifact
+from lab1918_shell.render import echo_rows
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+Row = namedtuple("Row", ["topology_id", "note"])
+
+
+def rows(count):
+    return (Row(f"t{i}", "x" * i) for i in range(count))
+
+
+def test_tsv_and_fixed(capsys):
+    echo_rows([Row("t1", "a\tb"), Row("t2", None)], Row._fields, "tsv")
+    assert capsys.readouterr().out == "topology-id\tnote\nt1\ta b\nt2\t\n"
+
+    echo_rows(rows(3), Row._fields, "fixed", {"topology_id": 4})
+    assert capsys.readouterr().out.splitlines() == [
+        "topology-id  note",
+        "t0           ",
+        "t1           x",
+        "t2           xx",
+    ]
+
+
+def test_fixed_truncates_past_sample(capsys, monkeypatch):
+    monkeypatch.setattr(render, "SAMPLE_ROWS", 1)
+    echo_rows([Row("t1", ""), Row("topology-0002", "")], Row._fields, "fixed")
+    assert capsys.readouterr().out.splitlines()[2] == "topology-0…  "
+
+
+def test_table_falls_back_to_fixed(capsys, monkeypatch):
+    monkeypatch.setattr(render, "TABLE_MAX_ROWS", 3)
+    echo_rows(rows(3), Row._fields)
+    assert "╒" in capsys.readouterr().out
+    echo_rows(rows(4), Row._fields)
+    output = capsys.readouterr().out
+    assert "╒" not in output
+    assert len(output.splitlines()) == 5
+
+
+def test_artifact_formats(fake_api):
+    item = {"owner": {"S": "igp2bgp"}, "file_name": {"S": "veos.qcow2"}}
+    fake_api.route("GET", "/artifact", lambda query, body: (200, [item, item]))
+    runner = CliRunner()
+    result = runner.invoke(artifact, ["list", "--format", "ndjson"], obj={})
+    assert result.output.splitlines() == [
+        '{"owner":{"S":"igp2bgp"},"file_name":{"S":"veos.qcow2"}}'
+    ] * 2
+    result = runner.invoke(artifact, ["list", "--format", "tsv"], obj={})
+    assert result.output.splitlines()[1] == "igp2bgp\tveos.qcow2\t\t\t\t\tx86"
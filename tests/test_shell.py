@@ -0,0 +1,92 @@
+import requests
+
+from prompt_toolkit.document import Document
+
+from lab1918_shell.profiles import ClientRegistry
+from lab1918_shell.shell import Shell, ShellCompleter
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+TOPOLOGIES = [
+    {
+        "topology_id": {"S": topology_id},
+        "topology_name": {"S": "lab"},
+        "owner": {"S": "igp2bgp"},
+        "version": {"N": "1"},
+    }
+    for topology_id in ("t-alpha", "t-beta")
+]
+
+
+def completions(shell, text):
+    completer = ShellCompleter(shell.index)
+    return [c.text for c in completer.get_completions(Document(text), None)]
+
+
+def test_commands_share_session(fake_api):
+    sessions = []
+    fake_api.route("GET", "/topology", lambda query, body: (200, TOPOLOGIES))
+    fake_api.route(
+        "POST", "/topology/t-alpha/ping", lambda query, body: (200, {"ok": True})
+    )
+    shell = Shell()
+    session = shell.registry.session("default")
+    original = session.request
+
+    def request(*args, **kwargs):
+        sessions.append(session)
+        return original(*args, **kwargs)
+
+    session.request = request
+    assert shell.run_line("topology list --format json") == 0
+    assert shell.run_line("topo ping -t t-alpha") == 0
+    assert shell.run_line("user list --bogus") == 2
+    assert shell.run_line("shell") == 2
+    assert len(sessions) == 2
+    assert sessions[0] is sessions[1]
+    assert shell.index.ids["topology"] == {"t-alpha", "t-beta"}
+
+
+def test_completion(fake_api):
+    fake_api.route("GET", "/topology", lambda query, body: (200, TOPOLOGIES))
+    shell = Shell()
+    assert "topology" in completions(shell, "to")
+    assert completions(shell, "topo de") == ["delete", "deploy"]
+    assert "--dry-run" in completions(shell, "topology deploy --")
+    assert completions(shell, "topology deploy -t ") == []
+    shell.run_line("topology list")
+    assert completions(shell, "topology deploy -t ") == ["t-alpha", "t-beta"]
+    assert completions(shell, "topology deploy --topology-id t-b") == ["t-beta"]
+
+
+def test_completion_from_cached_list(fake_api, lab1918_home):
+    fake_api.route("GET", "/topology", lambda query, body: (200, TOPOLOGIES))
+    with (lab1918_home / "shell.ini").open("a") as f:
+        f.write("cache_ttl = 60\n")
+    Shell().run_line("topology list")
+    calls = len(fake_api.calls)
+    # a new shell answers the same list from the cache
+    shell = Shell()
+    shell.run_line("topology list")
+    assert len(fake_api.calls) == calls
+    assert completions(shell, "topology deploy -t ") == ["t-alpha", "t-beta"]
+
+
+def test_unexpected_errors_keep_the_shell(fake_api, monkeypatch, capsys):
+    def unreachable(query, body):
+        raise requests.ConnectionError("connection refused")
+
+    fake_api.route("GET", "/topology", unreachable)
+    shell = Shell()
+    assert shell.run_line("topology list") == 0
+    assert "connection refused" in capsys.readouterr().err
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("no client")
+
+    # raised before the command's own handler
+    monkeypatch.setattr(ClientRegistry, "client", broken)
+    assert shell.run_line("topology list") == 1
+    assert "no client" in capsys.readouterr().err
@@ -0,0 +1,99 @@
+import json
+
+from click.testing import CliRunner
+
+from lab1918_shell.cli import lab1918
+from lab1918_shell.offline import Snapshot
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+def make_topology(i):
+    return {
+        "topology_id": {"S": f"t{i}"},
+        "topology_name": {"S": f"lab-{i}"},
+        "owner": {"S": "igp2bgp"},
+        "version": {"N": "1"},
+        "deployed": {"BOOL": i % 2 == 0},
+        "topology_config": {"S": json.dumps({"nodes": [{"image": f"veos-{i}"}]})},
+    }
+
+
+ARTIFACTS = [{"artifact_id": {"S": "a1"}, "file_name": {"S": "veos.qcow2"}}]
+
+
+def export(fake_api, *args):
+    topologies = [make_topology(i) for i in range(5)]
+    fake_api.route("GET", "/topology", lambda query, body: (200, topologies))
+    fake_api.route("GET", "/artifact", lambda query, body: (200, ARTIFACTS))
+    fake_api.route("GET", "/whoami", lambda query, body: (200, {"user_id": "u1"}))
+    result = CliRunner().invoke(lab1918, ["snapshot", "export", *args], obj={})
+    fake_api.routes.clear()
+    fake_api.calls.clear()
+    return result
+
+
+def test_offline_list(fake_api, lab1918_home):
+    result = export(fake_api)
+    assert result.exit_code == 0
+    assert (lab1918_home / "snapshots" / "default.sqlite").exists()
+
+    runner = CliRunner()
+    args = ["--offline", "topology", "list", "--format", "tsv"]
+    result = runner.invoke(lab1918, [*args, "--page-size", "2"], obj={})
+    assert result.exit_code == 0
+    assert [line.split("\t")[2] for line in result.output.splitlines()[1:]] == [
+        f"t{i}" for i in range(5)
+    ]
+    result = runner.invoke(lab1918, [*args, "--filter", "deployed=true"], obj={})
+    assert len(result.output.splitlines()) == 4
+    result = runner.invoke(
+        lab1918, [*args, "--config", "--path", "nodes.*.image", "-t", "t3"], obj={}
+    )
+    assert result.output.splitlines()[1] == "t3\tnodes.0.image\tveos-3"
+
+    result = runner.invoke(lab1918, ["--offline", "artifact", "list"], obj={})
+    assert "veos.qcow2" in result.output
+    result = runner.invoke(lab1918, ["--offline", "user", "list"], obj={})
+    assert "u1" in result.output
+    assert fake_api.calls == []
+
+    result = runner.invoke(lab1918, ["--offline", "topology", "deploy"], obj={})
+    assert result.exit_code == 2
+
+
+def test_missing_snapshot(fake_api):
+    result = CliRunner().invoke(lab1918, ["--offline", "topology", "list"], obj={})
+    assert result.exit_code == 1
+    assert fake_api.calls == []
+
+
+def test_failed_export_keeps_snapshot(fake_api, lab1918_home):
+    export(fake_api)
+    fake_api.route("GET", "/topology", lambda query, body: (500, {}))
+    result = CliRunner().invoke(lab1918, ["snapshot", "export"], obj={})
+    assert result.exit_code == 1
+    snapshot = Snapshot(lab1918_home / "snapshots" / "default.sqlite")
+    assert snapshot.info().topologies == 5
+    assert [each.name for each in (lab1918_home / "snapshots").iterdir()] == [
+        "default.sqlite"
+    ]
+
+
+def test_import(fake_api, lab1918_home, tmp_path):
+    export(fake_api, "--output", str(tmp_path / "lab.sqlite"))
+    runner = CliRunner()
+    result = runner.invoke(lab1918, ["--offline", "artifact", "list"], obj={})
+    assert result.exit_code == 1
+
+    source = str(tmp_path / "lab.sqlite")
+    result = runner.invoke(lab1918, ["snapshot", "import", source], obj={})
+    assert result.exit_code == 0
+    result = runner.invoke(lab1918, ["--offline", "artifact", "list"], obj={})
+    assert "veos.qcow2" in result.output
+
+    (tmp_path / "other.sqlite").write_text("not a snapshot")
+    args = ["snapshot", "import", str(tmp_path / "other.sqlite")]
+    assert runner.invoke(lab1918, args, obj={}).exit_code == 1
@@ -0,0 +1,216 @@
+import json
+
+from click.testing import CliRunner
+
+from lab1918_shell.client import TopologyClient
+from lab1918_shell.topology import topology, workflow_rows
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+def make_topology(i, finished=True):
+    return {
+        "topology_id": {"S": f"t{i}"},
+        "topology_name": {"S": f"lab-{i}"},
+        "owner": {"S": "igp2bgp"},
+        "version": {"N": str(i)},
+        "deployed": {"BOOL": i % 2 == 0},
+        "topology_config": {"S": json.dumps({"nodes": [{"hostname": f"r{i}"}]})},
+        "workflow": {
+            "M": {
+                "workflow_name": {"S": "deploy"},
+                "workflow_id": {"S": f"w{i}"},
+                "started_at": {"S": f"2024-01-01T00:00:{i:02d}.000000"},
+                "finished": {"BOOL": finished},
+            }
+        },
+    }
+
+
+def paged(topologies):
+    def handler(query, body):
+        start = int(query.get("next_token", 0))
+        end = start + int(query["limit"])
+        page = {"items": topologies[start:end]}
+        if end < len(topologies):
+            page["next_token"] = str(end)
+        return 200, page
+
+    return handler
+
+
+def test_iter_topologies_pages(fake_api):
+    """Pages are fetched lazily and plain list responses are a single page"""
+    topologies = [make_topology(i) for i in range(7)]
+    fake_api.route("GET", "/topology", paged(topologies))
+    pages = TopologyClient().iter_topology_pages(page_size=3)
+    assert [t["topology_id"]["S"] for t in next(pages)] == ["t0", "t1", "t2"]
+    assert len(fake_api.calls) == 1
+    assert [len(page) for page in pages] == [3, 1]
+
+    fake_api.route("GET", "/topology", lambda query, body: (200, topologies))
+    assert len(list(TopologyClient().iter_topologies(page_size=3))) == 7
+
+
+def test_list_streams_json(fake_api):
+    """Streamed json output matches the single document layout"""
+    topologies = [make_topology(i) for i in range(5)]
+    fake_api.route("GET", "/topology", paged(topologies))
+    runner = CliRunner()
+    result = runner.invoke(
+        topology, ["list", "--format", "json", "--page-size", "2"], obj={}
+    )
+    assert result.exit_code == 0
+    assert result.output == json.dumps(topologies, indent=4) + "\n"
+    assert len(fake_api.calls) == 3
+
+    result = runner.invoke(topology, ["list", "--config"], obj={})
+    assert json.loads(result.output)[4] == {"nodes": [{"hostname": "r4"}]}
+
+    fake_api.route("GET", "/topology", paged([]))
+    result = runner.invoke(topology, ["list", "--format", "json"], obj={})
+    assert result.output == "[]\n"
+
+
+def test_list_table_across_pages(fake_api):
+    topologies = [make_topology(i, finished=i != 3) for i in range(4)]
+    fake_api.route("GET", "/topology", paged(topologies))
+    runner = CliRunner()
+    result = runner.invoke(topology, ["list", "--page-size", "2"], obj={})
+    assert result.exit_code == 0
+    assert result.output.count("topology-id") == 1
+    assert "deploy(running)" in result.output
+
+    result = runner.invoke(
+        topology, ["list", "--page-size", "2", "--format", "ndjson"], obj={}
+    )
+    assert [json.loads(line) for line in result.output.splitlines()] == topologies
+
+    result = runner.invoke(topology, ["list", "--workflow"], obj={})
+    assert result.output.index("w1") < result.output.index("w0")
+
+    # newest first over the whole listing, not within each page
+    args = ["list", "--workflow", "--page-size", "2", "--format", "tsv"]
+    result = runner.invoke(topology, args, obj={})
+    ids = [line.split("\t")[2] for line in result.output.splitlines()[1:]]
+    assert ids == ["w3", "w2", "w1", "w0"]
+
+
+def test_workflow_rows_history_then_current():
+    item = make_topology(1)
+    item["workflows"] = {
+        "L": [{"M": {"workflow_name": {"S": "bootstrap"}}}, {"NULL": True}]
+    }
+    rows = workflow_rows(item)
+    # an entry missing attributes is decoded, not dropped
+    assert [row[1:] for row in rows] == [
+        ("bootstrap", None, "", False),
+        ("deploy", "w1", "2024-01-01T00:00:01", True),
+    ]
+    assert workflow_rows({"topology_id": {"S": "t2"}}) == []
+
+
+def test_watch_transitions(fake_api, monkeypatch):
+    """Only changes are printed and polling slows down while idle"""
+    polls = [make_topology(1)] * 3 + [
+        make_topology(2, finished=False),
+        make_topology(2, finished=False),
+        make_topology(2, finished=True),
+    ]
+    for each in polls[3:]:
+        each["topology_id"] = {"S": "t1"}
+        each["workflow"]["M"]["workflow_id"] = {"S": "w2"}
+    fake_api.route(
+        "GET",
+        "/topology/t1",
+        lambda query, body: (200, [polls.pop(0) if len(polls) > 1 else polls[0]]),
+    )
+    clock = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr("time.sleep", sleep)
+    monkeypatch.setattr("time.monotonic", lambda: clock[0])
+    result = CliRunner().invoke(
+        topology, ["watch", "-t", "t1", "--follow", "--timeout", "100"], obj={}
+    )
+    assert result.exit_code == 124
+    assert sleeps[:9] == [2.0, 4.0, 8.0, 2.0, 2.0, 2.0, 4.0, 8.0, 16.0]
+    assert max(sleeps) == 30.0
+    lines = [line.split(" ", 1)[1] for line in result.output.splitlines()]
+    assert lines[:-1] == [
+        "t1 version 1 workflow deploy(finished)",
+        "t1 version 1 -> 2",
+        "t1 workflow deploy(running)",
+        "t1 workflow deploy(finished)",
+    ]
+
+
+def test_watch_exit_codes(fake_api, monkeypatch):
+    failed = make_topology(1, finished=False)
+    failed["workflow"]["M"]["status"] = {"S": "FAILED"}
+    states = {"t1": [make_topology(1, finished=False), failed]}
+    fake_api.route(
+        "GET", "/topology/t1", lambda query, body: (200, [states["t1"].pop(0)])
+    )
+    fake_api.route("GET", "/topology/t2", lambda query, body: (200, [make_topology(2)]))
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    runner = CliRunner()
+    result = runner.invoke(topology, ["watch", "-t", "t1", "-t", "t2"], obj={})
+    assert result.exit_code == 1
+    assert "t1 workflow deploy(failed)" in result.output
+
+    result = runner.invoke(topology, ["watch", "-t", "t2"], obj={})
+    assert result.exit_code == 0
+
+    fake_api.route(
+        "GET",
+        "/topology/t3",
+        lambda query, body: (200, [make_topology(3, finished=False)]),
+    )
+    result = runner.invoke(topology, ["watch", "-t", "t3", "--timeout", "0.01"], obj={})
+    assert result.exit_code == 124
+
+
+def test_update_skips_unchanged(fake_api, tmp_path):
+    current = make_topology(1)
+    fake_api.route("GET", "/topology/t1", lambda query, body: (200, [current]))
+    fake_api.route("PATCH", "/topology/t1", lambda query, body: (200, body))
+    config = tmp_path / "topology.json"
+    config.write_text(json.dumps({"nodes": [{"hostname": "r1"}]}))
+    runner = CliRunner()
+    args = ["update", "-t", "t1", "--topology-json", str(config)]
+    result = runner.invoke(topology, args, obj={})
+    assert "topology t1 is up to date" in result.output
+    assert [call[0] for call in fake_api.calls] == ["GET"]
+
+    config.write_text(json.dumps({"nodes": [{"hostname": "r1", "vendor": "nokia"}]}))
+    result = runner.invoke(topology, [*args, "--dry-run"], obj={})
+    assert result.output.splitlines()[-1] == '+ nodes[r1].vendor: "nokia"'
+    assert [call[0] for call in fake_api.calls] == ["GET", "GET"]
+
+    result = runner.invoke(topology, args, obj={})
+    assert fake_api.calls[-1][0] == "PATCH"
+    assert fake_api.calls[-1][3]["topology_config"]["nodes"][0]["vendor"] == "nokia"
+
+    config.write_text(json.dumps({"nodes": []}))
+    result = runner.invoke(topology, args, obj={})
+    assert result.exit_code == 1
+    assert len(fake_api.calls) == 4
+
+
+def test_update_yaml_int_keys(fake_api, tmp_path):
+    current = make_topology(1)
+    nodes = [{"hostname": "r1", "vlans": {"10": "users"}}]
+    current["topology_config"] = {"S": json.dumps({"nodes": nodes})}
+    fake_api.route("GET", "/topology/t1", lambda query, body: (200, [current]))
+    config = tmp_path / "lab.yaml"
+    config.write_text("nodes:\n- hostname: r1\n  vlans: {10: users}\n")
+    args = ["update", "-t", "t1", "--topology-yaml", str(config), "--dry-run"]
+    result = CliRunner().invoke(topology, args, obj={})
+    assert "topology t1 is up to date" in result.output
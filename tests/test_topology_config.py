@@ -0,0 +1,78 @@
+import json
+import yaml
+
+from pathlib import Path
+
+from lab1918_shell.topology_config import diff, format_change, validate
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+DATA = Path(__file__).parent / "data"
+
+
+def test_validate():
+    for name in ("topology_1.yaml", "topology_2.yaml"):
+        assert validate(yaml.safe_load((DATA / name).read_text())) == []
+    assert validate(json.loads((DATA / "topology_1.json").read_text())) == []
+    assert validate([]) == ["topology config must be a mapping"]
+    config = {
+        "nodes": [{"hostname": "r1"}, {"hostname": "r1", "vendor": 7}, {}],
+        "links": [{"endpoints": ["r1:eth0", "r9:eth0"]}, {"endpoints": ["r1"]}],
+    }
+    assert validate(config) == [
+        "nodes[1].vendor: must be a str",
+        "nodes[1].hostname: duplicate 'r1'",
+        "nodes[2].hostname: required",
+        "links[0].endpoints: unknown node 'r9'",
+        "links[1].endpoints: two endpoints are required",
+    ]
+
+
+def test_diff_matches_nodes_by_hostname():
+    old = yaml.safe_load((DATA / "topology_2.yaml").read_text())
+    new = json.loads(json.dumps(old))
+    assert diff(old, new) == []
+
+    new["nodes"].reverse()
+    new["nodes"][0]["vendor"] = "cisco"
+    new["nodes"].append({"hostname": "r3"})
+    del new["links"][1]
+    assert [format_change(change) for change in diff(old, new)] == [
+        '~ nodes[r2].vendor: "arista" -> "cisco"',
+        '+ nodes[r3]: {"hostname": "r3"}',
+        '- links[1]: {"endpoints": ["r1:eth1", "r2:eth1"]}',
+    ]
+    assert diff({"a": 1}, {"a": 1.0}) == diff({"a": 1}, {"a": True})
+
+
+def test_load_config_parse_cache(tmp_path, caplog, monkeypatch):
+    import yaml
+
+    from lab1918_shell.topology_config import ParseCache, load_config
+
+    cache = ParseCache(tmp_path / "parsed", max_entries=2)
+    path = DATA / "topology_2.yaml"
+    expected = yaml.safe_load(path.read_text())
+    caplog.set_level("DEBUG", logger="lab1918")
+    assert load_config(path, cache=cache) == expected
+    assert "CSafeLoader" in caplog.text
+    assert len(list(cache.cache_dir.glob("*.marshal"))) == 1
+
+    def no_parse(*args, **kwargs):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(yaml, "load", no_parse)
+    assert load_config(path, cache=cache) == expected
+    assert "from parse cache" in caplog.text
+    monkeypatch.undo()
+
+    dated = tmp_path / "dated.yaml"
+    dated.write_text("nodes:\n- hostname: r1\n  created: 2024-01-01\n")
+    assert str(load_config(dated, cache=cache)["nodes"][0]["created"]) == "2024-01-01"
+    for i in range(3):
+        other = tmp_path / f"{i}.yaml"
+        other.write_text(f"nodes:\n- hostname: r{i}\n")
+        load_config(other, cache=cache)
+    assert len(list(cache.cache_dir.glob("*.marshal"))) == 2
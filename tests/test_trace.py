@@ -0,0 +1,104 @@
+import json
+import pytest
+import threading
+
+from click.testing import CliRunner
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lab1918_shell import trace
+from lab1918_shell.cli import lab1918
+from lab1918_shell.client import TransportPolicy, new_session
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+@pytest.fixture
+def server():
+    """Answer 503 to the first `failures` requests, then a small json body"""
+    state = {"failures": 0, "hits": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            state["hits"] += 1
+            status = 503 if state["hits"] <= state["failures"] else 200
+            self.send_response(status)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "11")
+            self.end_headers()
+            self.wfile.write(b'{"ok":true}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    yield trace.start(tmp_path / "trace.ndjson")
+    trace.stop()
+
+
+def test_spans_record_phases(server, tracer, tmp_path):
+    url, state = server
+    session = new_session(TransportPolicy(retries=3, backoff_factor=0))
+    session.get(f"{url}/topology/t-1a2b")
+    state["failures"] = 3
+    session.get(f"{url}/topology/t-3c4d")
+
+    spans = [
+        json.loads(line)
+        for line in (tmp_path / "trace.ndjson").read_text().split("\n")[:-1]
+    ]
+    first, second = spans
+    assert first["endpoint"] == "GET /topology/{id}"
+    assert first["status"] == 200
+    assert first["response_bytes"] == 11
+    assert not first["reused_connection"]
+    assert {"dns", "connect", "wait", "transfer"} <= set(first["phases_ms"])
+    assert "tls" not in first["phases_ms"]
+    assert second["retries"] == 2
+
+    (row,) = tracer.summary()
+    assert row.endpoint == "GET /topology/{id}"
+    assert row.calls == 2
+    assert row.retries == 2
+    assert row.p50_ms <= row.max_ms
+
+
+def test_session_before_trace_started(server, tmp_path):
+    """Sessions made before --trace, the shell's say, still time connections"""
+    url, state = server
+    session = new_session(TransportPolicy())
+    session.get(f"{url}/whoami")
+    session.close()
+    tracer = trace.start(tmp_path / "trace.ndjson")
+    try:
+        session.get(f"{url}/whoami")
+    finally:
+        trace.stop()
+    (span,) = tracer.spans
+    assert {"dns", "connect"} <= set(span.phases)
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert trace.percentile(values, 50) == 50
+    assert trace.percentile(values, 99) == 99
+    assert trace.percentile([7], 90) == 7
+
+
+def test_trace_option(fake_api, tmp_path):
+    fake_api.route("GET", "/whoami", lambda query, body: (200, {"user_id": "u1"}))
+    path = tmp_path / "trace.ndjson"
+    result = CliRunner().invoke(lab1918, ["--trace", str(path), "user", "list"])
+    assert result.exit_code == 0
+    assert path.exists()
+    assert trace.tracer is None
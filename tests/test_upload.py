@@ -0,0 +1,181 @@
+import hashlib
+import os
+import requests
+
+from click.testing import CliRunner
+
+from lab1918_shell.artifact import artifact
+from lab1918_shell.dedup import content_digest
+from lab1918_shell.upload import MIB
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+PART_SIZE = 5 * MIB
+
+
+class S3StandIn:
+    """Multipart upload api plus presigned part urls, parts kept by md5"""
+
+    def __init__(self, api, fail_parts=()):
+        self.parts = {}
+        self.puts = []
+        self.completed = None
+        self.fail_parts = set(fail_parts)
+        self.artifacts = []
+        self.api = api
+        api.route("POST", "/artifact", self.create)
+        api.route("GET", "/artifact", self.list)
+
+    def create(self, query, body):
+        artifact_id = f"a{len(self.artifacts) + 1}"
+        item = {key: {"S": value} for key, value in body.items() if value}
+        self.artifacts.append({"artifact_id": {"S": artifact_id}, **item})
+        path = f"/artifact/{artifact_id}/upload"
+        self.api.route("POST", path, self.start)
+        self.api.route("POST", f"{path}/u1/parts", self.sign(artifact_id))
+        self.api.route("POST", f"{path}/u1/complete", self.complete)
+        self.api.route("PUT", f"/bucket/{artifact_id}", self.put)
+        return 200, {"artifact_id": artifact_id}
+
+    def list(self, query, body):
+        return 200, self.artifacts
+
+    def start(self, query, body):
+        assert body["part_size"] == PART_SIZE
+        return 200, {"upload_id": "u1"}
+
+    def sign(self, artifact_id):
+        def handler(query, body):
+            urls = {
+                n: f"https://s3.local/bucket/{artifact_id}?partNumber={n}&uploadId=u1"
+                for n in body["part_numbers"]
+            }
+            return 200, {"urls": urls}
+
+        return handler
+
+    def put(self, query, body):
+        part_number = int(query["partNumber"])
+        self.puts.append(part_number)
+        if part_number in self.fail_parts:
+            self.fail_parts.discard(part_number)
+            return 500, {"message": "internal error"}
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        self.parts[part_number] = etag
+        return 200, None, {"ETag": etag}
+
+    def complete(self, query, body):
+        self.completed = body["parts"]
+        return 200, {"artifact_id": "a1"}
+
+
+def image(tmp_path, parts):
+    path = tmp_path / "veos.qcow2"
+    # last part is short, like most real images
+    path.write_bytes(os.urandom(PART_SIZE * (parts - 1) + 1234))
+    return path
+
+
+def create(path, *args):
+    return CliRunner().invoke(
+        artifact,
+        ["create", "--upload", str(path), "--part-size", "5", *args],
+        obj={},
+    )
+
+
+def test_parallel_upload(fake_api, lab1918_home, tmp_path):
+    s3 = S3StandIn(fake_api)
+    path = image(tmp_path, parts=3)
+    result = create(path, "--parallel", "3")
+    assert result.exit_code == 0
+    assert "created artifact veos.qcow2" in result.output
+    data = path.read_bytes()
+    chunks = [data[i : i + PART_SIZE] for i in range(0, len(data), PART_SIZE)]
+    assert s3.completed == [
+        {"part_number": n, "etag": f'"{hashlib.md5(chunk).hexdigest()}"'}
+        for n, chunk in enumerate(chunks, 1)
+    ]
+    assert not list((lab1918_home / "uploads").glob("*.json"))
+
+
+def test_resume_after_failure(fake_api, lab1918_home, tmp_path):
+    s3 = S3StandIn(fake_api, fail_parts=[10])
+    path = image(tmp_path, parts=10)
+    result = create(path, "--parallel", "1")
+    assert "500" in result.output
+    assert s3.completed is None
+    assert len(list((lab1918_home / "uploads").glob("*.json"))) == 1
+
+    s3.puts.clear()
+    result = create(path)
+    assert result.exit_code == 0
+    assert "resuming upload of veos.qcow2, 9/10 parts done" in result.output
+    assert s3.puts == [10]
+    assert [part["part_number"] for part in s3.completed] == list(range(1, 11))
+    creates = [call for call in fake_api.calls if call[:2] == ("POST", "/artifact")]
+    assert len(creates) == 1
+
+
+def test_empty_file(fake_api, tmp_path):
+    path = tmp_path / "empty.qcow2"
+    path.touch()
+    result = create(path)
+    assert result.exit_code == 2
+    assert "is empty" in result.output
+
+
+def test_errors_without_response(fake_api, tmp_path):
+    """Connection errors and odd answers are reported, not raised"""
+    path = image(tmp_path, parts=1)
+
+    def unreachable(query, body):
+        raise requests.ConnectionError("connection refused")
+
+    fake_api.route("POST", "/artifact", unreachable)
+    result = create(path, "--no-dedup")
+    assert result.exception is None
+    assert "connection refused" in result.output
+
+    fake_api.route("POST", "/artifact", lambda query, body: (200, {}))
+    result = create(path, "--no-dedup")
+    assert result.exception is None
+    assert "unexpected api response, no 'artifact_id'" in result.output
+
+
+def test_content_digest(tmp_path):
+    path = image(tmp_path, parts=2)
+    digest = content_digest(path, chunk_size=MIB, workers=4)
+    assert digest == content_digest(path, chunk_size=MIB, workers=1)
+    assert digest != content_digest(path)
+    copy = tmp_path / "copy.qcow2"
+    copy.write_bytes(path.read_bytes()[:-1] + b"x")
+    assert digest != content_digest(copy, chunk_size=MIB)
+
+
+def test_dedup_skips_and_aliases(fake_api, lab1918_home, tmp_path):
+    s3 = S3StandIn(fake_api)
+    path = image(tmp_path, parts=2)
+    assert create(path, "--file-version", "4.30").exit_code == 0
+    assert len(s3.puts) == 2
+
+    copy = tmp_path / "veos-copy.qcow2"
+    copy.write_bytes(path.read_bytes())
+    result = create(copy, "--file-name", "veos.qcow2", "--file-version", "4.30")
+    assert "artifact a1 has the same content, upload skipped" in result.output
+
+    result = create(copy, "--file-version", "4.30")
+    assert "as alias of a1, upload skipped" in result.output
+    assert s3.artifacts[1]["alias_of"] == {"S": "a1"}
+    assert len(s3.puts) == 2
+
+    # digests from the api count without a local index entry
+    (lab1918_home / "artifact_index.json").unlink()
+    result = create(copy, "--file-name", "other.qcow2")
+    assert "as alias of a1" in result.output
+
+    result = create(copy, "--file-name", "forced.qcow2", "--no-dedup")
+    assert "created artifact forced.qcow2" in result.output
+    assert len(s3.puts) == 4
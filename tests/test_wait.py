@@ -0,0 +1,106 @@
+from click.testing import CliRunner
+
+from lab1918_shell import wait
+from lab1918_shell.topology import topology
+
+__author__ = "igp2bgp"
+__copyright__ = "lab1918.com"
+__license__ = "Apache"
+
+
+def with_workflow(topology_id, workflow_id, finished=True, failed=False):
+    workflow = {
+        "workflow_name": {"S": "deploy"},
+        "workflow_id": {"S": workflow_id},
+        "started_at": {"S": "2024-01-01T00:00:00.000000"},
+        "finished": {"BOOL": finished},
+    }
+    if failed:
+        workflow["status"] = {"S": "FAILED"}
+    return {
+        "topology_id": {"S": topology_id},
+        "version": {"N": "1"},
+        "workflow": {"M": workflow},
+    }
+
+
+def polled(*states):
+    # answers in turn, the last one for every poll after
+    states = [*states]
+
+    def handler(query, body):
+        return 200, [states.pop(0) if len(states) > 1 else states[0]]
+
+    return handler
+
+
+def test_deploy_wait_follows_new_workflows(fake_api, monkeypatch):
+    monkeypatch.setattr(wait, "MIN_POLL_INTERVAL", 0.001)
+    fake_api.route(
+        "GET",
+        "/topology/t1",
+        polled(
+            with_workflow("t1", "w0"),
+            # the previous workflow is not the one to follow
+            with_workflow("t1", "w0"),
+            with_workflow("t1", "w1", finished=False),
+            with_workflow("t1", "w1"),
+        ),
+    )
+    fake_api.route(
+        "GET",
+        "/topology/t2",
+        polled(with_workflow("t2", "w0"), with_workflow("t2", "w2", failed=True)),
+    )
+    fake_api.route("POST", "/topology/t1/deploy", lambda query, body: (200, {}))
+    fake_api.route("POST", "/topology/t2/deploy", lambda query, body: (200, {}))
+    args = ["deploy", "-t", "t1", "-t", "t2", "--wait"]
+    result = CliRunner().invoke(topology, args, obj={})
+    assert result.exit_code == 1
+    assert "t1 deploy finished in " in result.output
+    assert "t2 deploy failed in " in result.output
+    polls = [path for method, path, *_ in fake_api.calls if path == "/topology/t1"]
+    assert len(polls) == 4
+    deploys = [call for call in fake_api.calls if call[0] == "POST"]
+    assert [call[3] for call in deploys] == [{"dry_run": False}] * 2
+
+
+def test_wait_exit_codes(fake_api, monkeypatch):
+    monkeypatch.setattr(wait, "MIN_POLL_INTERVAL", 0.001)
+    fake_api.route(
+        "GET",
+        "/topology/t1",
+        polled(with_workflow("t1", "w0"), with_workflow("t1", "w1", finished=False)),
+    )
+    fake_api.route("POST", "/topology/t1/undeploy", lambda query, body: (200, {}))
+    fake_api.route("POST", "/topology/t2/undeploy", lambda query, body: (200, {}))
+    runner = CliRunner()
+    args = ["undeploy", "-t", "t1", "--wait", "--timeout", "0.05"]
+    result = runner.invoke(topology, args, obj={})
+    assert result.exit_code == 124
+    assert "t1 undeploy timeout in " in result.output
+
+    # no topology to poll is an error, not a wait forever
+    fake_api.route("GET", "/topology/t2", lambda query, body: (404, {}))
+    result = runner.invoke(topology, ["undeploy", "-t", "t2", "--wait"], obj={})
+    assert result.exit_code == 1
+    assert "t2 undeploy failed: 404" in result.output
+
+    result = runner.invoke(
+        topology, ["deploy", "-t", "t1", "--wait", "--dry-run"], obj={}
+    )
+    assert result.exit_code == 2
+
+
+def test_bootstrap_without_wait_prints_each_response(fake_api):
+    for each in ("t1", "t2"):
+        fake_api.route(
+            "POST",
+            f"/topology/{each}/bootstrap",
+            lambda query, body: (200, {"input": body}),
+        )
+    args = ["bootstrap", "-t", "t1", "-t", "t2", "--params", '{"vlan": 10}']
+    result = CliRunner().invoke(topology, args, obj={})
+    assert result.exit_code == 0
+    assert result.output.count('"vlan": 10') == 2
+    assert [call[0] for call in fake_api.calls] == ["POST", "POST"]